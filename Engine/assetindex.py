@@ -0,0 +1,313 @@
+import argparse
+import glob
+import json
+import os
+import re
+from collections import OrderedDict
+
+from PIL import Image
+
+# Asset index
+# ===========
+# Crawls the scenes the game loads (gameApp.json) plus any other scene JSON in this directory and
+# records every asset each one pulls in, in the order the engine first touches them:
+#
+#   TEXTURE.filename          texture, loaded when the object is created
+#   ANIMATEDTEXTURE.filename  sprite metadata JSON, read when the object is created
+#   TEXT.fontFile             font
+#   scripts                   scene and object scripts; string literals naming assets/... in the
+#                             script's D source (music, mostly) are loaded when the script runs
+#
+# Paths are relative to Engine/, the engine's working directory. ResourceManager caches by the
+# path string, so two spellings of the same file load it twice; that is reported too.
+
+GAME_APP = "gameApp.json"
+SCRIPT_SOURCES = "source/scripts"
+SCRIPT_REGISTRY = "source/app.d"
+DEFAULT_OUTPUT_DIR = "assets/preload"
+
+ASSET_LITERAL = re.compile(r'"((?:\./)?assets/[^"]+)"')
+SCRIPT_FACTORY = re.compile(r'RegisterScriptFactory\("(\w+)".*?new (\w+)\(')
+
+
+# === SCRIPTS ===
+def script_assets(registry_path=SCRIPT_REGISTRY, sources_dir=SCRIPT_SOURCES):
+    """Map each registered script name to the asset paths its D source mentions (outside comments)."""
+    try:
+        with open(registry_path) as f:
+            registry = SCRIPT_FACTORY.findall(f.read())
+    except OSError:
+        return {}
+
+    class_assets = {}
+    for source_path in sorted(glob.glob(os.path.join(sources_dir, "*.d"))):
+        with open(source_path) as f:
+            lines = [line for line in f if not line.lstrip().startswith("//")]
+        text = "".join(lines)
+        for class_name in re.findall(r"class (\w+)", text):
+            class_assets[class_name] = ASSET_LITERAL.findall(text)
+    return {name: class_assets.get(class_name, []) for name, class_name in registry}
+
+
+# === ASSETS ===
+def asset_kind(path):
+    extension = os.path.splitext(path)[1].lower()
+    if extension in (".png", ".bmp", ".jpg", ".jpeg"):
+        return "texture"
+    if extension == ".json":
+        return "metadata"
+    if extension == ".ttf":
+        return "font"
+    if extension in (".wav", ".ogg", ".mp3"):
+        return "music"
+    return "other"
+
+
+def asset_info(path):
+    """Size on disk and, for textures, the decoded RGBA size (read from the image header only)."""
+    info = {"kind": asset_kind(path), "exists": os.path.isfile(path)}
+    if not info["exists"]:
+        return info
+    info["bytes"] = os.path.getsize(path)
+    if info["kind"] == "texture":
+        try:
+            with Image.open(path) as image:
+                info["width"], info["height"] = image.size
+            info["textureBytes"] = info["width"] * info["height"] * 4
+        except OSError as e:
+            info["error"] = str(e)
+    return info
+
+
+def case_mismatch(path):
+    """The on-disk spelling if path only exists with different letter case (fails on Linux), else None."""
+    parts = os.path.normpath(path).split(os.sep)
+    current = "."
+    fixed = []
+    for part in parts:
+        try:
+            entries = os.listdir(current)
+        except OSError:
+            return None
+        if part in entries:
+            match = part
+        else:
+            matches = [entry for entry in entries if entry.lower() == part.lower()]
+            if not matches:
+                return None
+            match = matches[0]
+        fixed.append(match)
+        current = os.path.join(current, match)
+    fixed_path = os.path.join(*fixed)
+    return fixed_path if fixed_path != os.path.normpath(path) else None
+
+
+# === SCENES ===
+def scene_paths(game_app=GAME_APP):
+    """(scene name, path) for every scene in gameApp.json, then any other scene JSON in this directory.
+
+    Scenes not in gameApp.json are named by their path, since a file stem can clash with a gameApp
+    name (gameApp's "MainLevel" is testTile.json, not MainLevel.json).
+    """
+    scenes = []
+    try:
+        with open(game_app) as f:
+            scenes = list(json.load(f).get("scenes", {}).items())
+    except (OSError, ValueError):
+        pass
+    listed = {os.path.normpath(path) for _, path in scenes}
+    for path in sorted(glob.glob("*.json")):
+        if os.path.normpath(path) in listed:
+            continue
+        try:
+            with open(path) as f:
+                if "sceneTree" in json.load(f):
+                    scenes.append((path, path))
+        except (OSError, ValueError, TypeError):
+            pass
+    return scenes
+
+
+def scene_references(scene, scripts):
+    """Yield (path, object name, field) for every asset a scene document uses, in first-use order.
+
+    Components load while the scene's objects are created; scripts only run once it is loaded.
+    """
+    objects = scene.get("sceneTree", {}).get("objects", [])
+    for obj in objects:
+        name = obj.get("name", "?")
+        for component_name, component in (obj.get("components") or {}).items():
+            if not isinstance(component, dict):
+                continue
+            for key in ("filename", "fontFile"):
+                if isinstance(component.get(key), str):
+                    yield component[key], name, f"{component_name}.{key}"
+    for script in scene.get("scripts", []):
+        for path in scripts.get(script, []):
+            yield path, "<scene>", f"script {script}"
+    for obj in objects:
+        for script in obj.get("scripts", []):
+            for path in scripts.get(script, []):
+                yield path, obj.get("name", "?"), f"script {script}"
+
+
+def lint_scene(scene_name, scene, scripts, issues):
+    """Structural problems the engine only hits at runtime."""
+    for script in scene.get("scripts", []):
+        if script not in scripts:
+            issues.append(("error", scene_name, f"scene script '{script}' is not registered in {SCRIPT_REGISTRY}"))
+    for obj in scene.get("sceneTree", {}).get("objects", []):
+        name = obj.get("name", "?")
+        components = obj.get("components") or {}
+        for script in obj.get("scripts", []):
+            if script not in scripts:
+                issues.append(("error", scene_name, f"{name}: script '{script}' is not registered in {SCRIPT_REGISTRY}"))
+        if "TRANSFORM" not in components:
+            issues.append(("error", scene_name, f"{name}: no TRANSFORM (every object's transform is updated each frame)"))
+        animated = components.get("ANIMATEDTEXTURE")
+        if isinstance(animated, dict):
+            if "TEXTURE" not in components:
+                issues.append(("error", scene_name, f"{name}: ANIMATEDTEXTURE without TEXTURE"))
+            lint_animation(scene_name, name, animated, issues)
+
+
+def lint_animation(scene_name, name, animated, issues):
+    metadata_path = animated.get("filename")
+    if not isinstance(metadata_path, str) or not os.path.isfile(metadata_path):
+        return  # reported as a missing asset
+    try:
+        with open(metadata_path) as f:
+            metadata = json.load(f)
+        frames = metadata["frames"]
+        fmt = metadata["format"]
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        issues.append(("error", scene_name, f"{name}: bad sprite metadata {metadata_path}: {e!r}"))
+        return
+    animation = animated.get("currAnimation")
+    if animation is not None and animation not in frames:
+        issues.append(("error", scene_name, f"{name}: animation '{animation}' is not in {metadata_path}"))
+    if "sprites" in metadata:
+        frame_count = len(metadata["sprites"])
+    else:
+        frame_count = (fmt["width"] // fmt["tileWidth"]) * (fmt["height"] // fmt["tileHeight"])
+    for sequence, indices in frames.items():
+        bad = [i for i in indices if not 0 <= i < frame_count]
+        if bad:
+            issues.append(("error", scene_name, f"{name}: {metadata_path} '{sequence}' uses frames {bad} "
+                                                f"but the sheet has {frame_count}"))
+
+
+def build_index(scenes, scripts):
+    """Returns (index, manifests, issues).
+
+    index maps each asset path to its info plus the scenes/objects referencing it; manifests maps
+    each scene name to its asset paths in first-use order. A scene whose name is already taken is
+    reported and skipped rather than merged into the first.
+    """
+    index = OrderedDict()
+    manifests = OrderedDict()
+    issues = []
+    for scene_name, scene_path in scenes:
+        if scene_name in manifests:
+            issues.append(("error", scene_name, f"{scene_path}: another scene is already named '{scene_name}'"))
+            continue
+        try:
+            with open(scene_path) as f:
+                scene = json.load(f)
+        except (OSError, ValueError) as e:
+            issues.append(("error", scene_name, f"cannot load {scene_path}: {e}"))
+            continue
+        lint_scene(scene_name, scene, scripts, issues)
+        order = manifests[scene_name] = []
+        for path, obj, field in scene_references(scene, scripts):
+            entry = index.get(path)
+            if entry is None:
+                entry = index[path] = asset_info(path)
+                entry["references"] = OrderedDict()
+            entry["references"].setdefault(scene_name, []).append(f"{obj} {field}")
+            if path not in order:
+                order.append(path)
+
+    # Asset-level problems, once per path
+    by_file = {}
+    for path, entry in index.items():
+        if not entry["exists"]:
+            fixed = case_mismatch(path)
+            hint = f" (exists as {fixed}; paths are case-sensitive on Linux)" if fixed else ""
+            issues.append(("error", ", ".join(entry["references"]), f"missing asset {path}{hint}"))
+        elif "error" in entry:
+            issues.append(("error", ", ".join(entry["references"]), f"unreadable texture {path}: {entry['error']}"))
+        if entry["exists"]:
+            by_file.setdefault(os.path.realpath(path), []).append(path)
+    for spellings in by_file.values():
+        if len(spellings) > 1:
+            issues.append(("warning", "*", f"one file referenced as {spellings}: ResourceManager loads it "
+                                           f"{len(spellings)} times"))
+    return index, manifests, issues
+
+
+def manifest_filename(scene_name):
+    """Scene names may be paths; flatten them into one file name in the output directory."""
+    return re.sub(r"[\\/]", "_", scene_name) + ".json"
+
+
+def write_outputs(index, manifests, output_dir):
+    os.makedirs(output_dir, exist_ok=True)
+    with open(os.path.join(output_dir, "asset_index.json"), "w") as f:
+        json.dump(index, f, indent=4)
+    for scene_name, paths in manifests.items():
+        manifest = {
+            "scene": scene_name,
+            "assets": [{"path": path, "kind": index[path]["kind"],
+                        "exists": index[path]["exists"], "bytes": index[path].get("bytes", 0),
+                        "textureBytes": index[path].get("textureBytes", 0),
+                        "sharedWith": [other for other in index[path]["references"] if other != scene_name]}
+                       for path in paths]
+        }
+        with open(os.path.join(output_dir, manifest_filename(scene_name)), "w") as f:
+            json.dump(manifest, f, indent=4)
+
+
+def print_report(index, manifests, issues):
+    print(f"{'scene':<28}{'assets':>8}{'unique':>8}{'disk KB':>10}{'texture KB':>12}")
+    for scene_name, paths in manifests.items():
+        unique = [path for path in paths if len(index[path]["references"]) == 1]
+        disk = sum(index[path].get("bytes", 0) for path in paths)
+        texture = sum(index[path].get("textureBytes", 0) for path in paths)
+        print(f"{scene_name:<28}{len(paths):>8}{len(unique):>8}{disk / 1024:>10.0f}{texture / 1024:>12.0f}")
+
+    shared = [path for path, entry in index.items() if len(entry["references"]) > 1]
+    print(f"\n{len(index)} assets, {len(shared)} shared between scenes:")
+    for path in shared:
+        print(f"  {path}: {', '.join(index[path]['references'])}")
+
+    if issues:
+        print()
+    for level, where, message in issues:
+        print(f"{level.upper()}: [{where}] {message}")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Lint scene files and index the assets they reference; run from Engine/.")
+    parser.add_argument("scenes", nargs="*",
+                        help="scene JSON files (default: gameApp.json's scenes plus every other scene here)")
+    parser.add_argument("--output-dir", default=DEFAULT_OUTPUT_DIR,
+                        help=f"where asset_index.json and the per-scene preload manifests go (default: {DEFAULT_OUTPUT_DIR})")
+    parser.add_argument("--no-write", action="store_true", help="only lint and report")
+    parser.add_argument("--strict", action="store_true", help="exit with an error on warnings too")
+    args = parser.parse_args()
+
+    scenes = [(os.path.normpath(path), path) for path in args.scenes] or scene_paths()
+    index, manifests, issues = build_index(scenes, script_assets())
+    if not args.no_write:
+        write_outputs(index, manifests, args.output_dir)
+    print_report(index, manifests, issues)
+
+    failing = [issue for issue in issues if issue[0] == "error" or args.strict]
+    if failing:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
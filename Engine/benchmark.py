@@ -0,0 +1,489 @@
+import argparse
+import contextlib
+import glob
+import io
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import types
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import cv2
+import numpy as np
+import PIL
+from PIL import Image
+
+ENGINE_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(ENGINE_DIR, "source"))
+
+import levelbuilder
+import scenebin
+import texturecodec
+import tilelayer
+import tilemap
+import video2cutscene
+
+# Benchmarks
+# ==========
+# Times the asset tools on synthetic inputs and records the results as JSON, one file per run, so a
+# later run can be compared against an earlier one. Run from Engine/:
+#
+#   python benchmark.py                      quick preset, compared against the newest earlier result
+#   python benchmark.py --preset full        bigger videos, maps and scenes
+#   python benchmark.py --only video tk      just the cases whose names contain "video" or "tk"
+#
+# Every case runs in a fresh process, so its peak RSS is its own. Each timing is the best of
+# --repeat runs. Inputs (videos, tilesets) are generated once into the work directory.
+#
+# Result file:
+#   {"timestamp", "environment": {...}, "preset", "repeat",
+#    "cases": {name: {"seconds": {stage: best time}, "info": {...}, "peakRssMB"} or {"skipped": reason}}}
+
+RESULTS_DIR = "benchmarks"
+REGRESSION_THRESHOLD = 0.15
+TILE_CLICK_OFFSET = 4  # where simulated clicks land inside a cell
+
+PRESETS = {
+    "quick": {
+        "videos": [(320, 180, 90)],
+        "png_sizes": [1024],
+        "tilesets": [32],
+        "layers": [(512, 512)],
+        "tk_maps": [(100, 100)],
+        "scenes": [10000],
+    },
+    "full": {
+        "videos": [(320, 180, 300), (1280, 720, 120), (1920, 1080, 60)],
+        "png_sizes": [2048, 4096],
+        "tilesets": [64, 128],
+        "layers": [(1024, 1024), (4096, 4096)],
+        "tk_maps": [(200, 200), (500, 500)],
+        "scenes": [10000, 50000],
+    },
+}
+
+
+# === SYNTHETIC INPUTS ===
+def make_video(path, width, height, frame_count, fps=30):
+    """A procedural clip: a scrolling gradient with a moving block and a few static holds."""
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), fps, (width, height))
+    ys, xs = np.mgrid[0:height, 0:width]
+    frame = None
+    for idx in range(frame_count):
+        if frame is None or idx % 15 >= 3:  # every 15 frames, hold the previous frame for 3
+            frame = np.empty((height, width, 3), dtype=np.uint8)
+            frame[:, :, 0] = (xs + idx * 4) % 256
+            frame[:, :, 1] = (ys + idx * 2) % 256
+            frame[:, :, 2] = (xs + ys) // 8 % 256
+            size = max(8, height // 6)
+            left = idx * 7 % max(1, width - size)
+            frame[height // 3:height // 3 + size, left:left + size] = (255, 255, 255)
+        writer.write(frame)
+    writer.release()
+
+
+def make_tileset(path, tiles_per_side, tile_size=tilemap.SOURCE_TILE_SIZE, spacing=tilemap.TILE_SPACING):
+    """A tiles_per_side x tiles_per_side sheet of distinct tiles in the layout tilemap.py slices."""
+    rng = np.random.default_rng(tiles_per_side)
+    side = tiles_per_side * (tile_size + spacing) - spacing
+    sheet = np.zeros((side, side, 4), dtype=np.uint8)
+    for row in range(tiles_per_side):
+        for col in range(tiles_per_side):
+            y, x = row * (tile_size + spacing), col * (tile_size + spacing)
+            sheet[y:y + tile_size, x:x + tile_size, :3] = rng.integers(0, 256, 3)
+            sheet[y + 4:y + tile_size - 4, x + 4:x + tile_size - 4, :3] = rng.integers(0, 256, 3)
+            sheet[y:y + tile_size, x:x + tile_size, 3] = 255
+    Image.fromarray(sheet).save(path)
+
+
+def synthetic_page(size):
+    """A cutscene-page-like image: smooth gradients with mild noise, which is what PNG sees in practice."""
+    rng = np.random.default_rng(size)
+    ys, xs = np.mgrid[0:size, 0:size]
+    page = np.stack([(xs // 4) % 256, (ys // 4) % 256, ((xs + ys) // 16) % 256], axis=2).astype(np.int16)
+    page += rng.integers(-6, 7, page.shape, dtype=np.int16)
+    return np.clip(page, 0, 255).astype(np.uint8)
+
+
+def prepare_inputs(preset, work_dir):
+    """Generate every input file the preset needs (skipping ones already in work_dir)."""
+    for width, height, frame_count in preset["videos"]:
+        path = os.path.join(work_dir, f"video_{width}x{height}_{frame_count}.mp4")
+        if not os.path.exists(path):
+            make_video(path, width, height, frame_count)
+    for tiles_per_side in set(preset["tilesets"]) | {16}:
+        path = os.path.join(work_dir, f"tileset_{tiles_per_side}.png")
+        if not os.path.exists(path):
+            make_tileset(path, tiles_per_side)
+
+
+@contextlib.contextmanager
+def timed(seconds, stage):
+    """Add the elapsed time of the with-block to seconds[stage]."""
+    start = time.perf_counter()
+    yield
+    seconds[stage] = seconds.get(stage, 0) + time.perf_counter() - start
+
+
+# === CASES ===
+# Each case function returns (seconds, info): wall time per stage, and sizes/counts worth recording.
+def bench_video(work_dir, width, height, frame_count):
+    """Frame extraction plus atlas tiling, and PNG encoding of the resulting pages."""
+    path = os.path.join(work_dir, f"video_{width}x{height}_{frame_count}.mp4")
+    output = os.path.join(work_dir, "page.png")
+    seconds, info = {}, {"pages": 0, "pngBytes": 0}
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        for _, page_image, cell_count, _ in video2cutscene.extract_pages(path, 30):
+            seconds["extract"] = seconds.get("extract", 0) + time.perf_counter() - start
+            size, encode_seconds = texturecodec.write_texture(output, page_image)
+            seconds["pngEncode"] = seconds.get("pngEncode", 0) + encode_seconds
+            info["pages"] += 1
+            info["cells"] = info.get("cells", 0) + cell_count
+            info["pngBytes"] += size
+            start = time.perf_counter()
+        seconds["extract"] = seconds.get("extract", 0) + time.perf_counter() - start
+    return seconds, info
+
+
+def bench_png(work_dir, size):
+    """Encode one page at several PNG compression levels and as png8."""
+    page = synthetic_page(size)
+    output = os.path.join(work_dir, "encode.png")
+    seconds, info = {}, {}
+    for name, options in (("png1", {"png_compression": 1}), ("png6", {"png_compression": 6}),
+                          ("png9", {"png_compression": 9}), ("png8", {"encoding": "png8"})):
+        info[f"{name}Bytes"], seconds[name] = texturecodec.write_texture(output, page, **options)
+    return seconds, info
+
+
+def bench_tileset(work_dir, tiles_per_side):
+    """tilemap.py's tileset slicing, from decoded pixels and from the disk cache."""
+    path = os.path.join(work_dir, f"tileset_{tiles_per_side}.png")
+    tilemap.TILE_CACHE_DIR = os.path.join(work_dir, ".tilecache")
+    shutil.rmtree(tilemap.TILE_CACHE_DIR, ignore_errors=True)
+    seconds = {}
+    with timed(seconds, "decode"):
+        pixels = np.asarray(Image.open(path).convert("RGBA"))
+    with timed(seconds, "slice"):
+        tiles = tilemap.slice_tileset(pixels)
+    tilemap.load_tiles(path)
+    with timed(seconds, "cachedLoad"):
+        tilemap.load_tiles(path)
+    return seconds, {"tiles": len(tiles)}
+
+
+def bench_layer(work_dir, width, height):
+    """TileLayer painting, flood fill and region copy."""
+    rng = np.random.default_rng(width * height)
+    layer = tilelayer.TileLayer(width, height)
+    count = width * height // 8
+    xs, ys = rng.integers(0, width, count).tolist(), rng.integers(0, height, count).tolist()
+    values = rng.integers(0, 64, count).tolist()
+    seconds = {}
+    with timed(seconds, "paint"):
+        for x, y, value in zip(xs, ys, values):
+            layer.set(x, y, value)
+    with timed(seconds, "copy"):
+        layer.copy(0, 0, width, height)
+    empty = tilelayer.TileLayer(width, height)
+    with timed(seconds, "floodFill"):
+        filled = empty.flood_fill(width // 2, height // 2, 1)
+    return seconds, {"paintedCells": len(layer), "filledCells": len(filled)}
+
+
+def open_tk():
+    """A withdrawn Tk root, or None when there is no display to open."""
+    import tkinter as tk
+    try:
+        root = tk.Tk()
+    except tk.TclError:
+        return None
+    root.withdraw()
+    return root
+
+
+def bench_tk_paint(work_dir, width, height):
+    """tilemap.py: build the editor, paint a stroke over every cell of a band, flush it, flood fill."""
+    root = open_tk()
+    if root is None:
+        return None, "no display (install Xvfb for headless runs)"
+    tilemap.TILE_CACHE_DIR = os.path.join(work_dir, ".tilecache")
+    seconds = {}
+    with timed(seconds, "construct"):
+        editor = tilemap.TileMapEditor(root, os.path.join(work_dir, "tileset_16.png"),
+                                       map_width=width, map_height=height)
+        root.update_idletasks()
+    band = [(x, y) for y in range(height) for x in range(width) if abs(x - y) < 8]
+    with timed(seconds, "paint"):
+        for idx, (x, y) in enumerate(band):
+            editor.paint_cell(x, y, idx % len(editor.tile_pixels))
+    with timed(seconds, "flush"):
+        editor.flush_dirty_cells()
+        root.update_idletasks()
+    with timed(seconds, "floodFill"):
+        editor.selected_tile_index = 1
+        editor.on_fill_click(types.SimpleNamespace(x=TILE_CLICK_OFFSET, y=TILE_CLICK_OFFSET + tilemap.TILE_SIZE * 9))
+        editor.flush_dirty_cells()
+        root.update_idletasks()
+    info = {"paintedCells": len(band), "canvasItems": len(editor.map_canvas.find_all())}
+    root.destroy()
+    return seconds, info
+
+
+def bench_tk_chunks(work_dir, level_width):
+    """tilemap-v2.py: build the editor, place tiles over the visible map, then rebuild every visible chunk."""
+    root = open_tk()
+    if root is None:
+        return None, "no display (install Xvfb for headless runs)"
+    tilemap_v2 = load_tilemap_v2()
+    seconds = {}
+    cwd = os.getcwd()
+    os.chdir(ENGINE_DIR)  # the editor loads its default images relative to Engine/
+    try:
+        with timed(seconds, "construct"):
+            root.geometry("1000x500")
+            editor = tilemap_v2.TileMapEditor(root, level_width, os.path.join(work_dir, "scene.json"))
+            root.update_idletasks()
+        # tileset and background decode on the editor's loader thread
+        with timed(seconds, "imagesReady"):
+            while editor.background_jobs:
+                root.update()
+                time.sleep(0.005)
+    finally:
+        os.chdir(cwd)
+    editor.on_tileset_click(types.SimpleNamespace(x=TILE_CLICK_OFFSET, y=TILE_CLICK_OFFSET))
+    clicks = [types.SimpleNamespace(x=editor.grid_offset_x + col * editor.GRID_SIZE + TILE_CLICK_OFFSET,
+                                    y=editor.grid_offset_y + row * editor.GRID_SIZE + TILE_CLICK_OFFSET)
+              for row in range(editor.map_rows) for col in range(min(editor.map_cols, 20))]
+    with timed(seconds, "place"):
+        for event in clicks:
+            editor.on_map_click(event)
+        root.update_idletasks()
+    with timed(seconds, "rebuildChunks"):
+        editor.chunk_images.clear()
+        for item in editor.chunk_items.values():
+            editor.free_chunk_items.append(item)
+        editor.chunk_items.clear()
+        editor.update_visible_chunks()
+        root.update_idletasks()
+    info = {"placed": len(editor.tiles), "visibleChunks": len(editor.chunk_items)}
+    root.destroy()
+    return seconds, info
+
+
+def load_tilemap_v2():
+    import importlib.util
+    spec = importlib.util.spec_from_file_location("tilemap_v2", os.path.join(ENGINE_DIR, "tilemap-v2.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def bench_export(work_dir, enemy_count):
+    """Export enemy_count enemies into the level scene (plain and merged), write it, and encode it with scenebin."""
+    rng = np.random.default_rng(enemy_count)
+    side = int(enemy_count ** 0.5) * 2
+    cells = rng.choice(side * side, enemy_count, replace=False)
+    positions = [(levelbuilder.GRID_ORIGIN[0] + int(cell % side) * levelbuilder.GRID_SIZE,
+                  levelbuilder.GRID_ORIGIN[1] + int(cell // side) * levelbuilder.GRID_SIZE) for cell in cells]
+    template = os.path.join(ENGINE_DIR, "testTile.json")
+    output = os.path.join(work_dir, "scene.json")
+    seconds, info = {}, {}
+    with timed(seconds, "load"):
+        with open(template) as f:
+            scene = json.load(f)
+    with timed(seconds, "export"):
+        levelbuilder.export_enemies(scene, positions)
+    with timed(seconds, "write"):
+        levelbuilder.write_scene(output, scene)
+    with timed(seconds, "writeCompact"):
+        levelbuilder.write_scene(output, scene, compact=True)
+    with timed(seconds, "scenebinEncode"):
+        encoded = scenebin.encode(scene)
+    info["objects"] = len(scene["sceneTree"]["objects"])
+    info["jsonBytes"] = os.path.getsize(output)
+    info["scenebinBytes"] = len(encoded)
+
+    with open(template) as f:
+        scene = json.load(f)
+    with timed(seconds, "exportMerged"):
+        _, info["mergedColliders"] = levelbuilder.export_enemies(scene, positions, merge=True)
+    return seconds, info
+
+
+def build_cases(preset):
+    """(case name, function name, arguments) for every case in a preset."""
+    cases = []
+    for width, height, frame_count in preset["videos"]:
+        cases.append((f"video_{width}x{height}_{frame_count}f", "bench_video", (width, height, frame_count)))
+    for size in preset["png_sizes"]:
+        cases.append((f"png_encode_{size}", "bench_png", (size,)))
+    for tiles_per_side in preset["tilesets"]:
+        cases.append((f"tileset_slice_{tiles_per_side}x{tiles_per_side}", "bench_tileset", (tiles_per_side,)))
+    for width, height in preset["layers"]:
+        cases.append((f"tilelayer_{width}x{height}", "bench_layer", (width, height)))
+    for width, height in preset["tk_maps"]:
+        cases.append((f"tk_paint_{width}x{height}", "bench_tk_paint", (width, height)))
+        cases.append((f"tk_chunks_{width * 40}px", "bench_tk_chunks", (width * 40,)))
+    for enemy_count in preset["scenes"]:
+        cases.append((f"export_{enemy_count}", "bench_export", (enemy_count,)))
+    return cases
+
+
+# === RUNNER ===
+def run_case(function_name, args, work_dir, repeat):
+    """Child process: run one case repeat times; returns its result entry."""
+    function = globals()[function_name]
+    best, info = {}, {}
+    for _ in range(repeat):
+        seconds, info = function(work_dir, *args)
+        if seconds is None:
+            return {"skipped": info}
+        for stage, value in seconds.items():
+            best[stage] = min(value, best.get(stage, value))
+    # ru_maxrss is in kilobytes on Linux
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    return {"seconds": {stage: round(value, 6) for stage, value in best.items()}, "info": info,
+            "peakRssMB": round(peak, 1)}
+
+
+def run_isolated(function_name, args, work_dir, repeat):
+    """Run a case in a freshly spawned process, so peak RSS and caches start clean."""
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as pool:
+        return pool.submit(run_case, function_name, args, work_dir, repeat).result()
+
+
+@contextlib.contextmanager
+def virtual_display():
+    """Start Xvfb for the Tk cases when there is no display and Xvfb is installed."""
+    if os.environ.get("DISPLAY") or not shutil.which("Xvfb"):
+        yield
+        return
+    display = f":{90 + os.getpid() % 100}"
+    process = subprocess.Popen(["Xvfb", display, "-screen", "0", "1280x1024x24", "-nolisten", "tcp"],
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    time.sleep(0.5)
+    os.environ["DISPLAY"] = display
+    try:
+        yield
+    finally:
+        del os.environ["DISPLAY"]
+        process.terminate()
+        process.wait()
+
+
+def environment():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                cwd=ENGINE_DIR).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpuCount": os.cpu_count(),
+        "numpy": np.__version__,
+        "opencv": cv2.__version__,
+        "pillow": PIL.__version__,
+        "commit": commit,
+    }
+
+
+# === COMPARISON ===
+def latest_result(results_dir, exclude=None):
+    paths = [path for path in glob.glob(os.path.join(results_dir, "*.json"))
+             if exclude is None or os.path.abspath(path) != os.path.abspath(exclude)]
+    return max(paths, key=os.path.getmtime) if paths else None
+
+
+def compare(baseline, current, threshold):
+    """Print every stage's change against the baseline; returns the regressions as (case, stage, ratio)."""
+    regressions = []
+    print(f"\n{'case':<28}{'stage':<16}{'baseline':>10}{'now':>10}{'change':>9}")
+    for name, entry in current["cases"].items():
+        old = baseline["cases"].get(name)
+        if "seconds" not in entry or not old or "seconds" not in old:
+            continue
+        pairs = [(stage, old["seconds"].get(stage), value) for stage, value in entry["seconds"].items()]
+        pairs.append(("peakRssMB", old.get("peakRssMB"), entry["peakRssMB"]))
+        for stage, before, now in pairs:
+            if not before:
+                continue
+            ratio = now / before
+            flag = ""
+            if ratio > 1 + threshold:
+                regressions.append((name, stage, ratio))
+                flag = "  REGRESSION"
+            print(f"{name:<28}{stage:<16}{before:>10.4f}{now:>10.4f}{ratio - 1:>+9.0%}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the Python asset tools on synthetic inputs.")
+    parser.add_argument("--preset", choices=sorted(PRESETS), default="quick", help="input sizes (default: quick)")
+    parser.add_argument("--only", nargs="+", metavar="TEXT", help="only run cases whose names contain one of these")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per case; the best time is kept (default: 3)")
+    parser.add_argument("--work-dir", help="where generated inputs are kept between runs (default: a temp dir)")
+    parser.add_argument("--output", help=f"result file (default: {RESULTS_DIR}/<timestamp>.json)")
+    parser.add_argument("--baseline", help="result file to compare against (default: the newest one in "
+                                           f"{RESULTS_DIR}/); 'none' skips the comparison")
+    parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD,
+                        help="slowdown (or RSS growth) that counts as a regression, as a fraction (default: 0.15)")
+    parser.add_argument("--fail-on-regression", action="store_true", help="exit with an error if anything regressed")
+    args = parser.parse_args()
+
+    preset = PRESETS[args.preset]
+    cases = [case for case in build_cases(preset) if not args.only or any(text in case[0] for text in args.only)]
+    output = args.output or os.path.join(RESULTS_DIR, datetime.now().strftime("%Y%m%d-%H%M%S") + ".json")
+    baseline_path = args.baseline if args.baseline != "none" else None
+    if args.baseline is None:
+        baseline_path = latest_result(os.path.dirname(output) or ".", exclude=output)
+
+    work_dir = args.work_dir or tempfile.mkdtemp(prefix="bench_")
+    os.makedirs(work_dir, exist_ok=True)
+    print(f"Generating inputs in {work_dir}...")
+    prepare_inputs(preset, work_dir)
+
+    result = {"timestamp": datetime.now().isoformat(timespec="seconds"), "environment": environment(),
+              "preset": args.preset, "repeat": args.repeat, "cases": {}}
+    try:
+        with virtual_display():
+            for name, function_name, case_args in cases:
+                entry = run_isolated(function_name, case_args, work_dir, args.repeat)
+                result["cases"][name] = entry
+                if "skipped" in entry:
+                    print(f"{name:<28}skipped: {entry['skipped']}")
+                else:
+                    stages = ", ".join(f"{stage} {value:.3f}s" for stage, value in entry["seconds"].items())
+                    print(f"{name:<28}{stages}; peak RSS {entry['peakRssMB']:.0f} MB")
+    finally:
+        if args.work_dir is None:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(result, f, indent=4)
+    print(f"Results saved to: {output}")
+
+    if baseline_path:
+        with open(baseline_path) as f:
+            baseline = json.load(f)
+        print(f"Compared with {baseline_path} ({baseline['timestamp']}, commit {baseline['environment'].get('commit')}):")
+        regressions = compare(baseline, result, args.threshold)
+        if regressions:
+            print(f"{len(regressions)} regression(s) above {args.threshold:.0%}")
+            if args.fail_on_regression:
+                raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,217 @@
+import json
+import os
+
+import numpy as np
+
+MAX_HISTORY = 1000          # undoable commands kept in memory
+AUTOSAVE_MIN_CELLS = 4096   # logged cells allowed before the autosave is compacted, for small maps
+
+# Edit history
+# ============
+# Every change to a TileMap goes through an EditHistory, which records it as one command: the cells it
+# changed on one layer, as parallel arrays of x, y, old value and new value. Undo and redo write a
+# command's old or new values back in one vectorized pass per chunk, so undoing a flood fill of a
+# million cells costs about as much as doing it. Edits made between begin_stroke() and end_stroke()
+# (a drag) are coalesced into one command that keeps each cell's first old and last new value.
+#
+# Autosave (JSON lines, appended as the map changes):
+#
+#   {"type": "snapshot", "width", "height", "layers": {name: [[x, y, value], ...]}, "meta": {...}}
+#   {"type": "edit", "layer": name, "cells": [[x, y, old, new], ...]}
+#   {"type": "meta", "key": key, "value": value}
+#
+# The file starts with a snapshot; every command, undo and redo appends one edit line holding only
+# the cells it changed. Once the logged cells outgrow the painted map, the file is rewritten as a
+# single snapshot. Loading replays the edits on top of the snapshot; a torn last line from a crash is
+# ignored.
+
+
+class Edit:
+    """One undoable command: the cells it changed on one layer."""
+    __slots__ = ("layer", "xs", "ys", "old", "new")
+
+    def __init__(self, layer, xs, ys, old, new):
+        self.layer = layer
+        self.xs = np.asarray(xs, dtype=np.int32)
+        self.ys = np.asarray(ys, dtype=np.int32)
+        self.old = np.asarray(old, dtype=np.int32)
+        self.new = np.asarray(new, dtype=np.int32)
+
+    def __len__(self):
+        return len(self.xs)
+
+    def cells(self):
+        return list(zip(self.xs.tolist(), self.ys.tolist()))
+
+    def inverse(self):
+        return Edit(self.layer, self.xs, self.ys, self.new, self.old)
+
+
+class EditHistory:
+    """Undo/redo and autosave for a TileMap. Editors make every change through set() and flood_fill()."""
+    def __init__(self, tile_map, autosave_path=None, max_history=MAX_HISTORY):
+        self.tile_map = tile_map
+        self.max_history = max_history
+        self.done = []      # applied commands, oldest first
+        self.undone = []    # undone commands, most recently undone last
+        self.stroke = None  # (layer, x, y) -> [old, new] while a stroke is open
+        self.meta = {}      # editor data saved with the map (e.g. tilemap-v2's palette)
+        self.autosave_path = autosave_path
+        self.autosave_file = None
+        self.logged_cells = 0
+        if autosave_path is not None:
+            if os.path.exists(autosave_path):
+                self.load_autosave()
+            self.compact_autosave()
+
+    # === EDITING ===
+    def set(self, x, y, value, layer="tiles"):
+        """Set one cell. Returns True if it changed."""
+        target = self.tile_map[layer]
+        old = target.get(x, y)
+        if not target.set(x, y, value):
+            return False
+        if self.stroke is not None:
+            self.stroke.setdefault((layer, x, y), [old, value])[1] = value
+        else:
+            self.commit(Edit(layer, [x], [y], [old], [value]))
+        return True
+
+    def flood_fill(self, x, y, value, layer="tiles"):
+        """TileLayer.flood_fill recorded as one command. Returns the changed cells."""
+        target = self.tile_map[layer]
+        old = target.get(x, y)
+        cells = target.flood_fill(x, y, value)
+        if not cells:
+            return cells
+        if self.stroke is not None:
+            for x, y in cells:
+                self.stroke.setdefault((layer, x, y), [old, value])[1] = value
+        else:
+            xy = np.array(cells, dtype=np.int32)
+            self.commit(Edit(layer, xy[:, 0], xy[:, 1], np.full(len(cells), old), np.full(len(cells), value)))
+        return cells
+
+    def begin_stroke(self):
+        if self.stroke is None:
+            self.stroke = {}
+
+    def end_stroke(self):
+        """Close the open stroke as one command (nothing is recorded if it changed nothing)."""
+        stroke, self.stroke = self.stroke, None
+        if not stroke:
+            return
+        by_layer = {}
+        for (layer, x, y), (old, new) in stroke.items():
+            if old != new:
+                by_layer.setdefault(layer, []).append((x, y, old, new))
+        for layer, cells in by_layer.items():
+            xs, ys, old, new = zip(*cells)
+            self.commit(Edit(layer, xs, ys, old, new))
+
+    def commit(self, edit):
+        self.done.append(edit)
+        del self.done[:-self.max_history]
+        self.undone.clear()
+        self.log_edit(edit)
+
+    # === UNDO / REDO ===
+    def undo(self):
+        """Revert the last command. Returns (layer, changed cells), or None if there is nothing to undo."""
+        self.end_stroke()
+        if not self.done:
+            return None
+        edit = self.done.pop()
+        self.undone.append(edit)
+        return self.apply(edit.inverse())
+
+    def redo(self):
+        """Re-apply the last undone command. Returns (layer, changed cells) or None."""
+        self.end_stroke()
+        if not self.undone:
+            return None
+        edit = self.undone.pop()
+        self.done.append(edit)
+        return self.apply(edit)
+
+    def apply(self, edit):
+        self.tile_map[edit.layer].set_cells(edit.xs, edit.ys, edit.new)
+        self.log_edit(edit)
+        return edit.layer, edit.cells()
+
+    # === AUTOSAVE ===
+    def set_meta(self, key, value):
+        self.meta[key] = value
+        self.append_autosave({"type": "meta", "key": key, "value": value})
+
+    def log_edit(self, edit):
+        if self.autosave_file is None:
+            return
+        cells = np.stack((edit.xs, edit.ys, edit.old, edit.new), axis=1).tolist()
+        self.append_autosave({"type": "edit", "layer": edit.layer, "cells": cells})
+        self.logged_cells += len(edit)
+        painted = sum(len(layer) for layer in self.tile_map.layers.values())
+        if self.logged_cells > max(AUTOSAVE_MIN_CELLS, painted):
+            self.compact_autosave()
+
+    def append_autosave(self, record):
+        if self.autosave_file is not None:
+            self.autosave_file.write(json.dumps(record, separators=(",", ":")) + "\n")
+            self.autosave_file.flush()
+
+    def compact_autosave(self):
+        """Rewrite the autosave as one snapshot of the current map, then keep appending to it."""
+        if self.autosave_file is not None:
+            self.autosave_file.close()
+        snapshot = {
+            "type": "snapshot",
+            "width": self.tile_map.width,
+            "height": self.tile_map.height,
+            "layers": {name: [list(cell) for cell in layer.cells()] for name, layer in self.tile_map.layers.items()},
+            "meta": self.meta,
+        }
+        tmp_path = f"{self.autosave_path}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write(json.dumps(snapshot, separators=(",", ":")) + "\n")
+        os.replace(tmp_path, self.autosave_path)
+        self.autosave_file = open(self.autosave_path, "a")
+        self.logged_cells = 0
+
+    def load_autosave(self):
+        """Restore the map from the autosave file; cells outside the current map size are dropped."""
+        with open(self.autosave_path) as f:
+            lines = f.read().splitlines()
+        records = []
+        for idx, line in enumerate(lines):
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                if idx != len(lines) - 1:
+                    raise ValueError(f"{self.autosave_path}: line {idx + 1} is not valid JSON.")
+        if not records or records[0].get("type") != "snapshot":
+            raise ValueError(f"{self.autosave_path} does not start with a snapshot.")
+
+        for record in records:
+            if record["type"] == "snapshot":
+                self.meta = dict(record.get("meta", {}))
+                for name, cells in record["layers"].items():
+                    self.restore_cells(name, [(x, y, value) for x, y, value in cells])
+            elif record["type"] == "edit":
+                self.restore_cells(record["layer"], [(x, y, new) for x, y, _, new in record["cells"]])
+            elif record["type"] == "meta":
+                self.meta[record["key"]] = record["value"]
+
+    def restore_cells(self, name, cells):
+        if name not in self.tile_map.layers:
+            self.tile_map.add_layer(name)
+        layer = self.tile_map[name]
+        cells = [cell for cell in cells if layer.in_bounds(cell[0], cell[1])]
+        if cells:
+            xs, ys, values = zip(*cells)
+            layer.set_cells(xs, ys, values)
+
+    def close(self):
+        self.end_stroke()
+        if self.autosave_file is not None:
+            self.autosave_file.close()
+            self.autosave_file = None
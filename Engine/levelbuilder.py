@@ -0,0 +1,374 @@
+# Headless level builder
+# ======================
+# Placements are canvas positions in pixels, the same coordinates tilemap-v2.py exports. They can come
+# from a CSV (x,y per row, optional header), a JSON list ([x, y] pairs or {"x", "y"} objects, bare or
+# under "enemies"), or a PNG mask where every opaque pixel is one editor grid cell.
+#
+#     python levelbuilder.py --scene MainLevel.json --output-dir variants placements/*.csv
+#     python levelbuilder.py --scene testTile.json layout.png          (edits testTile.json in place)
+#     python levelbuilder.py --jobs jobs.json                          ([{"placements", "scene", "output"}])
+
+import argparse
+import csv
+import json
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from PIL import Image
+
+# Editor grid used to turn PNG mask pixels into positions (matches tilemap-v2.py)
+GRID_SIZE = 40
+GRID_ORIGIN = (90, 230)
+
+# Objects written by a previous export: enemies, or merged colliders plus static enemy sprites.
+# Static sprites must not start with "Enemy": the game treats those as hazards and reads their
+# collision box, which the sprites do not have.
+GENERATED_NAME = re.compile(r"(Enemy|EnemyCollider|StaticEnemy)\d+$")
+
+# Each enemy's own collision box, relative to its cell
+ENEMY_BOX = (0, 10, 30, 30)
+
+
+def enemy_object(name, x, y):
+    """Scene object for one enemy standing at canvas position (x, y)."""
+    return {
+        "components": {
+            "ANIMATEDTEXTURE": {
+                "currAnimation": "run",
+                "currFrame": 0,
+                "filename": "assets/images/enemy.json",
+                "lastFrame": 5
+            },
+            "COLLISION": {
+                "rect": [int(x) + ENEMY_BOX[0], int(y) + ENEMY_BOX[1], ENEMY_BOX[2], ENEMY_BOX[3]],
+                "xOffset": ENEMY_BOX[0],
+                "yOffset": ENEMY_BOX[1]
+            },
+            "TEXTURE": {
+                "angle": 0.0,
+                "destScale": [0.0, 0.0],
+                "filename": "assets/images/enemy_spritesheet.png",
+                "rect": [0, 0, 30, 40],
+                "srcRect": [0, 0, 0, 0]
+            },
+            "TRANSFORM": {
+                "local": [
+                    [1.0, 0.0, float(x)],
+                    [0.0, 1.0, float(y)],
+                    [0.0, 0.0, 1.0]
+                ],
+                "world": [
+                    [1.0, 0.0, 0.0],
+                    [0.0, 1.0, 0.0],
+                    [0.0, 0.0, 1.0]
+                ]
+            }
+        },
+        "name": name,
+        "scripts": ["EnemyScript"]
+    }
+
+
+def sprite_object(name, x, y):
+    """An enemy's texture and animation only: no collision box and no script, so it stays in place."""
+    obj = enemy_object(name, x, y)
+    del obj["components"]["COLLISION"]
+    obj["scripts"] = []
+    return obj
+
+
+def tile_object(name, x, y, tileset, src_rect, solid=False, grid_size=GRID_SIZE):
+    """Static map tile at canvas position (x, y): src_rect = [x, y, w, h] of a tileset, drawn one cell big.
+
+    A solid tile also gets a collision box covering its cell.
+    """
+    obj = {
+        "components": {
+            "TEXTURE": {
+                "angle": 0.0,
+                "destScale": [0.0, 0.0],
+                "filename": tileset,
+                "rect": [0, 0, grid_size, grid_size],
+                "srcRect": [int(v) for v in src_rect]
+            },
+            "TRANSFORM": {
+                "local": [
+                    [1.0, 0.0, float(x)],
+                    [0.0, 1.0, float(y)],
+                    [0.0, 0.0, 1.0]
+                ],
+                "world": [
+                    [1.0, 0.0, 0.0],
+                    [0.0, 1.0, 0.0],
+                    [0.0, 0.0, 1.0]
+                ]
+            }
+        },
+        "name": name,
+        "scripts": []
+    }
+    if solid:
+        obj["components"]["COLLISION"] = {
+            "rect": [int(x), int(y), grid_size, grid_size],
+            "xOffset": 0,
+            "yOffset": 0
+        }
+    return obj
+
+
+def collider_object(name, rect):
+    """Collision-only object covering rect = [x, y, w, h]."""
+    x, y, w, h = (int(v) for v in rect)
+    return {
+        "components": {
+            "COLLISION": {
+                "rect": [x, y, w, h],
+                "xOffset": 0,
+                "yOffset": 0
+            },
+            "TRANSFORM": {
+                "local": [
+                    [1.0, 0.0, float(x)],
+                    [0.0, 1.0, float(y)],
+                    [0.0, 0.0, 1.0]
+                ],
+                "world": [
+                    [1.0, 0.0, 0.0],
+                    [0.0, 1.0, 0.0],
+                    [0.0, 0.0, 1.0]
+                ]
+            }
+        },
+        "name": name,
+        "scripts": []
+    }
+
+
+def merge_cells(occupied):
+    """Greedy meshing: cover the True cells of a 2D bool array with axis-aligned rectangles.
+
+    Scans row-major; each uncovered cell starts a rectangle that grows right as far as it can, then
+    down while the whole span stays occupied. Returns (col, row, width, height) tuples.
+    """
+    remaining = occupied.copy()
+    rows = remaining.shape[0]
+    rects = []
+    for row, col in zip(*np.nonzero(occupied)):
+        if not remaining[row, col]:
+            continue
+        line = remaining[row, col:]
+        width = len(line) if line.all() else int(np.argmin(line))
+        height = 1
+        while row + height < rows and remaining[row + height, col:col + width].all():
+            height += 1
+        remaining[row:row + height, col:col + width] = False
+        rects.append((int(col), int(row), width, height))
+    return rects
+
+
+def merge_colliders(positions, grid_size=GRID_SIZE, origin=GRID_ORIGIN):
+    """Collision rects [x, y, w, h] covering the enemy boxes of all positions.
+
+    Positions on the editor grid are merged into rectangles that span each run of adjacent cells
+    (including the gaps between neighbouring boxes); any off-grid position keeps its own box.
+    """
+    cells, rects = [], []
+    for x, y in positions:
+        col, row = (x - origin[0]) / grid_size, (y - origin[1]) / grid_size
+        if col.is_integer() and row.is_integer():
+            cells.append((int(col), int(row)))
+        else:
+            rects.append([int(x) + ENEMY_BOX[0], int(y) + ENEMY_BOX[1], ENEMY_BOX[2], ENEMY_BOX[3]])
+    if cells:
+        cols, rows = np.array(cells).T
+        first_col, first_row = cols.min(), rows.min()
+        occupied = np.zeros((rows.max() - first_row + 1, cols.max() - first_col + 1), dtype=bool)
+        occupied[rows - first_row, cols - first_col] = True
+        gap_x, gap_y = grid_size - ENEMY_BOX[2], grid_size - ENEMY_BOX[3]
+        for col, row, width, height in merge_cells(occupied):
+            rects.append([origin[0] + int(first_col + col) * grid_size + ENEMY_BOX[0],
+                          origin[1] + int(first_row + row) * grid_size + ENEMY_BOX[1],
+                          width * grid_size - gap_x, height * grid_size - gap_y])
+    return rects
+
+
+def export_enemies(scene_data, positions, merge=False, grid_size=GRID_SIZE, origin=GRID_ORIGIN):
+    """Replace the exported enemies in scene_data with one per (x, y) position.
+
+    With merge, enemies become static sprites (StaticEnemy<n>, without EnemyScript, so they no
+    longer move) plus the fewest collider-only objects covering them (named EnemyCollider<n>, so
+    the game still treats them as hazards). Returns the number of
+    enemies and the number of collision objects written.
+    The object and tree node lists are each rebuilt in a single pass.
+    """
+    scene_tree = scene_data.setdefault("sceneTree", {})
+    objects = [obj for obj in scene_tree.get("objects", []) if not GENERATED_NAME.match(obj.get("name", ""))]
+    tree_nodes = [node for node in scene_tree.get("treeNodes", []) if not GENERATED_NAME.match(node.get("objName", ""))]
+
+    def add(obj):
+        objects.append(obj)
+        tree_nodes.append({
+            "name": obj["name"].lower(),
+            "objName": obj["name"],
+            "parent": 0
+        })
+
+    if merge:
+        for sprite_count, (x, y) in enumerate(positions):
+            add(sprite_object(f"StaticEnemy{sprite_count}", x, y))
+        colliders = merge_colliders(positions, grid_size, origin)
+        for collider_count, rect in enumerate(colliders):
+            add(collider_object(f"EnemyCollider{collider_count}", rect))
+        collider_total = len(colliders)
+    else:
+        for enemy_count, (x, y) in enumerate(positions):
+            add(enemy_object(f"Enemy{enemy_count}", x, y))
+        collider_total = len(positions)
+
+    scene_tree["objects"] = objects
+    scene_tree["treeNodes"] = tree_nodes
+    return len(positions), collider_total
+
+
+def write_scene(path, scene_data, compact=False):
+    """Write a scene atomically so a failed export never leaves it half-written."""
+    # dumps() encodes in one go instead of dump()'s many small writes; without indent it runs
+    # entirely in the C encoder, so compact is the fast path for large levels
+    if compact:
+        text = json.dumps(scene_data, separators=(",", ":"))
+    else:
+        text = json.dumps(scene_data, indent=2)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+
+
+# === PLACEMENT LOADING ===
+def load_placements_csv(path):
+    positions = []
+    with open(path, newline="") as f:
+        for row in csv.reader(f):
+            if not row or not row[0].strip():
+                continue
+            try:
+                positions.append((float(row[0]), float(row[1])))
+            except ValueError:
+                if positions:
+                    raise ValueError(f"{path}: bad row {row}")
+                # header line
+    return positions
+
+
+def load_placements_json(path):
+    with open(path) as f:
+        data = json.load(f)
+    if isinstance(data, dict):
+        data = data["enemies"]
+    return [(float(p["x"]), float(p["y"])) if isinstance(p, dict) else (float(p[0]), float(p[1])) for p in data]
+
+
+def load_placements_mask(path, grid_size=GRID_SIZE, origin=GRID_ORIGIN):
+    """One position per opaque pixel (or non-black pixel, for masks without alpha), row by row."""
+    image = Image.open(path)
+    if "A" in image.getbands():
+        mask = np.asarray(image.getchannel("A")) > 0
+    else:
+        mask = np.asarray(image.convert("L")) > 0
+    rows, cols = np.nonzero(mask)
+    return [(origin[0] + col * grid_size, origin[1] + row * grid_size)
+            for row, col in zip(rows.tolist(), cols.tolist())]
+
+
+def load_placements(path, grid_size=GRID_SIZE, origin=GRID_ORIGIN):
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".csv":
+        return load_placements_csv(path)
+    if extension == ".json":
+        return load_placements_json(path)
+    if extension == ".png":
+        return load_placements_mask(path, grid_size, origin)
+    raise ValueError(f"Unsupported placement file: {path} (expected .csv, .json or .png)")
+
+
+# === BUILDING ===
+def build_level(job):
+    """Merge one placement file into a scene; job is a dict with placements, scene, output and options.
+
+    Runs in a worker process, so it only takes and returns plain data.
+    """
+    positions = load_placements(job["placements"], job.get("gridSize", GRID_SIZE), job.get("origin", GRID_ORIGIN))
+    with open(job["scene"]) as f:
+        scene_data = json.load(f)
+    enemy_count, collider_count = export_enemies(scene_data, positions, job.get("merge", False),
+                                                 job.get("gridSize", GRID_SIZE), job.get("origin", GRID_ORIGIN))
+    write_scene(job["output"], scene_data, job.get("compact", False))
+    return job["output"], enemy_count, collider_count
+
+
+def build_levels(jobs, workers=None):
+    """Build every job, across a process pool when there is more than one.
+
+    Yields (output, enemy_count, collider_count) in job order.
+    """
+    if workers == 1 or len(jobs) <= 1:
+        yield from map(build_level, jobs)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        yield from pool.map(build_level, jobs)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Merge enemy placements (CSV, JSON or PNG mask) into scene files.")
+    parser.add_argument("placements", nargs="*", help="placement files (.csv, .json or .png)")
+    parser.add_argument("--scene", default="testTile.json", help="scene the enemies are merged into (default: testTile.json)")
+    parser.add_argument("--output-dir",
+                        help="write <placements name>.json here for every placement file instead of editing --scene in place")
+    parser.add_argument("--jobs", help="JSON list of {\"placements\", \"scene\", \"output\"} jobs, built alongside any placement files")
+    parser.add_argument("--compact", action="store_true", help="write scenes without indentation")
+    parser.add_argument("--merge-colliders", action="store_true",
+                        help="merge adjacent enemy boxes into large collider-only objects; enemies lose "
+                             "EnemyScript and become static sprites that no longer move")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(),
+                        help="parallel worker processes (default: one per CPU)")
+    parser.add_argument("--grid-size", type=int, default=GRID_SIZE, help="PNG mask cell size in pixels (default: 40)")
+    parser.add_argument("--origin", type=int, nargs=2, default=GRID_ORIGIN, metavar=("X", "Y"),
+                        help="position of PNG mask pixel (0, 0) (default: 90 230)")
+    args = parser.parse_args()
+
+    options = {"compact": args.compact, "merge": args.merge_colliders, "gridSize": args.grid_size,
+               "origin": tuple(args.origin)}
+    jobs = []
+    if args.jobs:
+        with open(args.jobs) as f:
+            jobs = [dict(options, **job) for job in json.load(f)]
+    if args.placements:
+        if args.output_dir:
+            os.makedirs(args.output_dir, exist_ok=True)
+            outputs = [os.path.join(args.output_dir, os.path.splitext(os.path.basename(path))[0] + ".json")
+                       for path in args.placements]
+        elif len(args.placements) == 1:
+            outputs = [args.scene]
+        else:
+            parser.error("Several placement files need --output-dir, or they would overwrite the same scene.")
+        jobs += [dict(options, placements=path, scene=args.scene, output=output)
+                 for path, output in zip(args.placements, outputs)]
+    if not jobs:
+        parser.error("Nothing to build: pass placement files or --jobs.")
+
+    total = total_colliders = 0
+    for output, enemy_count, collider_count in build_levels(jobs, args.workers):
+        if args.merge_colliders:
+            print(f"{output}: {enemy_count} enemies, colliders {enemy_count} -> {collider_count}")
+        else:
+            print(f"{output}: {enemy_count} enemies")
+        total += enemy_count
+        total_colliders += collider_count
+    print(f"Built {len(jobs)} scenes with {total} enemies and {total_colliders} colliders.")
+
+
+if __name__ == "__main__":
+    main()
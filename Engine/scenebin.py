@@ -0,0 +1,462 @@
+import argparse
+import glob
+import json
+import mmap
+import os
+import struct
+import time
+
+# Binary scene format (.scnb)
+# ===========================
+# Little-endian. Every section starts on an 8-byte boundary, so the file can be memory-mapped and
+# read in place; strings are stored once and referenced by index everywhere else.
+#
+#   header      "SCNB", u16 version, u16 flags, u32 root, then (u32 offset, u32 count) per section
+#   strings     count x (u32 offset, u32 length) into the UTF-8 blob that follows the table
+#   objects     count x (u32 name, u32 first component, u32 component count, u32 scripts)
+#   components  count x (u32 type, u32 name, u32 data offset)
+#   data        fixed-layout component records, one per COMPONENT_SCHEMAS entry
+#   tree nodes  count x (u32 name, u32 objName, i32 parent)
+#   values      tagged values for everything without a fixed layout
+#
+# root, object scripts and components of type GENERIC are offsets into values. Fixed records are
+# only used for objects with exactly components/name/scripts, tree nodes with exactly
+# name/objName/parent, and components whose keys and value types match the schema; everything
+# else falls back to tagged values, so any JSON document round-trips exactly. In the root document,
+# sceneTree's "objects" and "treeNodes" are left out and rebuilt from the sections (flags say
+# which were present).
+
+MAGIC = b"SCNB"
+VERSION = 1
+NONE = 0xFFFFFFFF
+
+SECTIONS = ("strings", "objects", "components", "data", "treeNodes", "values")
+HEADER = struct.Struct("<4sHHI" + "II" * len(SECTIONS))
+STRING_ENTRY = struct.Struct("<II")
+OBJECT_ENTRY = struct.Struct("<IIII")
+COMPONENT_ENTRY = struct.Struct("<III")
+TREE_NODE_ENTRY = struct.Struct("<IIi")
+
+HAS_OBJECTS = 1
+HAS_TREE_NODES = 2
+
+# Field kinds: struct code and the exact Python type accepted
+KINDS = {"i32": ("i", int), "f64": ("d", float), "bool": ("?", bool), "str": ("I", str)}
+
+# (key, kind, shape, optional) per field, in the order the engine writes them. shape is None for
+# a scalar, n for a list of n values, or (rows, columns) for a matrix stored as nested lists.
+COMPONENT_SCHEMAS = {
+    "TRANSFORM": [("local", "f64", (3, 3), False), ("world", "f64", (3, 3), False)],
+    "COLLISION": [("rect", "i32", 4, False), ("xOffset", "i32", None, False), ("yOffset", "i32", None, False)],
+    "TEXTURE": [("angle", "f64", None, False), ("destScale", "f64", 2, False), ("filename", "str", None, True),
+                ("rect", "i32", 4, False), ("srcRect", "i32", 4, False)],
+    "ANIMATEDTEXTURE": [("currAnimation", "str", None, False), ("currFrame", "i32", None, False),
+                        ("filename", "str", None, False), ("lastFrame", "i32", None, False)],
+    "TEXT": [("color", "i32", 4, False), ("dynamic", "bool", None, False), ("fontFile", "str", None, False),
+             ("size", "i32", None, False), ("text", "str", None, False)],
+}
+GENERIC = 0
+COMPONENT_TYPES = ["GENERIC"] + list(COMPONENT_SCHEMAS)
+
+
+def field_size(shape):
+    if shape is None:
+        return 1
+    return shape if isinstance(shape, int) else shape[0] * shape[1]
+
+
+RECORDS = {name: struct.Struct("<" + "".join(KINDS[kind][0] * field_size(shape) for _, kind, shape, _ in fields))
+           for name, fields in COMPONENT_SCHEMAS.items()}
+
+# Tagged values
+T_NULL, T_FALSE, T_TRUE, T_INT, T_FLOAT, T_STR, T_LIST, T_DICT = range(8)
+U8 = struct.Struct("<B")
+U32 = struct.Struct("<I")
+I64 = struct.Struct("<q")
+F64 = struct.Struct("<d")
+
+
+def align(n, to=8):
+    return (n + to - 1) // to * to
+
+
+def is_scalar(value, kind):
+    expected = KINDS[kind][1]
+    if type(value) is not expected:
+        return False
+    return kind != "i32" or -2**31 <= value < 2**31
+
+
+# === ENCODING ===
+class Encoder:
+    def __init__(self):
+        self.strings = {}
+        self.values = bytearray()
+
+    def string(self, text):
+        sid = self.strings.get(text)
+        if sid is None:
+            sid = self.strings[text] = len(self.strings)
+        return sid
+
+    def value(self, value):
+        """Append a tagged value; returns its offset in the values section."""
+        offset = len(self.values)
+        self._write_value(value)
+        return offset
+
+    def _write_value(self, value):
+        out = self.values
+        if value is None:
+            out += U8.pack(T_NULL)
+        elif value is True or value is False:
+            out += U8.pack(T_TRUE if value else T_FALSE)
+        elif type(value) is int and -2**63 <= value < 2**63:
+            out += U8.pack(T_INT) + I64.pack(value)
+        elif type(value) is float:
+            out += U8.pack(T_FLOAT) + F64.pack(value)
+        elif type(value) is str:
+            out += U8.pack(T_STR) + U32.pack(self.string(value))
+        elif type(value) is list:
+            out += U8.pack(T_LIST) + U32.pack(len(value))
+            for item in value:
+                self._write_value(item)
+        elif type(value) is dict:
+            out += U8.pack(T_DICT) + U32.pack(len(value))
+            for key, item in value.items():
+                out += U32.pack(self.string(key))
+                self._write_value(item)
+        else:
+            raise TypeError(f"Cannot encode {type(value).__name__} value {value!r}")
+
+    def record(self, name, component):
+        """Pack a component into its fixed record, or return None if it does not match the schema."""
+        fields = COMPONENT_SCHEMAS.get(name)
+        if fields is None or type(component) is not dict:
+            return None
+        if list(component) != [key for key, _, _, _ in fields if key in component]:
+            return None  # unknown keys, or known ones in another order
+        values = []
+        for key, kind, shape, optional in fields:
+            if key not in component:
+                if not optional:
+                    return None
+                values.append(NONE)
+                continue
+            flat = flatten(component[key], shape)
+            if flat is None or not all(is_scalar(v, kind) for v in flat):
+                return None
+            if kind == "str":
+                flat = [self.string(v) for v in flat]
+            values.extend(flat)
+        return RECORDS[name].pack(*values)
+
+
+def flatten(value, shape):
+    """The scalars of a field value as a flat list, or None if the value does not have that shape."""
+    if shape is None:
+        return [value]
+    if type(value) is not list:
+        return None
+    if isinstance(shape, int):
+        return value if len(value) == shape else None
+    rows, columns = shape
+    if len(value) != rows or not all(type(row) is list and len(row) == columns for row in value):
+        return None
+    return [v for row in value for v in row]
+
+
+def unflatten(flat, shape):
+    if shape is None:
+        return flat[0]
+    if isinstance(shape, int):
+        return flat
+    columns = shape[1]
+    return [flat[i:i + columns] for i in range(0, len(flat), columns)]
+
+
+def encode(document):
+    """Encode any JSON document; scenes get fixed-layout objects, components and tree nodes."""
+    encoder = Encoder()
+    objects, components, data, tree_nodes = bytearray(), bytearray(), bytearray(), bytearray()
+    object_count = component_count = tree_node_count = 0
+    flags = 0
+    root = document
+
+    scene_tree = document.get("sceneTree") if type(document) is dict else None
+    if type(scene_tree) is dict:
+        rest = dict(scene_tree)
+        object_list = rest.pop("objects", None)
+        if type(object_list) is list and all(is_plain_object(obj) for obj in object_list):
+            flags |= HAS_OBJECTS
+            for obj in object_list:
+                first = component_count
+                for name, component in obj["components"].items():
+                    record = encoder.record(name, component)
+                    if record is None:
+                        components += COMPONENT_ENTRY.pack(GENERIC, encoder.string(name), encoder.value(component))
+                    else:
+                        components += COMPONENT_ENTRY.pack(COMPONENT_TYPES.index(name), encoder.string(name), len(data))
+                        data += record
+                        data += bytes(align(len(data)) - len(data))
+                    component_count += 1
+                objects += OBJECT_ENTRY.pack(encoder.string(obj["name"]), first, component_count - first,
+                                             encoder.value(obj["scripts"]))
+                object_count += 1
+        elif "objects" in scene_tree:
+            rest["objects"] = object_list
+
+        node_list = rest.pop("treeNodes", None)
+        if type(node_list) is list and all(is_plain_tree_node(node) for node in node_list):
+            flags |= HAS_TREE_NODES
+            for node in node_list:
+                tree_nodes += TREE_NODE_ENTRY.pack(encoder.string(node["name"]), encoder.string(node["objName"]),
+                                                   node["parent"])
+            tree_node_count = len(node_list)
+        elif "treeNodes" in scene_tree:
+            rest["treeNodes"] = node_list
+        # Keep sceneTree's position among the top-level keys
+        root = {key: (rest if key == "sceneTree" else value) for key, value in document.items()}
+
+    root_offset = encoder.value(root)
+    values = encoder.values
+
+    strings = list(encoder.strings)
+    blob = bytearray()
+    table = bytearray()
+    for text in strings:
+        encoded = text.encode("utf-8")
+        table += STRING_ENTRY.pack(len(blob), len(encoded))
+        blob += encoded
+    string_section = table + blob
+
+    sections = [(string_section, len(strings)), (objects, object_count), (components, component_count),
+                (data, len(data)), (tree_nodes, tree_node_count), (values, len(values))]
+    out = bytearray(align(HEADER.size))
+    offsets = []
+    for section, count in sections:
+        out += bytes(align(len(out)) - len(out))
+        offsets += [len(out), count]
+        out += section
+    out[:HEADER.size] = HEADER.pack(MAGIC, VERSION, flags, root_offset, *offsets)
+    return bytes(out)
+
+
+def is_plain_object(obj):
+    return (type(obj) is dict and list(obj) == ["components", "name", "scripts"]
+            and type(obj["name"]) is str and type(obj["components"]) is dict)
+
+
+def is_plain_tree_node(node):
+    return (type(node) is dict and list(node) == ["name", "objName", "parent"] and type(node["name"]) is str
+            and type(node["objName"]) is str and is_scalar(node["parent"], "i32"))
+
+
+# === DECODING ===
+class SceneFile:
+    """Read-only view of an encoded scene, over bytes or a memory map.
+
+    Objects are only decoded when asked for; object_names() and find() touch just the object index
+    and string table.
+    """
+    def __init__(self, buffer):
+        self.buffer = buffer
+        fields = HEADER.unpack_from(buffer, 0)
+        magic, version, self.flags, self.root = fields[:4]
+        if magic != MAGIC:
+            raise ValueError("Not a binary scene file.")
+        if version != VERSION:
+            raise ValueError(f"Unsupported binary scene version {version}.")
+        self.sections = {name: (fields[4 + 2 * i], fields[5 + 2 * i]) for i, name in enumerate(SECTIONS)}
+        self._strings = {}
+
+    @classmethod
+    def open(cls, path):
+        """Memory-map a .scnb file."""
+        with open(path, "rb") as f:
+            return cls(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+
+    def string(self, sid):
+        text = self._strings.get(sid)
+        if text is None:
+            table, count = self.sections["strings"]
+            offset, length = STRING_ENTRY.unpack_from(self.buffer, table + sid * STRING_ENTRY.size)
+            start = table + count * STRING_ENTRY.size + offset
+            text = self._strings[sid] = bytes(self.buffer[start:start + length]).decode("utf-8")
+        return text
+
+    def value(self, offset):
+        return self._read_value(self.sections["values"][0] + offset)[0]
+
+    def _read_value(self, pos):
+        buffer = self.buffer
+        tag = buffer[pos]
+        pos += 1
+        if tag == T_NULL:
+            return None, pos
+        if tag == T_FALSE or tag == T_TRUE:
+            return tag == T_TRUE, pos
+        if tag == T_INT:
+            return I64.unpack_from(buffer, pos)[0], pos + 8
+        if tag == T_FLOAT:
+            return F64.unpack_from(buffer, pos)[0], pos + 8
+        if tag == T_STR:
+            return self.string(U32.unpack_from(buffer, pos)[0]), pos + 4
+        count = U32.unpack_from(buffer, pos)[0]
+        pos += 4
+        if tag == T_LIST:
+            items = []
+            for _ in range(count):
+                item, pos = self._read_value(pos)
+                items.append(item)
+            return items, pos
+        if tag == T_DICT:
+            items = {}
+            for _ in range(count):
+                key = self.string(U32.unpack_from(buffer, pos)[0])
+                items[key], pos = self._read_value(pos + 4)
+            return items, pos
+        raise ValueError(f"Bad value tag {tag} at {pos - 1}.")
+
+    def object_count(self):
+        return self.sections["objects"][1]
+
+    def _object_entry(self, idx):
+        return OBJECT_ENTRY.unpack_from(self.buffer, self.sections["objects"][0] + idx * OBJECT_ENTRY.size)
+
+    def object_names(self):
+        return [self.string(self._object_entry(idx)[0]) for idx in range(self.object_count())]
+
+    def find(self, name):
+        """Index of the first object called name, or None."""
+        for idx in range(self.object_count()):
+            if self.string(self._object_entry(idx)[0]) == name:
+                return idx
+        return None
+
+    def component(self, idx):
+        type_code, name_sid, offset = COMPONENT_ENTRY.unpack_from(
+            self.buffer, self.sections["components"][0] + idx * COMPONENT_ENTRY.size)
+        name = self.string(name_sid)
+        if type_code == GENERIC:
+            return name, self.value(offset)
+        type_name = COMPONENT_TYPES[type_code]
+        values = iter(RECORDS[type_name].unpack_from(self.buffer, self.sections["data"][0] + offset))
+        component = {}
+        for key, kind, shape, optional in COMPONENT_SCHEMAS[type_name]:
+            flat = [next(values) for _ in range(field_size(shape))]
+            if kind == "str":
+                if optional and flat[0] == NONE:
+                    continue
+                flat = [self.string(v) for v in flat]
+            component[key] = unflatten(flat, shape)
+        return name, component
+
+    def object(self, idx):
+        name_sid, first, count, scripts = self._object_entry(idx)
+        return {
+            "components": dict(self.component(first + i) for i in range(count)),
+            "name": self.string(name_sid),
+            "scripts": self.value(scripts)
+        }
+
+    def tree_nodes(self):
+        offset, count = self.sections["treeNodes"]
+        return [{"name": self.string(name), "objName": self.string(obj_name), "parent": parent}
+                for name, obj_name, parent in (TREE_NODE_ENTRY.unpack_from(self.buffer, offset + i * TREE_NODE_ENTRY.size)
+                                               for i in range(count))]
+
+    def document(self):
+        """Decode everything back into the original JSON document."""
+        root = self.value(self.root)
+        if self.flags & (HAS_OBJECTS | HAS_TREE_NODES):
+            rest = root["sceneTree"]
+            scene_tree = {}
+            if self.flags & HAS_OBJECTS:
+                scene_tree["objects"] = [self.object(idx) for idx in range(self.object_count())]
+            if self.flags & HAS_TREE_NODES:
+                scene_tree["treeNodes"] = self.tree_nodes()
+            scene_tree.update(rest)
+            root["sceneTree"] = scene_tree
+        return root
+
+
+def decode(buffer):
+    return SceneFile(buffer).document()
+
+
+# === CLI ===
+def scene_files(directory="."):
+    """JSON files in directory that are scenes (have a sceneTree)."""
+    scenes = []
+    for path in sorted(glob.glob(os.path.join(directory, "*.json"))):
+        try:
+            with open(path) as f:
+                if "sceneTree" in json.load(f):
+                    scenes.append(path)
+        except (OSError, ValueError, TypeError):
+            pass
+    return scenes
+
+
+def best_time(function, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def benchmark(paths, repeat=50):
+    print(f"{'scene':<32}{'json':>9}{'scnb':>9}{'json load':>12}{'scnb load':>12}{'scnb index':>12}")
+    for path in paths:
+        with open(path, "rb") as f:
+            text = f.read()
+        document = json.loads(text)
+        binary = encode(document)
+        if decode(binary) != document:
+            raise ValueError(f"{path}: round trip mismatch")
+        json_time = best_time(lambda: json.loads(text), repeat)
+        binary_time = best_time(lambda: decode(binary), repeat)
+        index_time = best_time(lambda: SceneFile(binary).object_names(), repeat)
+        print(f"{os.path.basename(path):<32}{len(text):>9}{len(binary):>9}"
+              f"{json_time * 1e3:>10.3f}ms{binary_time * 1e3:>10.3f}ms{index_time * 1e3:>10.3f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert scenes between JSON and the binary .scnb format.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    encode_parser = subparsers.add_parser("encode", help="JSON to .scnb")
+    encode_parser.add_argument("inputs", nargs="+", help="JSON files; each is written next to itself as .scnb")
+
+    decode_parser = subparsers.add_parser("decode", help=".scnb to JSON")
+    decode_parser.add_argument("input")
+    decode_parser.add_argument("output", help="JSON file to write")
+
+    bench_parser = subparsers.add_parser("bench", help="compare size and load time against JSON")
+    bench_parser.add_argument("inputs", nargs="*", help="scene JSON files (default: every scene in this directory)")
+    bench_parser.add_argument("--repeat", type=int, default=50, help="runs per measurement, best is kept (default: 50)")
+    args = parser.parse_args()
+
+    if args.command == "encode":
+        for path in args.inputs:
+            with open(path) as f:
+                document = json.load(f)
+            output = os.path.splitext(path)[0] + ".scnb"
+            binary = encode(document)
+            with open(output, "wb") as f:
+                f.write(binary)
+            print(f"{path} -> {output} ({os.path.getsize(path)} -> {len(binary)} bytes)")
+    elif args.command == "decode":
+        scene = SceneFile.open(args.input)
+        with open(args.output, "w") as f:
+            json.dump(scene.document(), f, indent=4)
+        print(f"{args.input} -> {args.output}")
+    else:
+        benchmark(args.inputs or scene_files(), args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,279 @@
+import argparse
+import cv2
+import numpy as np
+import json
+import math
+import os
+import sys
+
+# Delta cutscene format
+# =====================
+# Instead of one full cell per frame, the atlas pages hold keyframes (whole frames) and, for every
+# other frame, only the rectangles that changed since the previous frame. Metadata:
+#
+#   "format":    {"type": "delta", "tileWidth", "tileHeight", "blockSize", "keyframeInterval", "tolerance"}
+#   "pages":     [{"filepath", "width", "height"}, ...]
+#   "keyframes": frame indices that are drawn whole (playback can start or seek to any of them)
+#   "deltas":    per frame, the blits [page, srcX, srcY, width, height, dstX, dstY] to draw on top of
+#                the previous frame; an empty list means the frame repeats the previous one
+#
+# With the default tolerance of 0 frames are compared exactly, so with lossless pages every frame
+# decodes bit-for-bit; otherwise every decoded pixel is within tolerance of the source.
+
+
+def dirty_rects(previous, frame, block_size, tolerance=0):
+    """Rectangles (x, y, w, h) covering every pixel that differs by more than tolerance between two frames.
+
+    Changed pixels are rounded out to block_size blocks, then runs of dirty blocks in each block row
+    are merged with identical runs in the rows below into larger rectangles.
+    """
+    height, width = frame.shape[:2]
+    if tolerance:
+        changed = np.any(cv2.absdiff(previous, frame) > tolerance, axis=2)
+    else:
+        changed = np.any(previous != frame, axis=2)
+    block_rows = math.ceil(height / block_size)
+    block_cols = math.ceil(width / block_size)
+    padded = np.zeros((block_rows * block_size, block_cols * block_size), dtype=bool)
+    padded[:height, :width] = changed
+    blocks = padded.reshape(block_rows, block_size, block_cols, block_size).any(axis=(1, 3))
+
+    rects = []
+    open_runs = {}  # (first_col, end_col) -> [first_row, row_count]
+    for row in range(block_rows + 1):
+        runs = set()
+        if row < block_rows:
+            cols = np.flatnonzero(blocks[row])
+            if cols.size:
+                # Split the dirty columns into contiguous runs
+                breaks = np.flatnonzero(np.diff(cols) > 1)
+                starts = np.concatenate(([cols[0]], cols[breaks + 1]))
+                ends = np.concatenate((cols[breaks], [cols[-1]])) + 1
+                runs = set(zip(starts.tolist(), ends.tolist()))
+        for run in list(open_runs):
+            if run in runs:
+                open_runs[run][1] += 1
+                runs.discard(run)
+            else:
+                first_row, row_count = open_runs.pop(run)
+                rects.append((run[0], first_row, run[1] - run[0], row_count))
+        for run in runs:
+            open_runs[run] = [row, 1]
+
+    # Block units to pixels, clipped to the frame
+    pixel_rects = []
+    for col, row, cols, rows in rects:
+        x, y = col * block_size, row * block_size
+        pixel_rects.append((x, y, min(cols * block_size, width - x), min(rows * block_size, height - y)))
+    return pixel_rects
+
+
+class SkylinePacker:
+    """Bottom-left skyline packing of rectangles into a fixed-size page, in arrival order."""
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        self.skyline = [[0, 0, width]]  # [x, y, segment_width], left to right
+        self.used_width = self.used_height = 0
+
+    def place(self, w, h):
+        """Return the (x, y) of the lowest slot that fits w x h, or None if the page is full."""
+        best = None
+        for i, (x, _, _) in enumerate(self.skyline):
+            if x + w > self.width:
+                break
+            # The rect rests on the highest segment it spans
+            y, span, j = 0, 0, i
+            while span < w:
+                y = max(y, self.skyline[j][1])
+                span += self.skyline[j][2] - (x - self.skyline[j][0] if j == i else 0)
+                j += 1
+            if y + h <= self.height and (best is None or y + h < best[1] + h):
+                best = (x, y)
+        if best is None:
+            return None
+
+        x, y = best
+        # Raise the skyline under the new rect, splitting the segment it ends inside
+        new_skyline = []
+        for sx, sy, sw in self.skyline:
+            if sx + sw <= x or sx >= x + w:
+                new_skyline.append([sx, sy, sw])
+                continue
+            if sx < x:
+                new_skyline.append([sx, sy, x - sx])
+            if sx + sw > x + w:
+                new_skyline.append([x + w, sy, sx + sw - (x + w)])
+        new_skyline.append([x, y + h, w])
+        new_skyline.sort()
+        # Merge neighbours at the same height to keep the skyline short
+        self.skyline = [new_skyline[0]]
+        for segment in new_skyline[1:]:
+            if segment[1] == self.skyline[-1][1]:
+                self.skyline[-1][2] += segment[2]
+            else:
+                self.skyline.append(segment)
+
+        self.used_width = max(self.used_width, x + w)
+        self.used_height = max(self.used_height, y + h)
+        return x, y
+
+
+class DeltaEncoder:
+    """Encodes a stream of frames into skyline-packed delta atlas pages.
+
+    encode() yields (page_idx, page_image) as each page fills; afterwards pages, keyframes and
+    deltas hold the metadata. Page images are only valid until the next page is requested.
+    With tolerance > 0, changes of at most that much per channel are dropped; each frame is diffed
+    against what the decoder will actually show, so the error never builds up past tolerance.
+    """
+    def __init__(self, tile_width, tile_height, page_width, page_height, keyframe_interval=30,
+                 block_size=16, keyframe_ratio=0.5, tolerance=0):
+        if tile_width > page_width or tile_height > page_height:
+            raise ValueError("Frames do not fit on a page; raise the page size.")
+        self.tile_width = tile_width
+        self.tile_height = tile_height
+        self.page_width = page_width
+        self.page_height = page_height
+        self.keyframe_interval = keyframe_interval
+        self.block_size = block_size
+        self.keyframe_ratio = keyframe_ratio
+        self.tolerance = tolerance
+
+        self.pages = []
+        self.keyframes = []
+        self.deltas = []
+
+        self.packer = None
+        self.page_image = None
+
+    def _flush(self):
+        page_image = self.page_image[:self.packer.used_height, :self.packer.used_width]
+        self.pages.append({"width": self.packer.used_width, "height": self.packer.used_height})
+        self.packer = self.page_image = None
+        return len(self.pages) - 1, page_image
+
+    def _place(self, width, height):
+        """Reserve a width x height slot; returns (x, y, finished_page_or_None)."""
+        finished = None
+        position = self.packer.place(width, height) if self.packer is not None else None
+        if position is None:
+            if self.packer is not None:
+                finished = self._flush()
+            self.packer = SkylinePacker(self.page_width, self.page_height)
+            # Grown on demand up to page_height, so short cutscenes don't allocate a full page
+            self.page_image = np.zeros((min(self.page_height, self.tile_height), self.page_width, 3),
+                                       dtype=np.uint8)
+            position = self.packer.place(width, height)
+
+        x, y = position
+        if y + height > self.page_image.shape[0]:
+            grown = np.zeros((min(self.page_height, max(y + height, 2 * self.page_image.shape[0])),
+                              self.page_width, 3), dtype=np.uint8)
+            grown[:self.page_image.shape[0]] = self.page_image
+            self.page_image = grown
+        return x, y, finished
+
+    def encode(self, frames):
+        canvas = np.zeros((self.tile_height, self.tile_width, 3), dtype=np.uint8)
+        for frame_idx, frame in enumerate(frames):
+            rects = None
+            if frame_idx % self.keyframe_interval != 0:
+                rects = dirty_rects(canvas, frame, self.block_size, self.tolerance)
+                dirty_area = sum(w * h for _, _, w, h in rects)
+                if dirty_area > self.keyframe_ratio * self.tile_width * self.tile_height:
+                    # Cheaper to store (and to seek to) the whole frame
+                    rects = None
+            if rects is None:
+                rects = [(0, 0, self.tile_width, self.tile_height)]
+                self.keyframes.append(frame_idx)
+
+            blits = []
+            # Tallest first packs tighter
+            for x, y, w, h in sorted(rects, key=lambda rect: -rect[3]):
+                px, py, finished = self._place(w, h)
+                if finished is not None:
+                    yield finished
+                self.page_image[py:py + h, px:px + w] = frame[y:y + h, x:x + w]
+                canvas[y:y + h, x:x + w] = frame[y:y + h, x:x + w]
+                blits.append([len(self.pages), px, py, w, h, x, y])
+            self.deltas.append(blits)
+
+        if self.packer is not None:
+            yield self._flush()
+
+
+def decode_frames(metadata, load_page=cv2.imread):
+    """Reference decoder: yield every frame of a delta cutscene in order.
+
+    Only the page the current blit reads from is kept loaded. The yielded frame is the decoder's
+    canvas, so copy it before advancing.
+    """
+    fmt = metadata["format"]
+    canvas = np.zeros((fmt["tileHeight"], fmt["tileWidth"], 3), dtype=np.uint8)
+    loaded_idx, loaded = None, None
+    for blits in metadata["deltas"]:
+        for page_idx, sx, sy, w, h, dx, dy in blits:
+            if page_idx != loaded_idx:
+                loaded_idx, loaded = page_idx, load_page(metadata["pages"][page_idx]["filepath"])
+            canvas[dy:dy + h, dx:dx + w] = loaded[sy:sy + h, sx:sx + w]
+        yield canvas
+
+
+def verify(metadata, source_frames, tolerance=0):
+    """Decode every frame and compare it with the source. Returns a list of (frame_idx, max_abs_diff) failures."""
+    failures = []
+    frame_count = 0
+    for frame_idx, (decoded, source) in enumerate(zip(decode_frames(metadata), source_frames)):
+        diff = int(np.abs(decoded.astype(np.int16) - source.astype(np.int16)).max())
+        if diff > tolerance:
+            failures.append((frame_idx, diff))
+        frame_count += 1
+    if frame_count != len(metadata["deltas"]):
+        failures.append((frame_count, None))
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Decode or verify a delta-format cutscene.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    decode_parser = subparsers.add_parser("decode", help="write every frame of a delta cutscene as a PNG")
+    decode_parser.add_argument("metadata", help="path of a <name>_delta_metadata.json file")
+    decode_parser.add_argument("output_dir")
+
+    verify_parser = subparsers.add_parser("verify", help="check every decoded frame against the source video")
+    verify_parser.add_argument("metadata", help="path of a <name>_delta_metadata.json file")
+    verify_parser.add_argument("--tolerance", type=int,
+                               help="largest per-channel difference accepted (default: the tolerance it was encoded with)")
+    args = parser.parse_args()
+
+    with open(args.metadata) as f:
+        metadata = json.load(f)
+
+    if args.command == "decode":
+        os.makedirs(args.output_dir, exist_ok=True)
+        for frame_idx, frame in enumerate(decode_frames(metadata)):
+            cv2.imwrite(os.path.join(args.output_dir, f"frame_{frame_idx:05d}.png"), frame)
+        print(f"Decoded {len(metadata['deltas'])} frames to: {args.output_dir}")
+        return
+
+    # Re-extract the source frames exactly as the encoder saw them
+    import video2cutscene
+    source = metadata["source"]
+    frames = video2cutscene.iter_frames(video2cutscene.extract_pages(source["video"], source["targetFps"],
+                                                                     source["decimate"],
+                                                                     max_frames=source.get("maxFrames")),
+                                        metadata["format"]["tileWidth"], metadata["format"]["tileHeight"])
+    tolerance = metadata["format"].get("tolerance", 0) if args.tolerance is None else args.tolerance
+    failures = verify(metadata, frames, tolerance)
+    if failures:
+        for frame_idx, diff in failures[:20]:
+            print(f"Frame {frame_idx}: " + ("frame count mismatch" if diff is None else f"max difference {diff}"))
+        print(f"FAILED: {len(failures)} of {len(metadata['deltas'])} frames differ")
+        sys.exit(1)
+    print(f"OK: all {len(metadata['deltas'])} frames match the source")
+
+
+if __name__ == "__main__":
+    main()
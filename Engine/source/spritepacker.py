@@ -0,0 +1,332 @@
+import argparse
+import hashlib
+import json
+import os
+
+import numpy as np
+from PIL import Image
+
+import texturecodec
+
+MAX_PAGE_SIZE = 2048
+DEFAULT_OUTPUT_DIR = "../assets/images/packed"
+
+# Packed sprite metadata
+# ======================
+# The usual "filepath"/"format"/"frames" document, where "filepath" and format width/height describe the
+# atlas page and tileWidth/tileHeight keep the original (untrimmed) frame size. "frames" keeps the
+# original frame numbers. One extra list, "sprites", indexed by frame number:
+#
+#   "sprites": [{"rect": [x, y, w, h], "offset": [x, y]}, ...]
+#
+# rect is the trimmed frame on the page; offset is where that rect sits inside the untrimmed
+# tileWidth x tileHeight cell. All frames of one sheet land on the same page, since an object draws
+# from a single texture.
+#
+# With quality tiers (see texturecodec.py) every tier is packed as its own atlas from frames downscaled
+# before trimming, written as <name>_<tier>.json next to the full one; each tier's metadata also lists
+# all tiers under "tiers".
+
+
+# === INPUT ===
+def resolve_sheet_image(metadata_path, filepath):
+    """The sheet a metadata file describes; filepath is tried as written, then next to the metadata file."""
+    candidates = [filepath, os.path.join(os.path.dirname(metadata_path), os.path.basename(filepath))]
+    for candidate in candidates:
+        if os.path.exists(candidate):
+            return candidate
+    raise FileNotFoundError(f"{metadata_path}: cannot find sheet image {filepath}")
+
+
+def load_sheet(path):
+    """Split an input into (name, frames, animations, tile_width, tile_height).
+
+    A .json is an engine metadata file whose grid of frames is cut out of its sheet; a .png is a
+    single-frame sprite with one "idle" animation.
+    """
+    name = os.path.splitext(os.path.basename(path))[0]
+    if path.lower().endswith(".png"):
+        pixels = np.asarray(Image.open(path).convert("RGBA"))
+        return name, [pixels], {"idle": [0]}, pixels.shape[1], pixels.shape[0]
+
+    with open(path) as f:
+        metadata = json.load(f)
+    fmt = metadata["format"]
+    tile_width, tile_height = fmt["tileWidth"], fmt["tileHeight"]
+    pixels = np.asarray(Image.open(resolve_sheet_image(path, metadata["filepath"])).convert("RGBA"))
+    # Same cell numbering as the engine: row-major over width // tileWidth columns
+    columns = fmt["width"] // tile_width
+    rows = fmt["height"] // tile_height
+    frames = [pixels[row * tile_height:(row + 1) * tile_height, col * tile_width:(col + 1) * tile_width]
+              for row in range(rows) for col in range(columns)]
+    return name, frames, metadata["frames"], tile_width, tile_height
+
+
+def trim(frame):
+    """Crop away fully transparent borders; returns (cropped, offset_x, offset_y).
+
+    An empty frame keeps one transparent pixel, since a zero-sized source rect means "whole texture"
+    to the engine.
+    """
+    alpha = frame[:, :, 3]
+    rows = np.flatnonzero(alpha.any(axis=1))
+    cols = np.flatnonzero(alpha.any(axis=0))
+    if not rows.size:
+        return frame[:1, :1], 0, 0
+    top, bottom, left, right = rows[0], rows[-1] + 1, cols[0], cols[-1] + 1
+    return frame[top:bottom, left:right], int(left), int(top)
+
+
+# === PACKING ===
+class MaxRectsPacker:
+    """MaxRects bin packing (best short side fit) into a fixed-size page."""
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        self.free = [(0, 0, width, height)]
+        self.used_width = self.used_height = 0
+
+    def place(self, w, h):
+        """Return the (x, y) chosen for a w x h rect, or None if it does not fit."""
+        best, best_score = None, None
+        for fx, fy, fw, fh in self.free:
+            if w <= fw and h <= fh:
+                score = (min(fw - w, fh - h), max(fw - w, fh - h))
+                if best_score is None or score < best_score:
+                    best, best_score = (fx, fy), score
+        if best is None:
+            return None
+
+        x, y = best
+        split = []
+        for fx, fy, fw, fh in self.free:
+            if x >= fx + fw or x + w <= fx or y >= fy + fh or y + h <= fy:
+                split.append((fx, fy, fw, fh))
+                continue
+            # Keep the parts of the free rect on each side of the placed one
+            if x > fx:
+                split.append((fx, fy, x - fx, fh))
+            if x + w < fx + fw:
+                split.append((x + w, fy, fx + fw - x - w, fh))
+            if y > fy:
+                split.append((fx, fy, fw, y - fy))
+            if y + h < fy + fh:
+                split.append((fx, y + h, fw, fy + fh - y - h))
+        # Drop free rects contained in another one
+        self.free = [a for i, a in enumerate(split)
+                     if not any(i != j and b[0] <= a[0] and b[1] <= a[1] and a[0] + a[2] <= b[0] + b[2]
+                                and a[1] + a[3] <= b[1] + b[3] and (a != b or j < i)
+                                for j, b in enumerate(split))]
+        self.used_width = max(self.used_width, x + w)
+        self.used_height = max(self.used_height, y + h)
+        return x, y
+
+    def snapshot(self):
+        return list(self.free), self.used_width, self.used_height
+
+    def restore(self, state):
+        self.free, self.used_width, self.used_height = list(state[0]), state[1], state[2]
+
+
+def next_power_of_two(n):
+    return 1 << max(0, n - 1).bit_length()
+
+
+def pack_pages(sheets, page_width, page_height, padding=1, max_pages=None):
+    """First-fit whole sheets onto pages of one size, big sheets and big frames first.
+
+    sheets is a list of lists of images. Returns (pages, placements), where pages is a list of
+    MaxRectsPackers and placements[sheet][i] is (page_idx, x, y) for image i; or None if a sheet does
+    not fit on an empty page, or more than max_pages would be needed.
+    """
+    pages = []
+    placements = [None] * len(sheets)
+    order = sorted(range(len(sheets)), key=lambda s: -sum(im.shape[0] * im.shape[1] for im in sheets[s]))
+    for sheet_idx in order:
+        images = sheets[sheet_idx]
+        frame_order = sorted(range(len(images)), key=lambda i: -max(images[i].shape[:2]))
+        for page_idx in range(len(pages) + 1):
+            if page_idx == len(pages):
+                if max_pages is not None and len(pages) == max_pages:
+                    return None
+                # Padding goes after every rect, so the page may overhang by that much on the far edges
+                pages.append(MaxRectsPacker(page_width + padding, page_height + padding))
+            page = pages[page_idx]
+            state = page.snapshot()
+            spots = {}
+            for i in frame_order:
+                h, w = images[i].shape[:2]
+                spot = page.place(w + padding, h + padding)
+                if spot is None:
+                    break
+                spots[i] = (page_idx,) + spot
+            if len(spots) == len(images):
+                placements[sheet_idx] = [spots[i] for i in range(len(images))]
+                break
+            page.restore(state)
+            if state[0] == [(0, 0, page.width, page.height)]:
+                return None  # did not fit on an empty page
+    return pages, placements
+
+
+def pack_sheets(sheets, max_page_size=MAX_PAGE_SIZE, padding=1):
+    """Pack every sheet onto as few power-of-two pages as possible; returns (page_sizes, placements).
+
+    If everything fits on one page, that page is the smallest power-of-two size that holds it.
+    Otherwise pages are filled at max_page_size, then each is shrunk to the power of two around its
+    contents.
+    """
+    sides = [1 << i for i in range(max_page_size.bit_length()) if 1 << i <= max_page_size]
+    total_area = sum(im.shape[0] * im.shape[1] for images in sheets for im in images)
+    for width, height in sorted(((w, h) for w in sides for h in sides), key=lambda size: (size[0] * size[1], max(size))):
+        if width * height < total_area:
+            continue
+        packed = pack_pages(sheets, width, height, padding, max_pages=1)
+        if packed is not None:
+            return [(width, height)], packed[1]
+
+    packed = pack_pages(sheets, max_page_size, max_page_size, padding)
+    if packed is None:
+        raise ValueError(f"A sheet does not fit on a {max_page_size}x{max_page_size} page.")
+    pages, placements = packed
+    page_sizes = [(min(max_page_size, next_power_of_two(page.used_width - padding)),
+                   min(max_page_size, next_power_of_two(page.used_height - padding))) for page in pages]
+    return page_sizes, placements
+
+
+# === OUTPUT ===
+def pack_tier(loaded, output_dir, atlas_name, factor, max_page_size, padding, texture_options):
+    """Trim, deduplicate and pack the frames of every loaded sheet, downscaled by factor.
+
+    Writes the pages and returns (page_paths, metadata_docs), one metadata doc per sheet.
+    """
+    sheets, sprite_refs = [], []
+    for name, frames, _, tile_width, tile_height in loaded:
+        unique, refs, seen = [], [], {}
+        for frame in frames:
+            cropped, ox, oy = trim(texturecodec.downscale_cells(frame, tile_width, tile_height, factor))
+            key = (cropped.shape, hashlib.blake2b(np.ascontiguousarray(cropped).tobytes(), digest_size=16).digest())
+            if key not in seen:
+                seen[key] = len(unique)
+                unique.append(cropped)
+            refs.append((seen[key], ox, oy))
+        sheets.append(unique)
+        sprite_refs.append(refs)
+
+    page_sizes, placements = pack_sheets(sheets, max_page_size, padding)
+
+    page_paths = []
+    for page_idx, (width, height) in enumerate(page_sizes):
+        page_image = np.zeros((height, width, 4), dtype=np.uint8)
+        for images, spots in zip(sheets, placements):
+            for image, (image_page, x, y) in zip(images, spots):
+                if image_page == page_idx:
+                    page_image[y:y + image.shape[0], x:x + image.shape[1]] = image
+        page_path = texturecodec.texture_path(os.path.join(output_dir, f"{atlas_name}_{page_idx}"),
+                                              texture_options["encoding"])
+        texturecodec.write_texture(page_path, page_image, bgr=False, **texture_options)
+        page_paths.append(page_path)
+
+    metadata_docs = []
+    for (name, _, animations, tile_width, tile_height), images, spots, refs in zip(loaded, sheets, placements, sprite_refs):
+        page_idx = spots[0][0] if spots else 0
+        sprites = []
+        for image_idx, ox, oy in refs:
+            _, x, y = spots[image_idx]
+            h, w = images[image_idx].shape[:2]
+            sprites.append({"rect": [x, y, w, h], "offset": [ox, oy]})
+        metadata_docs.append({
+            "filepath": page_paths[page_idx],
+            "format": {
+                "width": page_sizes[page_idx][0],
+                "height": page_sizes[page_idx][1],
+                "tileWidth": max(1, tile_width // factor),
+                "tileHeight": max(1, tile_height // factor)
+            },
+            "frames": animations,
+            "sprites": sprites
+        })
+    return page_paths, metadata_docs
+
+
+def build_atlas(inputs, output_dir, atlas_name, max_page_size=MAX_PAGE_SIZE, padding=1, texture_options=None,
+                tiers=("full",)):
+    """Trim, deduplicate and pack every input once per quality tier; write the pages and metadata.
+
+    Returns (page_paths, metadata_paths, loaded), loaded being load_sheet()'s result for each input.
+    Page and metadata paths cover every tier, full size first.
+    """
+    texture_options = texture_options or {"encoding": "png"}
+    loaded = [load_sheet(path) for path in inputs]
+    os.makedirs(output_dir, exist_ok=True)
+
+    page_paths = []
+    tier_docs = {}
+    for tier in tiers:
+        tier_pages, tier_docs[tier] = pack_tier(loaded, output_dir, texturecodec.tier_name(atlas_name, tier),
+                                                texturecodec.TIERS[tier], max_page_size, padding, texture_options)
+        page_paths.extend(tier_pages)
+
+    metadata_paths = []
+    for sheet_idx, (name, _, _, _, _) in enumerate(loaded):
+        paths = {tier: os.path.join(output_dir, f"{texturecodec.tier_name(name, tier)}.json") for tier in tiers}
+        if len(tiers) > 1:
+            tier_list = [{"name": tier, "scale": 1 / texturecodec.TIERS[tier], "metadata": paths[tier],
+                          "textureBytes": tier_docs[tier][sheet_idx]["format"]["width"]
+                                          * tier_docs[tier][sheet_idx]["format"]["height"] * 4}
+                         for tier in tiers]
+        for tier in tiers:
+            metadata = tier_docs[tier][sheet_idx]
+            if len(tiers) > 1:
+                metadata["tiers"] = tier_list
+            with open(paths[tier], "w") as f:
+                json.dump(metadata, f, indent=4)
+            metadata_paths.append(paths[tier])
+    return page_paths, metadata_paths, loaded
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pack sprite sheets and loose PNGs into power-of-two atlas pages.")
+    parser.add_argument("inputs", nargs="+",
+                        help="engine metadata files (e.g. ../assets/images/player.json) or single-frame PNGs")
+    parser.add_argument("--output-dir", default=DEFAULT_OUTPUT_DIR, help=f"where pages and metadata go (default: {DEFAULT_OUTPUT_DIR})")
+    parser.add_argument("--name", default="sprites", help="page file name prefix (default: sprites)")
+    parser.add_argument("--max-page-size", type=int, default=MAX_PAGE_SIZE, help="largest page side in pixels (default: 2048)")
+    parser.add_argument("--padding", type=int, default=1, help="transparent pixels between sprites (default: 1)")
+    parser.add_argument("--encoding", choices=[encoding for encoding in texturecodec.ENCODINGS if encoding != "jpeg"],
+                        default="png", help="page image encoding: png (default), png8 (palettized) or webp (lossy)")
+    parser.add_argument("--quality", type=int, default=90, help="webp quality, 1-100 (default: 90)")
+    parser.add_argument("--png-compression", type=int, choices=range(10), default=6, metavar="0-9",
+                        help="zlib level for png/png8 pages: 0 encodes fastest, 9 gives the smallest files "
+                             "(default: 6)")
+    parser.add_argument("--colors", type=int, default=256, help="palette size for png8, 2-256 (default: 256)")
+    parser.add_argument("--tiers", nargs="+", choices=[tier for tier in texturecodec.TIERS if tier != "full"],
+                        default=[], help="also pack these downscaled atlases, with <name>_<tier>.json metadata")
+    args = parser.parse_args()
+
+    if args.max_page_size & (args.max_page_size - 1):
+        parser.error("--max-page-size must be a power of two.")
+    if not 2 <= args.colors <= 256:
+        parser.error("--colors must be between 2 and 256.")
+
+    texture_options = {"encoding": args.encoding, "quality": args.quality, "png_compression": args.png_compression,
+                       "colors": args.colors}
+    tiers = ["full"] + [tier for tier in texturecodec.TIERS if tier in args.tiers]
+    page_paths, metadata_paths, loaded = build_atlas(args.inputs, args.output_dir, args.name, args.max_page_size,
+                                                     args.padding, texture_options, tiers)
+    source_area = sum(len(frames) * tile_width * tile_height for _, frames, _, tile_width, tile_height in loaded)
+    page_area = 0
+    for page_path in page_paths:
+        with Image.open(page_path) as page:
+            if os.path.basename(page_path).rsplit("_", 1)[0] == args.name:
+                page_area += page.width * page.height
+            print(f"Saved page: {page_path} ({page.width}x{page.height})")
+    for metadata_path in metadata_paths:
+        print(f"Saved metadata: {metadata_path}")
+    print(f"Packed {len(loaded)} sheets into {len(page_paths)} page(s); full-size "
+          f"page area is {page_area / source_area:.0%} of the untrimmed frames.")
+    print("Point each object's TEXTURE filename at its page and ANIMATEDTEXTURE filename at the new metadata.")
+
+
+if __name__ == "__main__":
+    main()
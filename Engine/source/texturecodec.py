@@ -0,0 +1,110 @@
+import os
+import time
+
+import cv2
+import numpy as np
+from PIL import Image
+
+# Texture encodings
+# =================
+# Everything the engine's IMG_LoadTexture can read back:
+#
+#   "png"   lossless, 24/32-bit (the default; what the tools always wrote)
+#   "png8"  lossless container, colors quantized to a palette of at most 256 entries: about a quarter
+#           of the file size, and 8-bit surfaces until SDL converts them for the renderer
+#   "jpeg"  lossy, no alpha; only for opaque textures such as cutscene pages
+#   "webp"  lossy, keeps alpha; needs SDL_image built with WebP support
+#
+# GPU block formats (DXT/ETC/ASTC) are not an option: SDL_Renderer always uploads plain RGBA.
+#
+# Quality tiers
+# =============
+# Downscaled copies of a texture, each with its own metadata, so the engine can load a smaller one
+# when memory is short. A tier's metadata is the full-resolution document with every pixel size
+# divided by the tier's factor; frame numbering is unchanged.
+ENCODINGS = ("png", "png8", "jpeg", "webp")
+EXTENSIONS = {"png": ".png", "png8": ".png", "jpeg": ".jpg", "webp": ".webp"}
+LOSSY_ENCODINGS = ("png8", "jpeg", "webp")  # decoded pixels can differ from the source
+TIERS = {"full": 1, "half": 2, "quarter": 4}
+
+
+def texture_path(base_path, encoding):
+    """base_path (no extension) plus the extension for an encoding."""
+    return base_path + EXTENSIONS[encoding]
+
+
+def write_texture(path, image, encoding="png", quality=90, png_compression=None, colors=256, bgr=True):
+    """Encode image (HxWx3 or HxWx4 uint8, BGR(A) if bgr else RGB(A)) to path.
+
+    png_compression is zlib's 0 (fastest, biggest) to 9 (slowest, smallest); None keeps the encoder's
+    default. quality (1-100) applies to jpeg and webp, colors to png8. Returns (bytes, seconds).
+    """
+    if encoding not in ENCODINGS:
+        raise ValueError(f"Unknown texture encoding '{encoding}'.")
+    has_alpha = image.shape[2] == 4
+    if encoding == "jpeg" and has_alpha:
+        raise ValueError("jpeg has no alpha channel; use png, png8 or webp for transparent textures.")
+
+    start = time.perf_counter()
+    if encoding == "png8":
+        if bgr:
+            image = cv2.cvtColor(image, cv2.COLOR_BGRA2RGBA if has_alpha else cv2.COLOR_BGR2RGB)
+        # Fast octree is the only quantizer that keeps alpha, and much faster than median cut on big pages
+        paletted = Image.fromarray(image).quantize(colors, method=Image.Quantize.FASTOCTREE)
+        options = {} if png_compression is None else {"compress_level": png_compression}
+        paletted.save(path, format="PNG", **options)
+    else:
+        if not bgr:
+            image = cv2.cvtColor(image, cv2.COLOR_RGBA2BGRA if has_alpha else cv2.COLOR_RGB2BGR)
+        params = []
+        if encoding == "png" and png_compression is not None:
+            params = [cv2.IMWRITE_PNG_COMPRESSION, png_compression]
+        elif encoding == "jpeg":
+            params = [cv2.IMWRITE_JPEG_QUALITY, quality]
+        elif encoding == "webp":
+            params = [cv2.IMWRITE_WEBP_QUALITY, quality]
+        if not cv2.imwrite(path, image, params):
+            raise RuntimeError(f"Could not write {path}.")
+    return os.path.getsize(path), time.perf_counter() - start
+
+
+def resize_cells(image, tile_width, tile_height, small_width, small_height):
+    """Resize every tile_width x tile_height cell of a grid to small_width x small_height, without bleeding."""
+    columns, rows = image.shape[1] // tile_width, image.shape[0] // tile_height
+    if tile_width % small_width == 0 and tile_height % small_height == 0:
+        return cv2.resize(image, (columns * small_width, rows * small_height), interpolation=cv2.INTER_AREA)
+
+    small = np.zeros((rows * small_height, columns * small_width) + image.shape[2:], dtype=image.dtype)
+    for row in range(rows):
+        for col in range(columns):
+            cell = image[row * tile_height:(row + 1) * tile_height, col * tile_width:(col + 1) * tile_width]
+            small[row * small_height:(row + 1) * small_height, col * small_width:(col + 1) * small_width] = \
+                cv2.resize(cell, (small_width, small_height), interpolation=cv2.INTER_AREA)
+    return small
+
+
+def downscale_cells(image, tile_width, tile_height, factor):
+    """Shrink a grid of tile_width x tile_height cells by factor, cell by cell.
+
+    Cells never blend into their neighbours: when the tile size divides evenly the page is area-averaged
+    in one go, otherwise each cell is resized on its own to the rounded-down tile size. Images with alpha
+    are filtered premultiplied, so transparent pixels do not darken the edges.
+    """
+    if factor == 1:
+        return image
+    small_width, small_height = max(1, tile_width // factor), max(1, tile_height // factor)
+    if image.shape[2] != 4:
+        return resize_cells(image, tile_width, tile_height, small_width, small_height)
+
+    alpha = image[:, :, 3:].astype(np.float32)
+    premultiplied = np.concatenate((image[:, :, :3] * (alpha / 255), alpha), axis=2)
+    small = resize_cells(premultiplied, tile_width, tile_height, small_width, small_height)
+    small_alpha = small[:, :, 3:] / 255
+    small[:, :, :3] = np.divide(small[:, :, :3], small_alpha, out=np.zeros_like(small[:, :, :3]),
+                                where=small_alpha > 0)
+    return np.clip(np.rint(small), 0, 255).astype(np.uint8)
+
+
+def tier_name(base_name, tier):
+    """File name stem for a tier: the full tier keeps base_name, the others get a suffix."""
+    return base_name if tier == "full" else f"{base_name}_{tier}"
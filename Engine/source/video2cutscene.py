@@ -1,119 +1,1246 @@
+import argparse
+import bisect
+import contextlib
+import cProfile
+import hashlib
 import cv2
 import numpy as np
 import json
 import math
 import os
+import pstats
+import re
+import shutil
+import subprocess
 import sys
-from moviepy.editor import VideoFileClip
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
 
-# === CHECK COMMAND LINE ARGUMENT ===
-if len(sys.argv) < 2:
-    print("Usage: python3 video2cutscene.py <video_file>")
-    sys.exit(1)
+import cutscenedelta
+import texturecodec
 
-# === CONFIGURATION ===
-base_name = sys.argv[1].split('.mp4')[0]
-video_path = f"../assets/videos/{sys.argv[1]}"
-output_image = f"../assets/images/{base_name}.png"
-output_json = f"../assets/images/{base_name}_metadata.json"
-output_audio = f"../assets/music/{base_name}_audio.wav"
-target_fps = 30
+try:
+    # Ships a static ffmpeg build (installed alongside moviepy)
+    import imageio_ffmpeg
+except ImportError:
+    imageio_ffmpeg = None
+
+try:
+    import resource
+except ImportError:
+    resource = None
 
 # SDL-safe limits
 MAX_IMAGE_WIDTH = 16384
 MAX_IMAGE_HEIGHT = 16384
 
-# === OPEN VIDEO ===
-cap = cv2.VideoCapture(video_path)
-if not cap.isOpened():
-    raise RuntimeError("Could not open video.")
-
-original_fps = cap.get(cv2.CAP_PROP_FPS)
-frame_interval = original_fps / target_fps
-frame_step = max(1, math.ceil(frame_interval))
-
-tile_width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-tile_height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-
-# Estimate max columns and rows based on dimension caps
-max_columns = max(1, MAX_IMAGE_WIDTH // tile_width)
-max_rows = max(1, MAX_IMAGE_HEIGHT // tile_height)
-max_frames = max_columns * max_rows
-
-# === EXTRACT FRAMES ===
-frames = []
-frame_idx = 0
-
-print("Extracting frames...")
-
-while True:
-    if len(frames) >= max_frames:
-        print("Maximum number of frames reached. Video may terminate abruptly. Please lower the quality and try again.")
-        break
-    ret, frame = cap.read()
-    if not ret:
-        break
-    if frame_idx % frame_step == 0:
-        frames.append(frame)
-    frame_idx += 1
-
-cap.release()
-
-if not frames:
-    raise RuntimeError("No frames were extracted.")
-
-# === CALCULATE GRID DIMENSIONS ===
-columns = min(len(frames), max_columns)
-rows = math.ceil(len(frames) / columns)
-
-grid_width = columns * tile_width
-grid_height = rows * tile_height
-grid_image = np.zeros((grid_height, grid_width, 3), dtype=np.uint8)
-
-print(f"Arranging {len(frames)} frames into grid: {columns} columns x {rows} rows")
-
-# === TILE FRAMES INTO GRID ===
-for idx, frame in enumerate(frames):
-    r = idx // columns
-    c = idx % columns
-    y = r * tile_height
-    x = c * tile_width
+# How source frames are pulled from the capture:
+#   "grab" - grab() every frame, retrieve() (color-convert) only the kept ones,
+#            keeping the frame at or after each output tick (see FRAME SELECTION AND TIMING)
+#   "read" - legacy loop: read() every frame and keep every ceil(source fps / target fps)-th one
+DECIMATE_MODES = ("grab", "read")
+
+
+# === INSTRUMENTATION ===
+# Every build step runs inside a named stage. A stage's seconds are its own time, excluding stages
+# nested inside it (e.g. "decode" excludes the "tile" time spent filling the page buffer), so the
+# stages of one video add up to its total. Peak RSS is per stage where Linux lets a process reset its
+# memory high-water mark, otherwise it is the process peak so far. Only this process is measured:
+# --workers decoders and ffmpeg run in their own processes.
+#
+# JSON lines (--stats-jsonl), one object per line:
+#   {"event": "page",  "video", "page", "cells", "bytes", "elapsed"}
+#   {"event": "stage", "video", "stage", "seconds", "frames", "fps", "bytes", "peakRssMB"}
+#   {"event": "video", "video", "seconds", "frames", "bytes", "peakRssMB"}
+def read_peak_rss():
+    """Peak resident memory of this process in MB (since the last reset_peak_rss() if that worked)."""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    if resource is None:
+        return 0.0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1 << 20) if sys.platform == "darwin" else peak / 1024
+
+
+def reset_peak_rss():
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass
+
+
+class BuildStats:
+    """Per-stage wall time, frame count, bytes written and peak memory for one video's build."""
+    def __init__(self, video_file=None, log=None):
+        self.video_file = video_file
+        self.log = log
+        self.stages = {}
+        self.stack = []  # [stage name, start time, time spent in nested stages, peak RSS seen]
+        self.start = time.perf_counter()
+
+    def entry(self, name):
+        return self.stages.setdefault(name, {"seconds": 0.0, "frames": 0, "bytes": 0, "peakRssMB": 0.0})
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        """Time the with-block as stage name; yields the stage's entry for frame and byte counts."""
+        if self.stack:
+            self.stack[-1][3] = max(self.stack[-1][3], read_peak_rss())
+        reset_peak_rss()
+        frame = [name, time.perf_counter(), 0.0, 0.0]
+        self.stack.append(frame)
+        try:
+            yield self.entry(name)
+        finally:
+            self.stack.pop()
+            elapsed = time.perf_counter() - frame[1]
+            peak = max(frame[3], read_peak_rss())
+            entry = self.entry(name)
+            entry["seconds"] += elapsed - frame[2]
+            entry["peakRssMB"] = max(entry["peakRssMB"], peak)
+            if self.stack:
+                self.stack[-1][2] += elapsed
+                self.stack[-1][3] = max(self.stack[-1][3], peak)
+
+    def add(self, name, seconds, frames=0, bytes_written=0, nested=True):
+        """Record time measured by the caller. nested time is taken out of the enclosing stage;
+        background work (audio) is not nested."""
+        entry = self.entry(name)
+        entry["seconds"] += seconds
+        entry["frames"] += frames
+        entry["bytes"] += bytes_written
+        if nested and self.stack:
+            self.stack[-1][2] += seconds
+
+    def iterate(self, name, iterable, frames=None):
+        """Yield from iterable, timing the work done inside it as stage name.
+
+        frames(item) gives the frame count each item adds to the stage.
+        """
+        iterator = iter(iterable)
+        while True:
+            with self.stage(name) as entry:
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+                if frames is not None:
+                    entry["frames"] += frames(item)
+            yield item
+
+    def emit(self, event, **fields):
+        if self.log is not None:
+            self.log.write(json.dumps({"event": event, "video": self.video_file, **fields}) + "\n")
+            self.log.flush()
+
+    def finish(self):
+        """Print the per-stage table and write the stage and video JSON lines."""
+        total = time.perf_counter() - self.start
+        if not self.stages:
+            return
+        print(f"{'stage':<14}{'seconds':>9}{'frames':>8}{'fps':>9}{'MB written':>12}{'peak RSS MB':>13}")
+        for name, entry in self.stages.items():
+            fps = entry["frames"] / entry["seconds"] if entry["frames"] and entry["seconds"] else None
+            columns = [f"{entry['seconds']:.2f}", str(entry["frames"] or ""), "" if fps is None else f"{fps:.1f}",
+                       f"{entry['bytes'] / 1e6:.2f}" if entry["bytes"] else "",
+                       f"{entry['peakRssMB']:.0f}" if entry["peakRssMB"] else ""]
+            print(f"{name:<14}" + "".join(f"{column:>{width}}" for column, width in zip(columns, (9, 8, 9, 12, 13))))
+            self.emit("stage", stage=name, seconds=round(entry["seconds"], 6), frames=entry["frames"],
+                      fps=None if fps is None else round(fps, 2), bytes=entry["bytes"],
+                      peakRssMB=round(entry["peakRssMB"], 1))
+        print(f"{'total':<14}{total:>9.2f}")
+        self.emit("video", seconds=round(total, 6), frames=max((entry["frames"] for entry in self.stages.values()),
+                                                                  default=0),
+                  bytes=sum(entry["bytes"] for entry in self.stages.values()),
+                  peakRssMB=round(max(entry["peakRssMB"] for entry in self.stages.values()), 1))
+
+
+# === FRAME SELECTION AND TIMING ===
+# Which source frames to keep is decided before anything is decoded, from the presentation time
+# (PTS) of every frame as the container lists it. Output ticks run every 1 / fps seconds from the
+# first frame, and each tick keeps the first frame shown at or after it, so a variable frame rate
+# source is sampled on its own clock. --max-frames lowers the rate until the picks fit the budget.
+#
+# Metadata gains a "timing" block, one entry per frame of "frames.video" (or "deltas"):
+#   "clock"       "pts", or "nominal" (frame index / reported fps) when ffmpeg cannot list the packets
+#   "fps"         the output rate frames were picked at
+#   "timestamps"  when each frame is shown, in ms on the source clock (the extracted audio starts at 0)
+#   "durations"   how long each frame stays up, in ms; each one ends where the next frame starts
+TIME_EPSILON = 1e-6  # seconds; ticks that land exactly on a frame are not lost to rounding
+
+
+class FramePlan:
+    """The source frames a cutscene keeps and when each one is shown."""
+    def __init__(self, timestamps, end, clock, kept, fps):
+        self.timestamps = timestamps  # presentation time of every source frame, in seconds
+        self.end = end                # when the last source frame stops being shown
+        self.clock = clock
+        self.kept = kept              # source frame indices, ascending
+        self.fps = fps
+
+    @property
+    def frame_count(self):
+        return len(self.timestamps)
+
+    def timing(self, first=0, count=None):
+        """The "timing" block for output frames [first, first + count)."""
+        if count is None:
+            count = len(self.kept) - first
+        kept = self.kept[first:first + count + 1]
+        times = [round(1000 * self.timestamps[frame_idx]) for frame_idx in kept]
+        if len(kept) == count:
+            times.append(round(1000 * self.end))
+        return {
+            "clock": self.clock,
+            "fps": round(self.fps, 3),
+            "timestamps": times[:count],
+            "durations": [later - earlier for earlier, later in zip(times, times[1:])]
+        }
+
+
+def probe_timestamps(video_path):
+    """PTS of every video frame from the container's packets, without decoding anything.
+
+    Returns (sorted timestamps, end) in seconds, or None if ffmpeg cannot list them.
+    """
+    try:
+        exe = ffmpeg_exe()
+    except RuntimeError:
+        return None
+    result = subprocess.run([exe, "-hide_banner", "-nostdin", "-loglevel", "error", "-i", video_path,
+                             "-map", "0:v:0", "-c", "copy", "-f", "framecrc", "-"], capture_output=True, text=True)
+    time_base = re.search(r"^#tb 0: (\d+)/(\d+)", result.stdout, re.MULTILINE)
+    # framecrc lines: stream, dts, pts, duration, size, checksum[, F=flags]; packets flagged discard
+    # (0x4, e.g. trimmed by an edit list) are never output by the decoder
+    packets = []
+    for line in result.stdout.splitlines():
+        if not line or line.startswith("#"):
+            continue
+        fields = line.split(",")
+        flags = int(fields[6].strip()[2:], 16) if len(fields) > 6 else 0
+        if not flags & 0x4:
+            packets.append([int(field) for field in fields[1:4]])
+    if result.returncode != 0 or time_base is None or not packets:
+        return None
+    if any(pts < 0 for _, pts, _ in packets):
+        return None  # no PTS in this container
+    unit = int(time_base[1]) / int(time_base[2])
+    packets.sort(key=lambda packet: packet[1])
+    last_duration = packets[-1][2] or (packets[-1][1] - packets[-2][1] if len(packets) > 1 else 0)
+    return [pts * unit for _, pts, _ in packets], (packets[-1][1] + last_duration) * unit
+
+
+def count_frames(video_path):
+    """Count the frames by walking the stream with grab() (no color conversion).
+
+    Only used when neither ffmpeg nor the container reports a usable frame count.
+    """
+    cap = cv2.VideoCapture(video_path)
+    count = 0
+    while cap.grab():
+        count += 1
+    cap.release()
+    return count
+
+
+def select_frames(timestamps, end, target_fps, decimate="grab", max_frames=None):
+    """Return (kept source frame indices, output fps) for a stream with the given frame timestamps.
+
+    "read" keeps the legacy every-n-th-frame rule, with n raised as needed to fit max_frames.
+    """
+    if not timestamps:
+        return [], target_fps
+    timestamps = np.asarray(timestamps, dtype=np.float64)
+    span = max(end - timestamps[0], TIME_EPSILON)
+    fps = target_fps if not max_frames else min(target_fps, max_frames / span)
+
+    if decimate == "read":
+        source_fps = len(timestamps) / span
+        step = max(1, math.ceil(source_fps / target_fps - TIME_EPSILON))
+        if max_frames:
+            step = max(step, math.ceil(len(timestamps) / max_frames))
+        return list(range(0, len(timestamps), step)), source_fps / step
+
+    tick_count = math.floor((timestamps[-1] - timestamps[0]) * fps + TIME_EPSILON) + 1
+    ticks = timestamps[0] + np.arange(tick_count) / fps
+    picks = np.searchsorted(timestamps, ticks - TIME_EPSILON, side="left")
+    return np.unique(picks[picks < len(timestamps)]).tolist(), fps
+
+
+def plan_frames(video_path, target_fps, decimate="grab", max_frames=None):
+    """Work out which frames to keep and when they are shown; see FRAME SELECTION AND TIMING."""
+    probed = probe_timestamps(video_path)
+    if probed is not None:
+        timestamps, end = probed
+        clock = "pts"
+    else:
+        cap = cv2.VideoCapture(video_path)
+        source_fps = cap.get(cv2.CAP_PROP_FPS) or target_fps
+        frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        cap.release()
+        if frame_count <= 0:
+            print("Container reports no frame count; counting frames first...")
+            frame_count = count_frames(video_path)
+        timestamps = [frame_idx / source_fps for frame_idx in range(frame_count)]
+        end = frame_count / source_fps
+        clock = "nominal"
+    kept, fps = select_frames(timestamps, end, target_fps, decimate, max_frames)
+    print(f"Keeping {len(kept)} of {len(timestamps)} source frames ({fps:.2f} fps, {clock} timestamps)")
+    return FramePlan(timestamps, end, clock, kept, fps)
+
+
+def frame_budget(value):
+    """argparse type for --max-frames: a frame count, or "page" for as many frames as one atlas page holds."""
+    if value == "page":
+        return value
+    try:
+        count = int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected a frame count or 'page', got '{value}'")
+    if count < 1:
+        raise argparse.ArgumentTypeError("the frame budget must be at least 1")
+    return count
+
+
+def plan_grid(frame_count, max_columns, max_rows):
+    """Return (columns, rows) for an atlas holding frame_count cells, within the SDL limits."""
+    frame_count = max(1, min(frame_count, max_columns * max_rows))
+    columns = min(frame_count, max_columns)
+    rows = math.ceil(frame_count / columns)
+    return columns, rows
+
+
+def grow_atlas(grid_image, columns, count, tile_width, tile_height, max_columns, max_rows):
+    """Re-lay out the first count cells into an atlas with (about) twice the capacity.
+
+    Fallback for containers that under-report their frame count.
+    """
+    new_columns, new_rows = plan_grid(2 * count, max_columns, max_rows)
+    grown = np.zeros((new_rows * tile_height, new_columns * tile_width, 3), dtype=np.uint8)
+    for idx in range(count):
+        src_y, src_x = (idx // columns) * tile_height, (idx % columns) * tile_width
+        dst_y, dst_x = (idx // new_columns) * tile_height, (idx % new_columns) * tile_width
+        grown[dst_y:dst_y + tile_height, dst_x:dst_x + tile_width] = \
+            grid_image[src_y:src_y + tile_height, src_x:src_x + tile_width]
+    return grown, new_columns, new_rows
+
+
+def iter_kept_frames(cap, keep, decimate, frame_idx=0, stop=None):
+    """Yield (frame_idx, frame) for each kept frame from frame_idx up to stop (or the end of the stream).
+
+    The same decode buffer is reused for every frame, so copy it out before advancing.
+    """
+    frame = None
+    while stop is None or frame_idx < stop:
+        kept_this_frame = keep(frame_idx)
+        if decimate == "read":
+            ret, frame = cap.read(frame)
+        else:
+            # Skipped frames are still demuxed and decoded but never converted to BGR or copied out
+            ret = cap.grab()
+            if ret and kept_this_frame:
+                ret, frame = cap.retrieve(frame)
+        if not ret:
+            return
+        if kept_this_frame:
+            yield frame_idx, frame
+        frame_idx += 1
+
+
+def put_cell(grid_image, idx, columns, frame):
+    """Copy frame into cell idx of a row-major atlas."""
+    tile_height, tile_width = frame.shape[:2]
+    y = (idx // columns) * tile_height
+    x = (idx % columns) * tile_width
     grid_image[y:y + tile_height, x:x + tile_width] = frame
 
-# === SAVE IMAGE ===
-os.makedirs(os.path.dirname(output_image), exist_ok=True)
-cv2.imwrite(output_image, grid_image)
-
-# === WRITE METADATA JSON ===
-metadata = {
-    "filepath": output_image,
-    "format": {
-        "width": grid_width,
-        "height": grid_height,
-        "tileWidth": tile_width,
-        "tileHeight": tile_height,
-        "columns": columns,
-        "rows": rows
-    },
-    "frames": {
-        "video": list(range(len(frames)))
+
+def shared_atlas(shape):
+    """Allocate a zeroed atlas in a shared, file-backed mapping (tmpfs when available).
+
+    Returns (path, atlas); the path is what worker processes map to write into the same memory.
+    """
+    fd, path = tempfile.mkstemp(suffix=".atlas", dir="/dev/shm" if os.path.isdir("/dev/shm") else None)
+    os.close(fd)
+    return path, np.memmap(path, dtype=np.uint8, mode="w+", shape=shape)
+
+
+class FrameCountMismatch(Exception):
+    """Raised by the parallel decoder when the stream disagrees with the container's frame count.
+
+    Carries the page and source frame to resume a serial decode from.
+    """
+    def __init__(self, page_idx, start_frame):
+        super().__init__(f"frame count mismatch on page {page_idx}")
+        self.page_idx = page_idx
+        self.start_frame = start_frame
+
+
+def open_at(video_path, frame_idx):
+    """Open a capture positioned so the next grab()/read() returns source frame frame_idx."""
+    cap = cv2.VideoCapture(video_path)
+    if frame_idx > 0:
+        cap.set(cv2.CAP_PROP_POS_FRAMES, frame_idx)
+        if int(cap.get(cv2.CAP_PROP_POS_FRAMES)) != frame_idx:
+            # Backend could not land on the exact frame; walk there from the beginning instead
+            cap.release()
+            cap = cv2.VideoCapture(video_path)
+            for _ in range(frame_idx):
+                cap.grab()
+    return cap
+
+
+def trim_page(grid_image, kept, columns, tile_width, tile_height):
+    """Drop unused cells from a page; returns (page_image, columns) using the legacy columns/rows rule."""
+    if kept < columns:
+        columns = kept
+        return np.ascontiguousarray(grid_image[:tile_height, :columns * tile_width]), columns
+    return grid_image[:math.ceil(kept / columns) * tile_height], columns
+
+
+def decode_range(video_path, atlas_path, atlas_shape, columns, kept, decimate,
+                 start, stop, first_cell, capacity, is_last):
+    """Worker: decode the kept source frames of [start, stop) into the shared atlas, from cell first_cell.
+
+    Returns (frames_kept, more_after_stop); more_after_stop is only checked for the last range.
+    """
+    grid_image = np.memmap(atlas_path, dtype=np.uint8, mode="r+", shape=atlas_shape)
+    keep = frozenset(kept).__contains__
+    cap = open_at(video_path, start)
+
+    cell = first_cell
+    reached_capacity = cell >= capacity
+    if not reached_capacity:
+        for _, frame in iter_kept_frames(cap, keep, decimate, start, stop):
+            put_cell(grid_image, cell, columns, frame)
+            cell += 1
+            if cell >= capacity:
+                reached_capacity = True
+                break
+
+    more_after_stop = is_last and not reached_capacity and cap.grab()
+    cap.release()
+    del grid_image
+    return cell - first_cell, more_after_stop
+
+
+def decode_page_parallel(pool, workers, video_path, kept_indices, decimate, start, stop, is_last,
+                         columns, rows, tile_width, tile_height):
+    """Split source frames [start, stop) into one range per worker and decode them into a shared page.
+
+    kept_indices are the page's kept source frames. Returns (grid_image, kept), or None when the
+    stream disagrees with the reported frame count.
+    """
+    capacity = columns * rows
+    atlas_shape = (rows * tile_height, columns * tile_width, 3)
+    atlas_path, grid_image = shared_atlas(atlas_shape)
+
+    try:
+        chunk = math.ceil((stop - start) / workers)
+        ranges = []
+        for range_start in range(start, stop, chunk):
+            range_stop = min(stop, range_start + chunk)
+            first_cell = bisect.bisect_left(kept_indices, range_start)
+            ranges.append((range_start, range_stop, first_cell,
+                           kept_indices[first_cell:bisect.bisect_left(kept_indices, range_stop)]))
+
+        futures = [pool.submit(decode_range, video_path, atlas_path, atlas_shape, columns, range_kept,
+                               decimate, range_start, range_stop, first_cell, capacity,
+                               is_last and range_stop == stop)
+                   for range_start, range_stop, first_cell, range_kept in ranges]
+        results = [future.result() for future in futures]
+    finally:
+        # The parent's mapping stays valid after the name is gone
+        os.unlink(atlas_path)
+
+    kept = 0
+    for (_, range_stop, first_cell, range_kept), (frames_kept, more_after_stop) in zip(ranges, results):
+        expected_kept = max(0, min(capacity, first_cell + len(range_kept)) - first_cell)
+        if is_last and range_stop == stop:
+            # Only the very last range may come up short (the container over-reported); if the
+            # stream runs past the reported count, later cells would be misplaced
+            if more_after_stop:
+                return None
+        elif frames_kept != expected_kept:
+            return None
+        kept += frames_kept
+    return grid_image, kept
+
+
+def extract_pages_parallel(video_path, decimate, workers, total_frames, kept_indices,
+                           tile_width, tile_height, max_columns, max_rows):
+    """Decode page after page, each one split across the worker pool.
+
+    Yields like extract_pages; raises FrameCountMismatch so the caller can resume serially.
+    """
+    page_capacity = max_columns * max_rows
+    page_count = math.ceil(len(kept_indices) / page_capacity)
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for page_idx in range(page_count):
+            first = page_idx * page_capacity
+            page_frames = kept_indices[first:first + page_capacity]
+            start = page_frames[0]
+            is_last = page_idx == page_count - 1
+            stop = total_frames if is_last else kept_indices[first + page_capacity]
+
+            columns, rows = plan_grid(len(page_frames), max_columns, max_rows)
+            result = decode_page_parallel(pool, workers, video_path, page_frames, decimate, start, stop,
+                                          is_last, columns, rows, tile_width, tile_height)
+            if result is None or result[1] == 0:
+                raise FrameCountMismatch(page_idx, start)
+            grid_image, kept = result
+            page_image, columns = trim_page(grid_image, kept, columns, tile_width, tile_height)
+            yield page_idx, page_image, kept, columns
+            del grid_image, page_image
+
+
+class AtlasPacker:
+    """Fills atlas pages one cell at a time, reusing a single page buffer.
+
+    The buffer starts sized for expected_frames and grows (up to a full page) if more arrive.
+    Call flush() when full() before adding another frame; the returned page is only valid until
+    the next add().
+    """
+    def __init__(self, tile_width, tile_height, max_columns, max_rows, expected_frames, page_idx=0):
+        self.tile_width = tile_width
+        self.tile_height = tile_height
+        self.max_columns = max_columns
+        self.max_rows = max_rows
+        self.page_capacity = max_columns * max_rows
+        self.expected_frames = expected_frames
+        self.page_idx = page_idx
+        self.count = 0
+        self.grid_image = None
+        self.columns = self.rows = 0
+
+    def full(self):
+        return self.count >= self.page_capacity
+
+    def _start_page(self):
+        layout = plan_grid(min(max(self.expected_frames, 1), self.page_capacity), self.max_columns, self.max_rows)
+        if self.grid_image is not None and layout == (self.columns, self.rows):
+            self.grid_image.fill(0)
+        else:
+            self.grid_image = None
+            self.columns, self.rows = layout
+            self.grid_image = np.zeros((self.rows * self.tile_height, self.columns * self.tile_width, 3),
+                                       dtype=np.uint8)
+
+    def add(self, frame):
+        """Copy frame into the next free cell and return its (page_idx, cell)."""
+        if self.count == 0:
+            self._start_page()
+        if self.count >= self.columns * self.rows:
+            self.grid_image, self.columns, self.rows = grow_atlas(self.grid_image, self.columns, self.count,
+                                                                  self.tile_width, self.tile_height,
+                                                                  self.max_columns, self.max_rows)
+        cell = self.count
+        put_cell(self.grid_image, cell, self.columns, frame)
+        self.count += 1
+        self.expected_frames -= 1
+        return self.page_idx, cell
+
+    def flush(self):
+        """Finish the current page; returns (page_idx, page_image, cell_count, columns)."""
+        page_image, columns = trim_page(self.grid_image, self.count, self.columns, self.tile_width, self.tile_height)
+        page = (self.page_idx, page_image, self.count, columns)
+        self.page_idx += 1
+        self.count = 0
+        return page
+
+
+def extract_pages_serial(video_path, keep, decimate, expected_frames, tile_width, tile_height,
+                         max_columns, max_rows, page_idx=0, start_frame=0, stats=None):
+    """Decode with a single capture, filling one reusable page buffer at a time.
+
+    Yields like extract_pages. expected_frames only sizes the buffers; the stream decides the real count.
+    Time spent copying frames into the page is recorded as the "tile" stage of stats.
+    """
+    stats = stats or BuildStats()
+    cap = open_at(video_path, start_frame)
+    packer = AtlasPacker(tile_width, tile_height, max_columns, max_rows, expected_frames, page_idx)
+    for _, frame in iter_kept_frames(cap, keep, decimate, start_frame):
+        if packer.full():
+            yield packer.flush()
+        start = time.perf_counter()
+        packer.add(frame)
+        stats.add("tile", time.perf_counter() - start, frames=1)
+    cap.release()
+
+    if packer.count:
+        yield packer.flush()
+
+
+def frame_thumbnail(frame):
+    """Small grayscale float copy of a frame for near-duplicate comparison."""
+    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    return cv2.resize(gray, (64, 64), interpolation=cv2.INTER_AREA).astype(np.float64)
+
+
+def ssim(a, b):
+    """Mean structural similarity of two grayscale thumbnails (Wang et al. 2004, Gaussian window)."""
+    c1, c2 = (0.01 * 255) ** 2, (0.03 * 255) ** 2
+    blur = lambda img: cv2.GaussianBlur(img, (7, 7), 1.5)
+    mu_a, mu_b = blur(a), blur(b)
+    var_a = blur(a * a) - mu_a * mu_a
+    var_b = blur(b * b) - mu_b * mu_b
+    cov = blur(a * b) - mu_a * mu_b
+    ssim_map = ((2 * mu_a * mu_b + c1) * (2 * cov + c2)) / ((mu_a ** 2 + mu_b ** 2 + c1) * (var_a + var_b + c2))
+    return float(ssim_map.mean())
+
+
+def iter_frames(pages, tile_width, tile_height):
+    """Flatten a stream of atlas pages back into their frames, in order (views into each page)."""
+    for _, page_image, frame_count, columns in pages:
+        for idx in range(frame_count):
+            y = (idx // columns) * tile_height
+            x = (idx % columns) * tile_width
+            yield page_image[y:y + tile_height, x:x + tile_width]
+
+
+def dedup_pages(pages, frame_map, tile_width, tile_height, max_columns, max_rows, ssim_threshold=None):
+    """Re-pack decoded pages so each distinct frame is stored in only one cell.
+
+    Frames are matched by exact content hash, and optionally by SSIM >= ssim_threshold against the
+    previous stored frame (holds, slow fades). Matches are only made within the output page being
+    filled, so every page still plays back on its own. Appends each frame's [page, cell] to frame_map
+    and yields re-packed pages like extract_pages.
+    """
+    # Frames still to come (from the pages seen so far) bound how many cells the next page needs
+    packer = AtlasPacker(tile_width, tile_height, max_columns, max_rows, 0)
+    seen = {}
+    previous = None
+    for _, page_image, frame_count, columns in pages:
+        packer.expected_frames += frame_count
+        for idx in range(frame_count):
+            y = (idx // columns) * tile_height
+            x = (idx % columns) * tile_width
+            frame = page_image[y:y + tile_height, x:x + tile_width]
+
+            key = hashlib.blake2b(np.ascontiguousarray(frame), digest_size=16).digest()
+            location = seen.get(key)
+            thumbnail = None
+            if location is None and ssim_threshold is not None:
+                thumbnail = frame_thumbnail(frame)
+                if previous is not None and ssim(previous[1], thumbnail) >= ssim_threshold:
+                    location = previous[0]
+
+            if location is None:
+                if packer.full():
+                    yield packer.flush()
+                    seen.clear()
+                location = list(packer.add(frame))
+                seen[key] = location
+                previous = (location, thumbnail)
+            else:
+                packer.expected_frames -= 1
+            frame_map.append(location)
+
+    if packer.count:
+        yield packer.flush()
+
+
+def extract_pages(video_path, target_fps, decimate="grab", workers=1,
+                  page_width=MAX_IMAGE_WIDTH, page_height=MAX_IMAGE_HEIGHT, stats=None, max_frames=None, plan=None):
+    """Decode the video into as many atlas pages as it needs, each at most page_width x page_height.
+
+    Yields (page_idx, page_image, frame_count, columns) as soon as each page is full, so peak memory
+    is about one page plus one decode buffer (per worker). page_image is trimmed to the rows actually
+    used and is only valid until the next page is requested. plan is the FramePlan to follow; by
+    default it is made from target_fps, decimate and max_frames.
+    """
+    tile_width, tile_height = probe_video(video_path)
+    if plan is None:
+        plan = plan_frames(video_path, target_fps, decimate, max_frames)
+    kept_indices = plan.kept
+    expected_frames = len(kept_indices)
+    keep = frozenset(kept_indices).__contains__
+
+    # Columns and rows per page based on dimension caps
+    max_columns = max(1, page_width // tile_width)
+    max_rows = max(1, page_height // tile_height)
+
+    print("Extracting frames...")
+
+    page_idx, start_frame = 0, 0
+    if workers > 1 and kept_indices:
+        try:
+            yield from extract_pages_parallel(video_path, decimate, workers, plan.frame_count,
+                                              kept_indices, tile_width, tile_height, max_columns, max_rows)
+            return
+        except FrameCountMismatch as mismatch:
+            print("Frame count reported by the container was wrong; decoding the rest serially...")
+            page_idx, start_frame = mismatch.page_idx, mismatch.start_frame
+            expected_frames -= page_idx * max_columns * max_rows
+
+    yield from extract_pages_serial(video_path, keep, decimate, expected_frames, tile_width, tile_height,
+                                    max_columns, max_rows, page_idx, start_frame, stats)
+
+
+def probe_video(video_path):
+    """Return (tile_width, tile_height), the size of the video's frames.
+
+    Frame counts and timing come from plan_frames.
+    """
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        raise RuntimeError("Could not open video.")
+
+    tile_width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+    tile_height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    cap.release()
+    return tile_width, tile_height
+
+
+def page_metadata(image_path, page_image, cell_count, columns, tile_width, tile_height, video=None):
+    """Metadata for one atlas page in the engine's "filepath"/"format"/"frames" shape.
+
+    video is the cell shown for each frame; it defaults to every cell once, in order.
+    """
+    grid_height, grid_width = page_image.shape[:2]
+    return {
+        "filepath": image_path,
+        "format": {
+            "width": grid_width,
+            "height": grid_height,
+            "tileWidth": tile_width,
+            "tileHeight": tile_height,
+            "columns": columns,
+            "rows": math.ceil(cell_count / columns)
+        },
+        "frames": {
+            "video": list(range(cell_count)) if video is None else video
+        }
+    }
+
+
+def scale_format(fmt, factor):
+    """A page's "format" block for a copy downscaled cell by cell (see texturecodec.downscale_cells)."""
+    tile_width, tile_height = max(1, fmt["tileWidth"] // factor), max(1, fmt["tileHeight"] // factor)
+    return dict(fmt, tileWidth=tile_width, tileHeight=tile_height,
+                width=fmt["width"] // fmt["tileWidth"] * tile_width,
+                height=fmt["height"] // fmt["tileHeight"] * tile_height)
+
+
+def tier_metadata_path(path, tier):
+    return path[:-len("_metadata.json")] + f"_{tier}_metadata.json"
+
+
+def texture_bytes(doc):
+    """Decoded RGBA size of every page a metadata doc describes."""
+    return sum(page["format"]["width"] * page["format"]["height"] * 4 for page in doc.get("pages", [doc]))
+
+
+def add_tiers(metadata_docs, output_json, image_maps):
+    """Add a downscaled copy of every metadata doc per quality tier and list the tiers in the top-level docs.
+
+    image_maps maps each tier name to {full-size image path: that tier's image path}.
+    """
+    if not image_maps:
+        return metadata_docs
+
+    def scale(doc, tier, factor):
+        scaled = dict(doc, filepath=image_maps[tier][doc["filepath"]], format=scale_format(doc["format"], factor))
+        if "pages" in doc:
+            scaled["pages"] = [dict(page, filepath=image_maps[tier][page["filepath"]],
+                                    metadata=tier_metadata_path(page["metadata"], tier),
+                                    format=scale_format(page["format"], factor))
+                               for page in doc["pages"]]
+        return scaled
+
+    tier_docs = {}
+    tiers = [{"name": "full", "scale": 1.0, "metadata": output_json,
+              "textureBytes": texture_bytes(metadata_docs[output_json])}]
+    for tier in image_maps:
+        factor = texturecodec.TIERS[tier]
+        for path, doc in metadata_docs.items():
+            tier_docs[tier_metadata_path(path, tier)] = scale(doc, tier, factor)
+        top = tier_docs[tier_metadata_path(output_json, tier)]
+        tiers.append({"name": tier, "scale": 1 / factor, "metadata": tier_metadata_path(output_json, tier),
+                      "textureBytes": texture_bytes(top)})
+    for path in [output_json] + [tier_metadata_path(output_json, tier) for tier in image_maps]:
+        docs = metadata_docs if path == output_json else tier_docs
+        docs[path]["tiers"] = tiers
+    return {**metadata_docs, **tier_docs}
+
+
+def texture_options(args):
+    """write_texture() keyword arguments from the command line."""
+    return {"encoding": args.encoding, "quality": args.quality, "png_compression": args.png_compression,
+            "colors": args.colors}
+
+
+def build_atlas(video_path, base_name, args, stats):
+    """Decode the video into atlas page(s) and return (image_paths, metadata_docs).
+
+    metadata_docs maps each metadata JSON path to its contents; the caller writes them.
+    """
+    output_image = texturecodec.texture_path(f"../assets/images/{base_name}", args.encoding)
+    output_json = f"../assets/images/{base_name}_metadata.json"
+    options = texture_options(args)
+    factors = {tier: texturecodec.TIERS[tier] for tier in args.tiers}
+    page_width = min(args.page_size, MAX_IMAGE_WIDTH)
+    page_height = min(args.page_size, MAX_IMAGE_HEIGHT)
+    dedup = args.dedup or args.dedup_ssim is not None
+
+    tile_width, tile_height = probe_video(video_path)
+    max_frames = args.max_frames
+    if max_frames == "page":
+        max_frames = max(1, page_width // tile_width) * max(1, page_height // tile_height)
+    with stats.stage("probe"):
+        plan = plan_frames(video_path, args.target_fps, args.decimate, max_frames)
+
+    # === EXTRACT FRAMES INTO ATLAS PAGES ===
+    # Each page is written out as soon as it is decoded, so only one page is ever held in memory
+    # (two with dedup: the decoded page and the re-packed one).
+    os.makedirs(os.path.dirname(output_image), exist_ok=True)
+    pages = []
+    frame_map = []
+    tier_images = {tier: [] for tier in factors}
+    stream = stats.iterate("decode", extract_pages(video_path, args.target_fps, args.decimate, args.workers,
+                                                   page_width, page_height, stats, plan=plan),
+                           frames=lambda page: page[2])
+    if dedup:
+        stream = stats.iterate("dedup", dedup_pages(stream, frame_map, tile_width, tile_height,
+                                                    max(1, page_width // tile_width),
+                                                    max(1, page_height // tile_height), args.dedup_ssim))
+    for page_idx, page_image, cell_count, columns in stream:
+        page_base = f"../assets/images/{base_name}_{page_idx}"
+        page_path = texturecodec.texture_path(page_base, args.encoding)
+        with stats.stage("encode") as entry:
+            size, seconds = texturecodec.write_texture(page_path, page_image, **options)
+            entry["frames"] += cell_count
+            entry["bytes"] += size
+        stats.emit("page", page=page_idx, cells=cell_count, bytes=size,
+                   elapsed=round(time.perf_counter() - stats.start, 3))
+        pages.append(page_metadata(page_path, page_image, cell_count, columns, tile_width, tile_height))
+        if not dedup:
+            frame_map.extend([page_idx, cell] for cell in range(cell_count))
+        print(f"Page {page_idx}: {cell_count} cells in grid: {columns} columns x {pages[-1]['format']['rows']} rows "
+              f"({size / 1024:.0f} KB, encoded in {seconds:.2f}s)")
+        for tier, factor in factors.items():
+            tier_path = texturecodec.texture_path(texturecodec.tier_name(page_base, tier), args.encoding)
+            with stats.stage("tiers") as entry:
+                entry["bytes"] += texturecodec.write_texture(
+                    tier_path, texturecodec.downscale_cells(page_image, tile_width, tile_height, factor), **options)[0]
+            tier_images[tier].append(tier_path)
+        del page_image
+
+    if not pages:
+        raise RuntimeError("No frames were extracted.")
+
+    if dedup:
+        for page in pages:
+            page["frames"]["video"] = []
+        for page_idx, cell in frame_map:
+            pages[page_idx]["frames"]["video"].append(cell)
+        stats.entry("dedup")["frames"] = len(frame_map)
+        cell_total = sum(len(set(page["frames"]["video"])) for page in pages)
+        print(f"Dedup: {len(frame_map)} frames stored in {cell_total} cells "
+              f"({len(frame_map) / cell_total:.2f}x compression)")
+
+    # === BUILD METADATA ===
+    # Page 0 always keeps the single-file name scenes already reference (Intro.json's TEXTURE
+    # is assets/images/cutscene.png); the engine loads the texture named in the scene, not the
+    # metadata's filepath. Later pages keep their numbered names.
+    os.replace(pages[0]["filepath"], output_image)
+    pages[0]["filepath"] = output_image
+    for tier, paths in tier_images.items():
+        tier_path = texturecodec.texture_path(f"../assets/images/{base_name}_{tier}", args.encoding)
+        os.replace(paths[0], tier_path)
+        paths[0] = tier_path
+    image_maps = {tier: {page["filepath"]: path for page, path in zip(pages, paths)}
+                  for tier, paths in tier_images.items()}
+    image_paths = [page["filepath"] for page in pages] + [path for paths in tier_images.values() for path in paths]
+
+    if len(pages) == 1:
+        metadata = pages[0]
+        metadata["timing"] = plan.timing(0, len(frame_map))
+        return image_paths, add_tiers({output_json: metadata}, output_json, image_maps)
+
+    # The top level stays a valid single-page description of page 0, so the engine's
+    # existing loader still plays the start of the cutscene (it does not read "pages" yet).
+    # "pages" lists every page with its own metadata file for loading one texture at a time,
+    # and "frameMap" maps each frame of the whole video to [page, cell]. Each page's "timing"
+    # covers its own frames.
+    metadata_docs = {}
+    page_entries = []
+    first_frame = 0
+    for page_idx, page in enumerate(pages):
+        page_json = f"../assets/images/{base_name}_{page_idx}_metadata.json"
+        metadata_docs[page_json] = page
+        frame_count = len(page["frames"]["video"])
+        page["timing"] = plan.timing(first_frame, frame_count)
+        page_entries.append({
+            "filepath": page["filepath"],
+            "metadata": page_json,
+            "format": page["format"],
+            "firstFrame": first_frame,
+            "frameCount": frame_count
+        })
+        first_frame += frame_count
+    metadata = dict(pages[0])
+    metadata["pages"] = page_entries
+    metadata["frameMap"] = frame_map
+    metadata["timing"] = plan.timing(0, first_frame)
+    metadata_docs[output_json] = metadata
+    return image_paths, add_tiers(metadata_docs, output_json, image_maps)
+
+
+def build_delta(video_path, base_name, args, stats):
+    """Encode the video as a delta cutscene (see cutscenedelta.py); returns (image_paths, metadata_docs)."""
+    output_json = f"../assets/images/{base_name}_delta_metadata.json"
+    page_width = min(args.page_size, MAX_IMAGE_WIDTH)
+    page_height = min(args.page_size, MAX_IMAGE_HEIGHT)
+
+    tile_width, tile_height = probe_video(video_path)
+    with stats.stage("probe"):
+        plan = plan_frames(video_path, args.target_fps, args.decimate, args.max_frames)
+
+    # === ENCODE CHANGED REGIONS INTO DELTA PAGES ===
+    os.makedirs(os.path.dirname(output_json), exist_ok=True)
+    encoder = cutscenedelta.DeltaEncoder(tile_width, tile_height, page_width, page_height, args.keyframe_interval,
+                                         tolerance=args.delta_tolerance)
+    pages = stats.iterate("decode", extract_pages(video_path, args.target_fps, args.decimate, args.workers,
+                                                  page_width, page_height, stats, plan=plan),
+                          frames=lambda page: page[2])
+    image_paths = []
+    for page_idx, page_image in stats.iterate("deltaEncode", encoder.encode(iter_frames(pages, tile_width, tile_height))):
+        page_path = texturecodec.texture_path(f"../assets/images/{base_name}_delta_{page_idx}", args.encoding)
+        with stats.stage("encode") as entry:
+            size, seconds = texturecodec.write_texture(page_path, page_image, **texture_options(args))
+            entry["bytes"] += size
+        stats.emit("page", page=page_idx, bytes=size, elapsed=round(time.perf_counter() - stats.start, 3))
+        image_paths.append(page_path)
+        print(f"Delta page {page_idx}: {page_image.shape[1]}x{page_image.shape[0]} "
+              f"({size / 1024:.0f} KB, encoded in {seconds:.2f}s)")
+
+    if not encoder.deltas:
+        raise RuntimeError("No frames were extracted.")
+    stats.entry("deltaEncode")["frames"] = len(encoder.deltas)
+
+    for page, page_path in zip(encoder.pages, image_paths):
+        page["filepath"] = page_path
+    metadata = {
+        "filepath": image_paths[0],
+        "format": {
+            "type": "delta",
+            "tileWidth": tile_width,
+            "tileHeight": tile_height,
+            "blockSize": encoder.block_size,
+            "keyframeInterval": encoder.keyframe_interval,
+            "tolerance": encoder.tolerance
+        },
+        # What the verifier needs to re-extract the same source frames
+        "source": {
+            "video": video_path,
+            "targetFps": args.target_fps,
+            "decimate": args.decimate,
+            "maxFrames": args.max_frames
+        },
+        "pages": encoder.pages,
+        "keyframes": encoder.keyframes,
+        "deltas": encoder.deltas,
+        "timing": plan.timing(0, len(encoder.deltas))
     }
-}
 
-with open(output_json, "w") as f:
-    json.dump(metadata, f, indent=4)
+    frame_count = len(encoder.deltas)
+    stored = sum(page["width"] * page["height"] for page in encoder.pages)
+    print(f"Delta: {frame_count} frames, {len(encoder.keyframes)} keyframes, "
+          f"{sum(len(blits) for blits in encoder.deltas)} blits; atlas area is "
+          f"{100 * stored / (frame_count * tile_width * tile_height):.1f}% of a full-frame grid")
+    return image_paths, {output_json: metadata}
+
+
+def ffmpeg_exe():
+    """Path of an ffmpeg binary: imageio-ffmpeg's bundled one, else whatever is on PATH."""
+    exe = imageio_ffmpeg.get_ffmpeg_exe() if imageio_ffmpeg is not None else shutil.which("ffmpeg")
+    if exe is None:
+        raise RuntimeError("ffmpeg not found; install imageio-ffmpeg or put ffmpeg on PATH.")
+    return exe
+
+
+def probe_streams(video_path):
+    """Return (has_video, has_audio) from ffmpeg's stream listing, without decoding anything."""
+    result = subprocess.run([ffmpeg_exe(), "-hide_banner", "-nostdin", "-i", video_path],
+                            capture_output=True, text=True)
+    streams = re.findall(r"Stream #\d+:\d+.*?: (Video|Audio):", result.stderr)
+    return "Video" in streams, "Audio" in streams
+
+
+def start_audio(video_path, output_audio):
+    """Start demuxing and decoding only the first audio stream to a WAV; returns the running process.
+
+    Same format moviepy wrote (44.1kHz stereo 16-bit PCM). The video stream is never decoded, so this
+    can run alongside frame extraction; wait on it with finish_audio.
+    """
+    os.makedirs(os.path.dirname(output_audio), exist_ok=True)
+    return subprocess.Popen([ffmpeg_exe(), "-hide_banner", "-nostdin", "-loglevel", "error", "-y",
+                             "-i", video_path, "-map", "0:a:0", "-vn", "-sn", "-dn",
+                             "-c:a", "pcm_s16le", "-ar", "44100", "-ac", "2", output_audio],
+                            stderr=subprocess.PIPE, text=True)
+
+
+def finish_audio(process):
+    _, errors = process.communicate()
+    if process.returncode != 0:
+        raise RuntimeError(f"Audio extraction failed: {errors.strip()}")
+
+
+# === INCREMENTAL BUILD CACHE ===
+# The manifest records, per video, the key each output was built from and the size/mtime of every
+# file written, so a later run can tell which of image, metadata and audio are still current.
+# Bump CACHE_VERSION whenever the output format changes.
+CACHE_VERSION = 3
+CACHE_MANIFEST = "../assets/.video2cutscene_cache.json"
+VIDEO_EXTENSIONS = (".mp4", ".mov", ".mkv", ".avi", ".webm")
+
+
+def file_hash(path):
+    """BLAKE2b hex digest of a file's contents, read in 1MB chunks."""
+    digest = hashlib.blake2b()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def file_stamp(path):
+    st = os.stat(path)
+    return [st.st_size, st.st_mtime_ns]
+
+
+def outputs_current(stamps):
+    """True if every recorded output still exists unchanged since it was written."""
+    return bool(stamps) and all(os.path.exists(path) and file_stamp(path) == stamp for path, stamp in stamps.items())
+
+
+def cache_key(*parts):
+    return hashlib.blake2b(json.dumps([CACHE_VERSION, *parts], sort_keys=True).encode(), digest_size=16).hexdigest()
+
+
+def load_manifest(path):
+    try:
+        with open(path) as f:
+            manifest = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        manifest = {}
+    if manifest.get("version") != CACHE_VERSION:
+        manifest = {"version": CACHE_VERSION, "videos": {}}
+    return manifest
+
+
+def save_manifest(manifest, path):
+    """Write the manifest atomically so an interrupted build never leaves it half-written."""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f, indent=4, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def write_metadata(metadata_docs, stats=None):
+    stats = stats or BuildStats()
+    with stats.stage("metadata") as entry:
+        for path, doc in metadata_docs.items():
+            with open(path, "w") as f:
+                json.dump(doc, f, indent=4)
+            entry["bytes"] += os.path.getsize(path)
+    return {path: file_stamp(path) for path in metadata_docs}
+
+
+def convert_video(video_file, args, manifest, stats_log=None):
+    """Build whichever of a video's image, metadata and audio outputs are missing or out of date.
+
+    Prints a per-stage timing table at the end; stats_log is an open file for the JSON lines.
+    """
+    stats = BuildStats(video_file, stats_log)
+    # === CONFIGURATION ===
+    base_name = os.path.splitext(video_file)[0]
+    video_path = f"../assets/videos/{video_file}"
+    output_audio = f"../assets/music/{base_name}_audio.wav"
+
+    with stats.stage("hash"):
+        source_hash = file_hash(video_path)
+    # Output-affecting parameters only; --workers gives identical output so it is not part of the key
+    atlas_key = cache_key(source_hash, args.target_fps, args.max_frames, args.page_size, args.decimate, args.format,
+                          args.dedup or args.dedup_ssim is not None, args.dedup_ssim, args.keyframe_interval,
+                          args.delta_tolerance, texture_options(args), sorted(args.tiers))
+    audio_key = cache_key(source_hash)
+    entry = manifest["videos"].get(video_file, {})
+    if args.force:
+        entry = {}
+    manifest["videos"][video_file] = entry
+
+    atlas_current = entry.get("atlasKey") == atlas_key and (not entry.get("hasVideo", True)
+                                                             or outputs_current(entry.get("images")))
+    audio_current = entry.get("audioKey") == audio_key and (not entry.get("hasAudio", True)
+                                                             or outputs_current(entry.get("audio")))
+    if not (atlas_current and audio_current):
+        # Checked up front so a missing stream is reported before any expensive work
+        with stats.stage("probe"):
+            has_video, has_audio = probe_streams(video_path)
+    else:
+        has_video, has_audio = entry["hasVideo"], entry["hasAudio"]
+
+    # === AUDIO (runs in the background while frames are extracted) ===
+    audio_process = None
+    if not has_audio:
+        print(f"{video_file}: no audio stream, skipping audio")
+    elif audio_current:
+        print(f"{video_file}: audio up to date")
+    else:
+        print(f"Extracting audio to: {output_audio}")
+        audio_process = start_audio(video_path, output_audio)
+        audio_start = time.perf_counter()
+
+    # === IMAGE + METADATA ===
+    if not has_video:
+        print(f"{video_file}: no video stream, skipping image")
+    elif atlas_current:
+        if outputs_current(entry.get("metadataStamps")):
+            print(f"{video_file}: image and metadata up to date")
+        else:
+            # The atlas is still good; only the JSON needs rewriting, no decode required
+            print(f"{video_file}: image up to date, rewriting metadata")
+            entry["metadataStamps"] = write_metadata(entry["metadata"], stats)
+    else:
+        try:
+            build = build_delta if args.format == "delta" else build_atlas
+            image_paths, metadata_docs = build(video_path, base_name, args, stats)
+        except BaseException:
+            if audio_process is not None:
+                audio_process.kill()
+                audio_process.wait()
+            raise
+        entry["images"] = {path: file_stamp(path) for path in image_paths}
+        entry["metadata"] = metadata_docs
+        entry["metadataStamps"] = write_metadata(metadata_docs, stats)
+        for path in image_paths:
+            print(f"Image saved to: {path}")
+        for path in metadata_docs:
+            print(f"Metadata saved to: {path}")
+    entry["atlasKey"] = atlas_key
+    entry["hasVideo"] = has_video
+
+    if audio_process is not None:
+        with stats.stage("audioWait"):
+            finish_audio(audio_process)
+        # ffmpeg ran alongside everything above; its wall time is reported but not part of the total
+        stats.add("audio", time.perf_counter() - audio_start, bytes_written=os.path.getsize(output_audio), nested=False)
+        entry["audio"] = {output_audio: file_stamp(output_audio)}
+        print(f"Audio saved to: {output_audio}")
+    entry["audioKey"] = audio_key
+    entry["hasAudio"] = has_audio
+    stats.finish()
+
+
+def convert_all(video_files, args, stats_log=None):
+    manifest = load_manifest(CACHE_MANIFEST)
+    for video_file in video_files:
+        convert_video(video_file, args, manifest, stats_log)
+        # Saved after every video so an interrupted --all run keeps what it finished
+        save_manifest(manifest, CACHE_MANIFEST)
+
+
+def main():
+    # === PARSE COMMAND LINE ===
+    parser = argparse.ArgumentParser(description="Convert a video into a cutscene sprite atlas, metadata and audio.")
+    parser.add_argument("video_file", nargs="?", help="video file name inside ../assets/videos/")
+    parser.add_argument("--all", action="store_true", help="convert every video in ../assets/videos/")
+    parser.add_argument("--force", action="store_true", help="rebuild every output even if the cache says it is current")
+    parser.add_argument("--target-fps", type=float, default=30, help="frames per second to sample (default: 30)")
+    parser.add_argument("--max-frames", type=frame_budget, metavar="COUNT",
+                        help="keep at most COUNT frames, lowering the sample rate evenly so playback stays in sync "
+                             "with the audio; 'page' fits one atlas page (grid format only)")
+    parser.add_argument("--format", choices=("grid", "delta"), default="grid",
+                        help="grid: one full cell per frame (default); delta: keyframes plus changed "
+                             "rectangles, written as <name>_delta_*.png and <name>_delta_metadata.json")
+    parser.add_argument("--keyframe-interval", type=int, default=30,
+                        help="with --format delta, store a whole frame at least this often (default: 30)")
+    parser.add_argument("--delta-tolerance", type=int, default=0,
+                        help="with --format delta, ignore per-channel changes up to this size; 0 is lossless "
+                             "(default: 0)")
+    parser.add_argument("--decimate", choices=DECIMATE_MODES, default="grab",
+                        help="how frames are pulled from the video (default: grab)")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="decode the video as this many time ranges in parallel processes (default: 1)")
+    parser.add_argument("--page-size", type=int, default=MAX_IMAGE_WIDTH,
+                        help=f"maximum width and height of each atlas page in pixels (default and cap: {MAX_IMAGE_WIDTH})")
+    parser.add_argument("--dedup", action="store_true",
+                        help="store identical frames only once; the frame list repeats their cell")
+    parser.add_argument("--dedup-ssim", type=float, metavar="THRESHOLD",
+                        help="also merge a frame into the previous stored one when their SSIM is at least "
+                             "THRESHOLD (e.g. 0.98); implies --dedup")
+    parser.add_argument("--encoding", choices=texturecodec.ENCODINGS, default="png",
+                        help="page image encoding: png (default), png8 (palettized), jpeg or webp (lossy); "
+                             "--format delta only takes png")
+    parser.add_argument("--quality", type=int, default=90, help="jpeg/webp quality, 1-100 (default: 90)")
+    parser.add_argument("--png-compression", type=int, choices=range(10), metavar="0-9",
+                        help="zlib level for png/png8 pages: 0 encodes fastest, 9 gives the smallest files "
+                             "(default: the encoder's own)")
+    parser.add_argument("--colors", type=int, default=256, help="palette size for png8, 2-256 (default: 256)")
+    parser.add_argument("--tiers", nargs="+", choices=[tier for tier in texturecodec.TIERS if tier != "full"],
+                        default=[], help="also write these downscaled copies of every page, each with its own "
+                                         "<name>_<tier>_metadata.json (grid format only)")
+    parser.add_argument("--stats-jsonl", metavar="PATH",
+                        help="append per-page and per-stage build stats to PATH as JSON lines ('-' for stdout)")
+    parser.add_argument("--profile", nargs="?", const="video2cutscene.prof", metavar="PATH",
+                        help="run under cProfile, save the stats to PATH (default: video2cutscene.prof) and print "
+                             "the top functions; --workers processes are not profiled")
+    args = parser.parse_args()
+
+    if args.tiers and args.format == "delta":
+        parser.error("--tiers only applies to --format grid")
+    if args.max_frames == "page" and args.format == "delta":
+        parser.error("--max-frames page only applies to --format grid")
+    if args.format == "delta" and args.encoding in texturecodec.LOSSY_ENCODINGS:
+        # Delta frames must decode within --delta-tolerance of the source (cutscenedelta.py verify)
+        parser.error(f"--encoding {args.encoding} is lossy; --format delta needs png")
+    if not 2 <= args.colors <= 256:
+        parser.error("--colors must be between 2 and 256")
+
+    if args.all:
+        video_files = sorted(name for name in os.listdir("../assets/videos") if name.lower().endswith(VIDEO_EXTENSIONS))
+    elif args.video_file:
+        video_files = [args.video_file]
+    else:
+        parser.error("give a video file or --all")
+    # Outputs are named after the file name without its extension, so intro.mp4 and intro.mov
+    # would overwrite each other's image, metadata and audio
+    sources_by_name = {}
+    for video_file in video_files:
+        sources_by_name.setdefault(os.path.splitext(video_file)[0], []).append(video_file)
+    clashes = [names for names in sources_by_name.values() if len(names) > 1]
+    if clashes:
+        parser.error("videos with the same name would write the same outputs: "
+                     + "; ".join(", ".join(names) for names in clashes))
+
+    with contextlib.ExitStack() as stack:
+        stats_log = None
+        if args.stats_jsonl == "-":
+            stats_log = sys.stdout
+        elif args.stats_jsonl:
+            stats_log = stack.enter_context(open(args.stats_jsonl, "a"))
 
-# === EXTRACT AUDIO ===
-print(f"Extracting audio to: {output_audio}")
-os.makedirs(os.path.dirname(output_audio), exist_ok=True)
+        if not args.profile:
+            convert_all(video_files, args, stats_log)
+            return
+        profiler = cProfile.Profile()
+        try:
+            profiler.runcall(convert_all, video_files, args, stats_log)
+        finally:
+            profiler.dump_stats(args.profile)
+            print(f"Profile saved to: {args.profile}")
+            pstats.Stats(profiler).sort_stats("cumulative").print_stats(25)
 
-clip = VideoFileClip(video_path)
-clip.audio.write_audiofile(output_audio)
-clip.reader.close()
-clip.audio.reader.close_proc()
 
-# === DONE ===
-print(f"Image saved to: {output_image}")
-print(f"Metadata saved to: {output_json}")
-print(f"Audio saved to: {output_audio}")
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,272 @@
+import argparse
+import json
+import os
+import re
+import shutil
+import tempfile
+import time
+
+import numpy as np
+from PIL import Image
+
+from levelbuilder import (GENERATED_NAME, GRID_ORIGIN, GRID_SIZE, collider_object, enemy_object, merge_cells,
+                          tile_object)
+
+# Stress scenes
+# =============
+# Generates scenes far larger than any hand-made level, in the same schema and with the same object
+# templates as the editor export, to load-test scene parsing, collision and rendering in the engine:
+#
+#     python stressscene.py stress.json                                   (about 30k tiles, 2000 enemies)
+#     python stressscene.py huge.json --map-size 20000 32 --enemies 20000 --depth 256 --colliders tiles
+#
+# The map is a seeded random walk of ground columns plus floating platforms, on the editor grid
+# (GRID_SIZE cells from GRID_ORIGIN, like tilemap-v2.py placements). Enemies (EnemyScript) stand on
+# the ground or on a platform. Collision is one box per solid tile (--colliders tiles), the fewest
+# collider-only objects covering them (merged), or none.
+#
+# Tree: every REGION_COLUMNS map columns get a group node (no object) under the root. A region's
+# objects hang below it in chains of --depth nodes, each the child of the one before, so DFS walks
+# get deep. The engine derives every world transform from the object's own local one, so objects
+# keep absolute positions wherever they sit in the tree.
+#
+# The base scene's other objects, tree nodes, scripts and game state are kept; objects and region
+# nodes from an earlier run or editor export are dropped, so a stress scene can be the --base of
+# the next one. Objects and tree nodes are written one at a time as they are generated (tree nodes
+# via a temporary file), so memory stays flat however big the scene gets.
+
+REGION_COLUMNS = 64
+TILESET = "assets/images/1_Generic_32x32.png"
+TILESET_TILE_SIZE = 32
+TILE_INDICES = {"surface": 0, "ground": 16, "platform": 1}  # tileset cells (row-major) used for each kind
+COLLIDER_MODES = ("tiles", "merged", "none")
+
+# Names this generator writes, besides the editor export's enemies (levelbuilder.GENERATED_NAME)
+STRESS_NAME = re.compile(r"(Tile|Collider)\d+$")
+REGION_NODE = re.compile(r"region\d+$")
+
+
+# === LAYOUT ===
+def generate_layout(columns, rows, enemy_count, seed=0, platform_density=0.05):
+    """Lay out a map of columns x rows cells.
+
+    Returns (kinds, enemies): kinds is a (rows, columns) array of tile kind names ("" for empty) and
+    enemies a list of (col, row) cells, each standing on top of a tile.
+    """
+    rng = np.random.default_rng(seed)
+    # Ground height is a random walk pulled back whenever it strays more than rows / 6 from two
+    # thirds down the map, so a long map stays hilly instead of drifting to the top or bottom
+    middle, reach = rows * 2 // 3, max(1, rows // 6)
+    surface = np.empty(columns, dtype=np.intp)
+    height = middle
+    for col, step in enumerate(rng.integers(-1, 2, size=columns).tolist()):
+        height += step + (height < middle - reach) - (height > middle + reach)
+        surface[col] = height = min(max(height, rows // 3), rows - 1)
+
+    kinds = np.full((rows, columns), "", dtype="<U8")
+    row_index = np.arange(rows)[:, None]
+    kinds[row_index > surface] = "ground"
+    kinds[surface, np.arange(columns)] = "surface"
+
+    for start in rng.integers(0, columns, size=int(columns * platform_density)):
+        row = surface[start] - int(rng.integers(3, 6))
+        stop = min(columns, start + int(rng.integers(3, 9)))
+        if row < 1:
+            continue
+        # keep at least one empty row between a platform and the ground under it
+        span = np.arange(start, stop)
+        span = span[surface[span] > row + 1]
+        kinds[row, span] = "platform"
+
+    # Standing spots: empty cells with a tile directly below
+    standing = (kinds[:-1] == "") & (kinds[1:] != "")
+    spot_rows, spot_cols = np.nonzero(standing)
+    if enemy_count > len(spot_rows):
+        print(f"Only {len(spot_rows)} standing spots on this map; placing {len(spot_rows)} enemies.")
+        enemy_count = len(spot_rows)
+    picks = np.sort(rng.choice(len(spot_rows), size=enemy_count, replace=False))
+    enemies = list(zip(spot_cols[picks].tolist(), spot_rows[picks].tolist()))
+    return kinds, enemies
+
+
+def src_rect(tileset_columns, index, tile_size):
+    return [(index % tileset_columns) * tile_size, (index // tileset_columns) * tile_size, tile_size, tile_size]
+
+
+def region_objects(kinds, enemies, colliders, tileset, tileset_columns, tile_size, grid_size, origin):
+    """Yield (region, object) for every generated object, region by region.
+
+    colliders decides the collision: "tiles", "none", or the merged collider rects (in cells).
+    """
+    def position(col, row):
+        return origin[0] + col * grid_size, origin[1] + row * grid_size
+
+    rows, columns = kinds.shape
+    enemies_by_region, rects_by_region = {}, {}
+    for col, row in enemies:
+        enemies_by_region.setdefault(col // REGION_COLUMNS, []).append((col, row))
+    if not isinstance(colliders, str):
+        for rect in colliders:
+            rects_by_region.setdefault(rect[0] // REGION_COLUMNS, []).append(rect)
+
+    counts = {"Tile": 0, "Enemy": 0, "Collider": 0}
+    for region in range(-(-columns // REGION_COLUMNS)):
+        first = region * REGION_COLUMNS
+        block = kinds[:, first:first + REGION_COLUMNS]
+        # column by column, top to bottom
+        for col_offset, row in zip(*np.nonzero((block != "").T)):
+            col = first + int(col_offset)
+            kind = block[row, col_offset]
+            x, y = position(col, int(row))
+            yield region, tile_object(f"Tile{counts['Tile']}", x, y, tileset,
+                                      src_rect(tileset_columns, TILE_INDICES[kind], tile_size),
+                                      solid=colliders == "tiles", grid_size=grid_size)
+            counts["Tile"] += 1
+        for col, row in enemies_by_region.get(region, []):
+            yield region, enemy_object(f"Enemy{counts['Enemy']}", *position(col, row))
+            counts["Enemy"] += 1
+        for col, row, width, height in rects_by_region.get(region, []):
+            x, y = position(col, row)
+            yield region, collider_object(f"Collider{counts['Collider']}",
+                                          [x, y, width * grid_size, height * grid_size])
+            counts["Collider"] += 1
+
+
+# === WRITING ===
+def is_generated(name):
+    return bool(GENERATED_NAME.match(name) or STRESS_NAME.match(name))
+
+
+def base_tree(scene_tree):
+    """The base scene's objects and tree nodes, without the ones an earlier run or export generated.
+
+    Tree node indices are renumbered; a kept node whose parent was dropped moves up to the nearest
+    kept ancestor.
+    """
+    objects = [obj for obj in scene_tree.get("objects", []) if not is_generated(obj.get("name", ""))]
+    nodes = []
+    new_index = {0: 0}  # old tree node index -> new one; the root is 0
+    for old_index, node in enumerate(scene_tree.get("treeNodes", []), start=1):
+        parent = new_index.get(node.get("parent", 0), 0)
+        if "objName" in node:
+            generated = is_generated(node["objName"])
+        else:
+            generated = bool(REGION_NODE.match(node.get("name", "")))
+        if generated:
+            new_index[old_index] = parent
+            continue
+        nodes.append(dict(node, parent=parent))
+        new_index[old_index] = len(nodes)
+    return objects, nodes
+
+
+def write_stress_scene(path, base_scene, objects, depth):
+    """Stream base_scene plus the generated (region, object) pairs to path as a scene JSON file.
+
+    Written to a temporary file and moved into place at the end, like levelbuilder.write_scene.
+    Returns {"objects", "treeNodes", "maxDepth", "bytes"} for the generated part.
+    """
+    scene_tree = base_scene.get("sceneTree", {})
+    base_objects, base_nodes = base_tree(scene_tree)
+    top_level = {key: value for key, value in base_scene.items() if key != "sceneTree"}
+
+    stats = {"objects": 0, "treeNodes": 0, "maxDepth": 0}
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as out, tempfile.TemporaryFile("w+", dir=os.path.dirname(os.path.abspath(path))) as nodes:
+        out.write("{\n")
+        for key, value in top_level.items():
+            out.write(f"{json.dumps(key)}:{json.dumps(value, separators=(',', ':'))},\n")
+        out.write('"sceneTree":{"objects":[')
+
+        separator = "\n"
+        node_count = 0
+
+        def add_node(node):
+            nonlocal node_count
+            nodes.write(("\n" if node_count == 0 else ",\n") + json.dumps(node, separators=(",", ":")))
+            node_count += 1
+            return node_count  # this node's index; the root is 0
+
+        for obj in base_objects:
+            out.write(separator + json.dumps(obj, separators=(",", ":")))
+            separator = ",\n"
+        for node in base_nodes:
+            add_node(node)
+
+        # Region group nodes hold chains of at most depth objects
+        current_region, region_node, parent, chain = None, 0, 0, 0
+        for region, obj in objects:
+            if region != current_region:
+                current_region = region
+                region_node = add_node({"name": f"region{region}", "parent": 0})
+                parent, chain = region_node, 0
+                stats["treeNodes"] += 1
+            if chain == depth:
+                parent, chain = region_node, 0
+            out.write(separator + json.dumps(obj, separators=(",", ":")))
+            separator = ",\n"
+            parent = add_node({"name": obj["name"].lower(), "objName": obj["name"], "parent": parent})
+            chain += 1
+            stats["objects"] += 1
+            stats["treeNodes"] += 1
+            stats["maxDepth"] = max(stats["maxDepth"], chain + 1)  # +1 for the region node
+
+        out.write('\n],"treeNodes":[')
+        nodes.seek(0)
+        shutil.copyfileobj(nodes, out)
+        out.write("\n]}\n}\n")
+    os.replace(tmp_path, path)
+    stats["bytes"] = os.path.getsize(path)
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a very large scene for load-testing the engine; run from Engine/.")
+    parser.add_argument("output", help="scene JSON file to write")
+    parser.add_argument("--base", default="MainLevel.json",
+                        help="scene whose objects, scripts and game state are kept (default: MainLevel.json)")
+    parser.add_argument("--map-size", type=int, nargs=2, default=(4000, 24), metavar=("COLUMNS", "ROWS"),
+                        help="map size in grid cells (default: 4000 24, about 30k tiles)")
+    parser.add_argument("--enemies", type=int, default=2000, help="enemies with EnemyScript (default: 2000)")
+    parser.add_argument("--depth", type=int, default=16,
+                        help="objects per parent-child chain in the scene tree (default: 16; 1 is flat)")
+    parser.add_argument("--colliders", choices=COLLIDER_MODES, default="merged",
+                        help="tiles: a collision box per solid tile; merged: the fewest collider-only objects "
+                             "covering them (default); none: no terrain collision")
+    parser.add_argument("--platforms", type=float, default=0.05,
+                        help="floating platforms per map column (default: 0.05)")
+    parser.add_argument("--tileset", default=TILESET, help=f"tileset texture (default: {TILESET})")
+    parser.add_argument("--tileset-tile-size", type=int, default=TILESET_TILE_SIZE,
+                        help=f"tile size in the tileset, in pixels (default: {TILESET_TILE_SIZE})")
+    parser.add_argument("--grid-size", type=int, default=GRID_SIZE, help=f"map cell size in pixels (default: {GRID_SIZE})")
+    parser.add_argument("--origin", type=int, nargs=2, default=GRID_ORIGIN, metavar=("X", "Y"),
+                        help="canvas position of cell (0, 0) (default: 90 230)")
+    parser.add_argument("--seed", type=int, default=0, help="random seed; the same seed gives the same scene")
+    args = parser.parse_args()
+    if args.depth < 1:
+        parser.error("--depth must be at least 1")
+
+    start = time.perf_counter()
+    with open(args.base) as f:
+        base_scene = json.load(f)
+    with Image.open(args.tileset) as tileset:
+        tileset_columns = tileset.width // args.tileset_tile_size
+
+    columns, rows = args.map_size
+    kinds, enemies = generate_layout(columns, rows, args.enemies, args.seed, args.platforms)
+    colliders = args.colliders
+    if colliders == "merged":
+        colliders = merge_cells(kinds != "")
+    objects = region_objects(kinds, enemies, colliders, args.tileset, tileset_columns, args.tileset_tile_size,
+                             args.grid_size, tuple(args.origin))
+    stats = write_stress_scene(args.output, base_scene, objects, args.depth)
+
+    tile_count = int(np.count_nonzero(kinds != ""))
+    collider_count = {"tiles": tile_count, "none": 0}.get(args.colliders, len(colliders))
+    print(f"{args.output}: {tile_count} tiles, {len(enemies)} enemies, {collider_count} colliders; "
+          f"{stats['objects']} objects and {stats['treeNodes']} tree nodes generated (tree depth {stats['maxDepth']}); "
+          f"{stats['bytes'] / 1e6:.1f} MB in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
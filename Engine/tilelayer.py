@@ -0,0 +1,197 @@
+import numpy as np
+
+EMPTY = -1
+CHUNK_SIZE = 32
+
+
+class TileLayer:
+    """A width x height grid of tile indices, stored as sparse square chunks.
+
+    Only chunks with at least one painted cell hold an array, so memory follows the painted area.
+    Cells are addressed as (x, y) = (column, row); EMPTY marks an unpainted cell.
+    """
+    def __init__(self, width, height, chunk_size=CHUNK_SIZE, dtype=np.int32):
+        self.width = width
+        self.height = height
+        self.chunk_size = chunk_size
+        self.dtype = dtype
+        self.chunks = {}   # (chunk_x, chunk_y) -> (chunk_size, chunk_size) array indexed [y, x]
+        self.counts = {}   # (chunk_x, chunk_y) -> painted cells in that chunk
+
+    def in_bounds(self, x, y):
+        return 0 <= x < self.width and 0 <= y < self.height
+
+    def get(self, x, y):
+        chunk = self.chunks.get((x // self.chunk_size, y // self.chunk_size))
+        if chunk is None:
+            return EMPTY
+        return int(chunk[y % self.chunk_size, x % self.chunk_size])
+
+    def set(self, x, y, value):
+        """Set one cell. Returns True if it changed."""
+        key = (x // self.chunk_size, y // self.chunk_size)
+        chunk = self.chunks.get(key)
+        if chunk is None:
+            if value == EMPTY:
+                return False
+            chunk = self.chunks[key] = np.full((self.chunk_size, self.chunk_size), EMPTY, dtype=self.dtype)
+            self.counts[key] = 0
+
+        cy, cx = y % self.chunk_size, x % self.chunk_size
+        old = int(chunk[cy, cx])
+        if old == value:
+            return False
+        chunk[cy, cx] = value
+        self.counts[key] += (old == EMPTY) - (value == EMPTY)
+        if not self.counts[key]:
+            del self.chunks[key], self.counts[key]
+        return True
+
+    def set_cells(self, xs, ys, values):
+        """Set many cells at once, one numpy assignment per chunk. Cells must be in bounds and distinct."""
+        xs, ys, values = np.asarray(xs), np.asarray(ys), np.asarray(values)
+        if not xs.size:
+            return
+        size = self.chunk_size
+        chunk_xs, chunk_ys = xs // size, ys // size
+        order = np.lexsort((chunk_xs, chunk_ys))
+        keys = np.stack((chunk_xs[order], chunk_ys[order]), axis=1)
+        starts = np.flatnonzero(np.any(np.diff(keys, axis=0) != 0, axis=1)) + 1
+        for group in np.split(order, starts):
+            key = (int(chunk_xs[group[0]]), int(chunk_ys[group[0]]))
+            chunk = self.chunks.get(key)
+            if chunk is None:
+                if np.all(values[group] == EMPTY):
+                    continue
+                chunk = self.chunks[key] = np.full((size, size), EMPTY, dtype=self.dtype)
+            chunk[ys[group] % size, xs[group] % size] = values[group]
+            count = int(np.count_nonzero(chunk != EMPTY))
+            if count:
+                self.counts[key] = count
+            else:
+                del self.chunks[key]
+                self.counts.pop(key, None)
+
+    def _chunk_spans(self, x, y, width, height):
+        """Yield (key, chunk_slice, region_slice) for every chunk overlapping a region (clipped to the layer)."""
+        x0, y0 = max(x, 0), max(y, 0)
+        x1, y1 = min(x + width, self.width), min(y + height, self.height)
+        size = self.chunk_size
+        for chunk_y in range(y0 // size, (y1 - 1) // size + 1 if y1 > y0 else 0):
+            for chunk_x in range(x0 // size, (x1 - 1) // size + 1 if x1 > x0 else 0):
+                left, top = chunk_x * size, chunk_y * size
+                sx0, sx1 = max(x0, left), min(x1, left + size)
+                sy0, sy1 = max(y0, top), min(y1, top + size)
+                yield ((chunk_x, chunk_y),
+                       (slice(sy0 - top, sy1 - top), slice(sx0 - left, sx1 - left)),
+                       (slice(sy0 - y, sy1 - y), slice(sx0 - x, sx1 - x)))
+
+    def _write(self, key, chunk_slice, values):
+        """Assign values (scalar or array) into one chunk, allocating or dropping it as needed."""
+        chunk = self.chunks.get(key)
+        if chunk is None:
+            if np.all(values == EMPTY):
+                return
+            chunk = self.chunks[key] = np.full((self.chunk_size, self.chunk_size), EMPTY, dtype=self.dtype)
+        chunk[chunk_slice] = values
+        count = int(np.count_nonzero(chunk != EMPTY))
+        if count:
+            self.counts[key] = count
+        else:
+            del self.chunks[key]
+            self.counts.pop(key, None)
+
+    def fill(self, x, y, width, height, value):
+        """Set every cell of a rectangle to value; filling with EMPTY frees the chunks it clears."""
+        for key, chunk_slice, _ in self._chunk_spans(x, y, width, height):
+            self._write(key, chunk_slice, value)
+
+    def copy(self, x, y, width, height):
+        """Dense (height, width) array of a rectangle; cells outside the layer read as EMPTY."""
+        block = np.full((height, width), EMPTY, dtype=self.dtype)
+        for key, chunk_slice, region_slice in self._chunk_spans(x, y, width, height):
+            chunk = self.chunks.get(key)
+            if chunk is not None:
+                block[region_slice] = chunk[chunk_slice]
+        return block
+
+    def paste(self, x, y, block, skip_empty=True):
+        """Write a block from copy() with its top-left at (x, y), clipped to the layer.
+
+        With skip_empty, EMPTY cells in the block leave the layer untouched instead of erasing it.
+        """
+        height, width = block.shape
+        for key, chunk_slice, region_slice in self._chunk_spans(x, y, width, height):
+            values = block[region_slice]
+            if skip_empty:
+                chunk = self.chunks.get(key)
+                current = chunk[chunk_slice] if chunk is not None else EMPTY
+                values = np.where(values == EMPTY, current, values)
+            self._write(key, chunk_slice, values)
+
+    def flood_fill(self, x, y, value):
+        """Fill the 4-connected region of cells equal to the one at (x, y). Returns the changed (x, y) cells."""
+        target = self.get(x, y)
+        if target == value or not self.in_bounds(x, y):
+            return []
+
+        grid = self.copy(0, 0, self.width, self.height)
+        region = np.zeros(grid.shape, dtype=bool)
+        # Scanline fill: each stack entry seeds a horizontal run, which seeds runs in the rows around it
+        stack = [(x, y)]
+        while stack:
+            x, y = stack.pop()
+            if region[y, x] or grid[y, x] != target:
+                continue
+            row = grid[y]
+            stops = np.flatnonzero(row[x:] != target)
+            right = x + int(stops[0]) if stops.size else self.width
+            stops = np.flatnonzero(row[:x] != target)
+            left = int(stops[-1]) + 1 if stops.size else 0
+            region[y, left:right] = True
+            for next_y in (y - 1, y + 1):
+                if 0 <= next_y < self.height:
+                    open_cells = (grid[next_y, left:right] == target) & ~region[next_y, left:right]
+                    starts = open_cells & ~np.concatenate(([False], open_cells[:-1]))
+                    stack.extend((left + int(i), next_y) for i in np.flatnonzero(starts))
+
+        ys, xs = np.nonzero(region)
+        grid[region] = value
+        top, bottom, left, right = ys.min(), ys.max() + 1, xs.min(), xs.max() + 1
+        self.paste(left, top, grid[top:bottom, left:right], skip_empty=False)
+        return list(zip(xs.tolist(), ys.tolist()))
+
+    def cells(self):
+        """Yield (x, y, value) for every painted cell, chunk by chunk."""
+        for (chunk_x, chunk_y), chunk in self.chunks.items():
+            ys, xs = np.nonzero(chunk != EMPTY)
+            values = chunk[ys, xs]
+            for cx, cy, value in zip(xs.tolist(), ys.tolist(), values.tolist()):
+                yield chunk_x * self.chunk_size + cx, chunk_y * self.chunk_size + cy, value
+
+    def __len__(self):
+        """Number of painted cells."""
+        return sum(self.counts.values())
+
+
+class TileMap:
+    """An ordered stack of same-sized TileLayers, drawn first to last."""
+    def __init__(self, width, height, layer_names=("tiles",), chunk_size=CHUNK_SIZE):
+        self.width = width
+        self.height = height
+        self.chunk_size = chunk_size
+        self.layers = {}
+        for name in layer_names:
+            self.add_layer(name)
+
+    def add_layer(self, name):
+        if name in self.layers:
+            raise ValueError(f"Layer '{name}' already exists.")
+        self.layers[name] = TileLayer(self.width, self.height, self.chunk_size)
+        return self.layers[name]
+
+    def remove_layer(self, name):
+        del self.layers[name]
+
+    def __getitem__(self, name):
+        return self.layers[name]
@@ -5,14 +5,81 @@
 
 import tkinter as tk
 from tkinter import filedialog, simpledialog
-from PIL import Image, ImageTk
+from PIL import Image, ImageDraw, ImageTk
+import argparse
 import json
+import math
+import os
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from edithistory import EditHistory
+from levelbuilder import export_enemies, write_scene
+from tilelayer import EMPTY, TileMap
+
+PHOTO_CACHE_SIZE = 256   # tileset tile PhotoImages kept after they scroll out of the picker
+LOADER_POLL_MS = 20      # how often the Tk thread checks for finished background decodes
+
+
+def slice_tileset(file_path, grid_size):
+    """Decode a tileset and cut it into grid_size cells: (width, height, {(row, col): rgba tile}).
+
+    Runs on the loader thread, so it must not touch Tk. Cells on the right and bottom edges may be
+    partial; the missing part is transparent.
+    """
+    with Image.open(file_path) as image:
+        sheet = image.convert("RGBA")
+    tiles = {}
+    for row in range(math.ceil(sheet.height / grid_size)):
+        for col in range(math.ceil(sheet.width / grid_size)):
+            left, upper = col * grid_size, row * grid_size
+            tiles[(row, col)] = sheet.crop((left, upper, left + grid_size, upper + grid_size))
+    return sheet.width, sheet.height, tiles
+
+
+def decode_image(file_path):
+    """Fully decode an image on the loader thread."""
+    with Image.open(file_path) as image:
+        image.load()
+        return image.copy()
+
+
+class PhotoCache:
+    """LRU of Tk PhotoImages keyed by (tileset, row, col).
+
+    The canvas items currently showing a tile hold their own reference, so evicting a photo here only
+    drops it once it is also off screen.
+    """
+    def __init__(self, capacity=PHOTO_CACHE_SIZE):
+        self.capacity = capacity
+        self.photos = OrderedDict()
+
+    def get(self, key, make):
+        photo = self.photos.get(key)
+        if photo is None:
+            photo = self.photos[key] = make()
+            while len(self.photos) > self.capacity:
+                self.photos.popitem(last=False)
+        else:
+            self.photos.move_to_end(key)
+        return photo
+
+    def clear(self):
+        self.photos.clear()
+
 
 class TileMapEditor:
-    def __init__(self, root):
+    def __init__(self, root, level_width=2800, scene_path="testTile.json", compact=False, merge_colliders=False,
+                 autosave_path=None):
         self.root = root
+        self.autosave_path = autosave_path
+        self.scene_path = scene_path  # default target of the export dialog
+        self.compact = compact
+        self.merge_colliders = merge_colliders
         self.root.title("Tile Map Editor")
         self.GRID_SIZE =40  # tile size (32x32 pixels)
+        self.CHUNK_SIZE = 16  # map chunks are CHUNK_SIZE x CHUNK_SIZE cells, one canvas item each
+        self.level_width = level_width
 
         # === main container ===
         self.main_frame = tk.Frame(root)
@@ -52,7 +119,9 @@ class TileMapEditor:
         self.v_scroll = tk.Scrollbar(self.image_frame, orient=tk.VERTICAL, command=self.image_canvas.yview)
         self.h_scroll = tk.Scrollbar(self.image_frame, orient=tk.HORIZONTAL, command=self.image_canvas.xview)
 
-        self.image_canvas.configure(yscrollcommand=self.v_scroll.set, xscrollcommand=self.h_scroll.set)
+        self.image_canvas.configure(yscrollcommand=lambda first, last: self.on_tileset_scroll(self.v_scroll, first, last),
+                                    xscrollcommand=lambda first, last: self.on_tileset_scroll(self.h_scroll, first, last))
+        self.image_canvas.bind("<Configure>", lambda event: self.draw_visible_tiles())
 
         # grid layout for scrollbars (necessary to force horizontal scrollbar on the bottom)
         self.image_canvas.grid(row=0, column=0, sticky="nsew")
@@ -74,7 +143,9 @@ class TileMapEditor:
         self.v_map_scroll = tk.Scrollbar(self.map_frame, orient=tk.VERTICAL, command=self.editor_canvas.yview)
         self.h_map_scroll = tk.Scrollbar(self.map_frame, orient=tk.HORIZONTAL, command=self.editor_canvas.xview)
 
-        self.editor_canvas.configure(yscrollcommand=self.v_map_scroll.set, xscrollcommand=self.h_map_scroll.set)
+        self.editor_canvas.configure(yscrollcommand=lambda first, last: self.on_map_scroll(self.v_map_scroll, first, last),
+                                     xscrollcommand=lambda first, last: self.on_map_scroll(self.h_map_scroll, first, last))
+        self.editor_canvas.bind("<Configure>", lambda event: self.update_visible_chunks())
 
         # again, grid layout for correct scrollbar placement
         self.editor_canvas.grid(row=0, column=0, sticky="nsew")
@@ -88,15 +159,32 @@ class TileMapEditor:
         self.status_label.pack(side=tk.BOTTOM, fill=tk.X)
 
         # === tileset and map state tracking ===
-        self.tk_image = None              # tk image reference to entire tileset
-        self.tileset_image = None         # original pil image
+        self.tileset_path = None          # tileset shown in the picker
+        self.tileset_tiles = {}           # (row, col) -> rgba pil tile, sliced on the loader thread
+        self.picker_items = {}            # (row, col) -> (canvas item, PhotoImage) for tiles in view
+        self.photo_cache = PhotoCache()
         self.selected_tile_coords = None  # (row, col)
-        self.selected_tile_image = None   # cropped tile 
+        self.selected_tile_id = None      # palette index of the cropped tile
         self.tile_highlight = None        # red rectangle to highlight tile
-        self.tile_data = []
+        self.tile_data = None             # TileMap of palette indices, one "tiles" layer
+        self.tiles = None
+        self.history = None               # EditHistory of tile_data: undo/redo and the autosave log
+        self.tile_palette = []            # palette index -> cropped rgba pil img (None until its tileset loads)
+        self.palette_ids = {}             # (tileset, row, col) -> palette index
         self.map_rows = 3
         self.map_cols = 15
 
+        # === map chunk state ===
+        self.chunk_items = {}        # (chunk_row, chunk_col) -> canvas item, only for visible chunks
+        self.chunk_images = {}       # (chunk_row, chunk_col) -> PhotoImage shown by that item
+        self.free_chunk_items = []   # hidden canvas items waiting to be reused
+
+        # === background loading ===
+        # Image files are decoded (and tilesets sliced) on one worker thread; results are handed back
+        # to the Tk thread by polling, since Tk may only be called from the thread that created it
+        self.loader = ThreadPoolExecutor(max_workers=1)
+        self.background_jobs = []         # (future, callback) waiting for the Tk thread
+
         # === init default state ===
         self.update_tileset("assets/images/enemy_sprite.png")  
         self.draw_map_grid() 
@@ -105,12 +193,39 @@ class TileMapEditor:
 
         self.draw_clickable_boundary()
 
+        self.root.bind("<Control-z>", lambda event: self.undo())
+        self.root.bind("<Control-y>", lambda event: self.redo())
+        self.root.bind("<Control-Z>", lambda event: self.redo())
+
+    def run_in_background(self, callback, function, *args):
+        """Run function(*args) on the loader thread, then callback(result) on the Tk thread."""
+        self.background_jobs.append((self.loader.submit(function, *args), callback))
+        if len(self.background_jobs) == 1:
+            self.root.after(LOADER_POLL_MS, self.poll_background_jobs)
+
+    def poll_background_jobs(self):
+        # Walk a copy: a callback may queue another job. Each finished job leaves the list only after
+        # its callback, so the list never empties mid-poll and run_in_background starts no second poll.
+        for job in list(self.background_jobs):
+            future, callback = job
+            if not future.done():
+                continue
+            if future.exception() is not None:
+                self.status_label.config(text=f"Could not load image: {future.exception()}")
+            else:
+                callback(future.result())
+            self.background_jobs.remove(job)
+        if self.background_jobs:
+            self.root.after(LOADER_POLL_MS, self.poll_background_jobs)
+
     def set_editor_background(self, texture_path):
-        texture_image = Image.open(texture_path)
+        self.run_in_background(self.show_editor_background, decode_image, texture_path)
 
+    def show_editor_background(self, texture_image):
         self.texture_tk_image = ImageTk.PhotoImage(texture_image)
 
-        self.editor_canvas.create_image(0, 0, anchor=tk.NW, image=self.texture_tk_image)
+        background = self.editor_canvas.create_image(0, 0, anchor=tk.NW, image=self.texture_tk_image)
+        self.editor_canvas.tag_lower(background)  # stay under the map chunks
 
         self.editor_canvas.image = self.texture_tk_image
 
@@ -131,36 +246,85 @@ class TileMapEditor:
 
 
     def update_tileset(self, file_path):
-        # load img
-        image = Image.open(file_path)
+        # decode + slice off the Tk thread; the picker fills in once the tiles arrive
+        self.status_label.config(text=f"Loading {os.path.basename(file_path)}...")
+        self.run_in_background(lambda result: self.show_tileset(file_path, *result),
+                               slice_tileset, file_path, self.GRID_SIZE)
 
-        # store img
-        self.tileset_image = image
+    def show_tileset(self, file_path, width, height, tiles):
+        self.tileset_path = file_path
+        self.tileset_tiles = tiles
+        self.status_label.config(text="")
 
-        # get tinker compatible img
-        self.tk_image = ImageTk.PhotoImage(image)
-
-        # clear + draw img
+        # clear + draw only the tiles in view; more are drawn as the picker scrolls
         self.image_canvas.delete("all")
-        self.image_canvas.create_image(0, 0, anchor=tk.NW, image=self.tk_image)
-        self.image_canvas.config(scrollregion=(0, 0, image.width, image.height)) # update scrolling to fit size of new img  
-        self.draw_grid(image.width, image.height)
+        self.picker_items = {}
+        self.tile_highlight = None
+        self.image_canvas.config(scrollregion=(0, 0, width, height)) # update scrolling to fit size of new img  
+        self.draw_grid(width, height)
+        self.draw_visible_tiles()
+
+        # palette entries restored from the autosave get their images once their tileset is here
+        restored = False
+        for (path, row, col), tile_id in self.palette_ids.items():
+            if path == file_path and self.tile_palette[tile_id] is None and (row, col) in tiles:
+                self.tile_palette[tile_id] = tiles[(row, col)]
+                restored = True
+        if restored:
+            self.redraw_chunks(list(self.chunk_images))
 
         self.image_canvas.bind("<Button-1>", self.on_tileset_click)
 
+    def on_tileset_scroll(self, scrollbar, first, last):
+        scrollbar.set(first, last)
+        self.draw_visible_tiles()
+
+    def draw_visible_tiles(self):
+        """Keep picker items only for tileset cells in view, with their PhotoImages from the LRU cache."""
+        if not self.tileset_tiles:
+            return
+        width = self.image_canvas.winfo_width()
+        height = self.image_canvas.winfo_height()
+        if width <= 1 or height <= 1:
+            # not mapped yet, use the requested size
+            width = int(self.image_canvas.cget("width"))
+            height = int(self.image_canvas.cget("height"))
+        left, top = self.image_canvas.canvasx(0), self.image_canvas.canvasy(0)
+        visible = {(row, col)
+                   for row in range(int(top // self.GRID_SIZE), int((top + height) // self.GRID_SIZE) + 1)
+                   for col in range(int(left // self.GRID_SIZE), int((left + width) // self.GRID_SIZE) + 1)
+                   if (row, col) in self.tileset_tiles}
+
+        for cell in list(self.picker_items):
+            if cell not in visible:
+                self.image_canvas.delete(self.picker_items.pop(cell)[0])
+        for row, col in visible - self.picker_items.keys():
+            photo = self.tile_photo(row, col)
+            item = self.image_canvas.create_image(col * self.GRID_SIZE, row * self.GRID_SIZE, anchor=tk.NW,
+                                                  image=photo, tags="tile")
+            self.picker_items[(row, col)] = (item, photo)
+        self.image_canvas.tag_raise("grid")
+        if self.tile_highlight:
+            self.image_canvas.tag_raise(self.tile_highlight)
+
+    def tile_photo(self, row, col):
+        """The shared PhotoImage of one tileset cell."""
+        return self.photo_cache.get((self.tileset_path, row, col),
+                                    lambda: ImageTk.PhotoImage(self.tileset_tiles[(row, col)]))
+
     def draw_grid(self, width, height):
         grid_color = "#cccccc"
         for x in range(0, width, self.GRID_SIZE):
-            self.image_canvas.create_line(x, 0, x, height, fill=grid_color)
+            self.image_canvas.create_line(x, 0, x, height, fill=grid_color, tags="grid")
         for y in range(0, height, self.GRID_SIZE):
-            self.image_canvas.create_line(0, y, width, y, fill=grid_color)
+            self.image_canvas.create_line(0, y, width, y, fill=grid_color, tags="grid")
 
 
     def draw_map_grid(self):
         self.editor_canvas.delete("all")
 
         # Define desired size
-        target_width = 2800
+        target_width = self.level_width
         target_height = 120
 
         # Calculate number of columns and rows based on tile size
@@ -170,37 +334,118 @@ class TileMapEditor:
         # Store rows and cols
         self.map_rows = rows
         self.map_cols = cols
-        self.tile_data = [[None for _ in range(cols)] for _ in range(rows)]
-
-        # Draw the grid rectangles
-        for row in range(rows):
-            for col in range(cols):
-                x1 = col * self.GRID_SIZE + self.grid_offset_x
-                y1 = row * self.GRID_SIZE + self.grid_offset_y
-                x2 = x1 + self.GRID_SIZE
-                y2 = y1 + self.GRID_SIZE
-                self.editor_canvas.create_rectangle(x1, y1, x2, y2, outline="#999")
+        self.tile_data = TileMap(cols, rows)
+        self.tiles = self.tile_data["tiles"]
+        if self.history is not None:
+            self.history.close()
+        self.history = EditHistory(self.tile_data, self.autosave_path)
+        self.tile_palette = []
+        self.palette_ids = {}
+        for path, row, col in self.history.meta.get("palette", []):
+            self.palette_ids[(path, row, col)] = len(self.tile_palette)
+            self.tile_palette.append(self.tileset_tiles.get((row, col)) if path == self.tileset_path else None)
+
+        # The grid and placed tiles are drawn into per-chunk images as chunks scroll into view
+        self.chunk_items = {}
+        self.chunk_images = {}
+        self.free_chunk_items = []
 
         self.editor_canvas.config(scrollregion=(0, 0, target_width, target_height))
         self.editor_canvas.bind("<Button-1>", self.on_map_click)
+        self.editor_canvas.bind("<B1-Motion>", self.on_map_click)
+        self.editor_canvas.bind("<ButtonRelease-1>", lambda event: self.history.end_stroke())
+        self.update_visible_chunks()
+
+    def on_map_scroll(self, scrollbar, first, last):
+        scrollbar.set(first, last)
+        self.update_visible_chunks()
+
+    def update_visible_chunks(self):
+        """Keep canvas items only for the map chunks that intersect the visible part of the canvas."""
+        chunk_px = self.CHUNK_SIZE * self.GRID_SIZE
+        width = self.editor_canvas.winfo_width()
+        height = self.editor_canvas.winfo_height()
+        if width <= 1 or height <= 1:
+            # not mapped yet, use the requested size
+            width = int(self.editor_canvas.cget("width"))
+            height = int(self.editor_canvas.cget("height"))
+        left = self.editor_canvas.canvasx(0) - self.grid_offset_x
+        top = self.editor_canvas.canvasy(0) - self.grid_offset_y
+
+        chunk_cols = -(-self.map_cols // self.CHUNK_SIZE)
+        chunk_rows = -(-self.map_rows // self.CHUNK_SIZE)
+        first_col, last_col = max(0, int(left // chunk_px)), min(chunk_cols - 1, int((left + width) // chunk_px))
+        first_row, last_row = max(0, int(top // chunk_px)), min(chunk_rows - 1, int((top + height) // chunk_px))
+        visible = {(row, col) for row in range(first_row, last_row + 1) for col in range(first_col, last_col + 1)}
+
+        # recycle items of chunks that scrolled out of view
+        for chunk in list(self.chunk_items):
+            if chunk not in visible:
+                item = self.chunk_items.pop(chunk)
+                del self.chunk_images[chunk]
+                self.editor_canvas.itemconfigure(item, state="hidden")
+                self.free_chunk_items.append(item)
+
+        for chunk in visible - self.chunk_items.keys():
+            photo = ImageTk.PhotoImage(self.compose_chunk(chunk))
+            x = chunk[1] * chunk_px + self.grid_offset_x
+            y = chunk[0] * chunk_px + self.grid_offset_y
+            if self.free_chunk_items:
+                item = self.free_chunk_items.pop()
+                self.editor_canvas.coords(item, x, y)
+                self.editor_canvas.itemconfigure(item, image=photo, state="normal")
+            else:
+                item = self.editor_canvas.create_image(x, y, anchor=tk.NW, image=photo, tags="chunk")
+            self.chunk_items[chunk] = item
+            self.chunk_images[chunk] = photo
+        self.editor_canvas.tag_raise("boundary")
+
+    def compose_chunk(self, chunk):
+        """Draw one chunk's grid lines and placed tiles into a single transparent image."""
+        first_row = chunk[0] * self.CHUNK_SIZE
+        first_col = chunk[1] * self.CHUNK_SIZE
+        rows = min(self.CHUNK_SIZE, self.map_rows - first_row)
+        cols = min(self.CHUNK_SIZE, self.map_cols - first_col)
+
+        # one pixel wider and taller so the closing grid line fits
+        image = Image.new("RGBA", (cols * self.GRID_SIZE + 1, rows * self.GRID_SIZE + 1), (0, 0, 0, 0))
+        draw = ImageDraw.Draw(image)
+        for col in range(cols + 1):
+            draw.line([(col * self.GRID_SIZE, 0), (col * self.GRID_SIZE, rows * self.GRID_SIZE)], fill="#999")
+        for row in range(rows + 1):
+            draw.line([(0, row * self.GRID_SIZE), (cols * self.GRID_SIZE, row * self.GRID_SIZE)], fill="#999")
+
+        block = self.tiles.copy(first_col, first_row, cols, rows)
+        for row, col in zip(*(block != EMPTY).nonzero()):
+            tile = self.tile_palette[block[row, col]]
+            if tile is None:
+                continue  # tileset still loading
+            image.paste(tile, (int(col) * self.GRID_SIZE, int(row) * self.GRID_SIZE), tile)
+        return image
 
 
     def on_tileset_click(self, event):
         x, y = self.image_canvas.canvasx(event.x), self.image_canvas.canvasy(event.y)
-        col = x // self.GRID_SIZE
-        row = y // self.GRID_SIZE
+        col = int(x // self.GRID_SIZE)
+        row = int(y // self.GRID_SIZE)
+        if (row, col) not in self.tileset_tiles:
+            return  # still loading, or outside the sheet
         # print(f"clicked ({x}, {y}) aka tile ({row}, {col})")
         self.selected_tile_coords = (row, col)
 
-        # crop tile from tileset
+        # tile bounds in the tileset
         left = col * self.GRID_SIZE
         upper = row * self.GRID_SIZE
         right = left + self.GRID_SIZE
         lower = upper + self.GRID_SIZE
-        rect = (left, upper, right, lower)
 
-        tile = self.tileset_image.crop(rect)
-        self.selected_tile_image = ImageTk.PhotoImage(tile)
+        # the palette shares the sliced tile, so every placement of it uses one image
+        key = (self.tileset_path, row, col)
+        if key not in self.palette_ids:
+            self.palette_ids[key] = len(self.tile_palette)
+            self.tile_palette.append(self.tileset_tiles[(row, col)])
+            self.history.set_meta("palette", [list(key) for key in self.palette_ids])
+        self.selected_tile_id = self.palette_ids[key]
 
         # remove prev highlight
         if self.tile_highlight:
@@ -214,14 +459,12 @@ class TileMapEditor:
 
 
     def on_map_click(self, event):
-        if not self.selected_tile_image:
+        if self.selected_tile_id is None:
             return  
 
         x, y = self.editor_canvas.canvasx(event.x), self.editor_canvas.canvasy(event.y)
-        col = (x - self.grid_offset_x) // self.GRID_SIZE
-        row = (y - self.grid_offset_y) // self.GRID_SIZE
-        draw_x = col * self.GRID_SIZE + self.grid_offset_x
-        draw_y = row * self.GRID_SIZE + self.grid_offset_y
+        col = int((x - self.grid_offset_x) // self.GRID_SIZE)
+        row = int((y - self.grid_offset_y) // self.GRID_SIZE)
 
         if not (0 <= row < self.map_rows and 0 <= col < self.map_cols):
             self.status_label.config(text="Click was outside the grid.")
@@ -229,23 +472,44 @@ class TileMapEditor:
         else:
             self.status_label.config(text="")
 
-        # draw selected tile onto map
-        self.editor_canvas.create_image(draw_x, draw_y, anchor=tk.NW, image=self.selected_tile_image)
-
-        # track placement aka (ImageTk.PhotoImage, x, y)
-        if not hasattr(self, 'placed_tiles'):
-            self.placed_tiles = []
-        self.placed_tiles.append((self.selected_tile_image, draw_x, draw_y))
-        self.tile_data[int(row)][int(col)] = 1
-
+        # placing over a tile replaces it; a drag is one undo step, ended on button release
+        self.history.begin_stroke()
+        if self.history.set(col, row, self.selected_tile_id):
+            self.redraw_chunks([(row // self.CHUNK_SIZE, col // self.CHUNK_SIZE)])
+
+    def undo(self):
+        change = self.history.undo()
+        if change is not None:
+            self.redraw_cells(change[1])
+
+    def redo(self):
+        change = self.history.redo()
+        if change is not None:
+            self.redraw_cells(change[1])
+
+    def redraw_cells(self, cells):
+        self.redraw_chunks({(row // self.CHUNK_SIZE, col // self.CHUNK_SIZE) for col, row in cells})
+
+    def redraw_chunks(self, chunks):
+        """Recompose the given chunks that are on screen, updating their images in place."""
+        for chunk in chunks:
+            if chunk in self.chunk_images:
+                self.chunk_images[chunk].paste(self.compose_chunk(chunk))
+
+    def placed_tiles(self):
+        """(pil img, x, y) canvas position of every placed tile, row by row."""
+        for col, row, tile_id in sorted(self.tiles.cells(), key=lambda cell: (cell[1], cell[0])):
+            yield (self.tile_palette[tile_id],
+                   col * self.GRID_SIZE + self.grid_offset_x,
+                   row * self.GRID_SIZE + self.grid_offset_y)
 
     def draw_clickable_boundary(self):
         width = self.map_cols * self.GRID_SIZE
         height = self.map_rows * self.GRID_SIZE
-        self.editor_canvas.create_rectangle(self.grid_offset_x, self.grid_offset_y, self.grid_offset_x+width, self.grid_offset_y+height, outline="red", width=2)
+        self.editor_canvas.create_rectangle(self.grid_offset_x, self.grid_offset_y, self.grid_offset_x+width, self.grid_offset_y+height, outline="red", width=2, tags="boundary")
 
     def save_map_as_png(self):
-        if not hasattr(self, 'placed_tiles') or not self.placed_tiles:
+        if not self.tiles:
             print("error: nothing to save")
             return
 
@@ -262,9 +526,9 @@ class TileMapEditor:
         output_image = Image.new("RGBA", (map_width, map_height), (255, 255, 255, 0))
 
         # paste tiles one by one onto output img
-        for tile_imgtk, x, y in self.placed_tiles:
-            tile_pil = ImageTk.getimage(tile_imgtk)
-            output_image.paste(tile_pil, (int(x), int(y)), tile_pil)  
+        for tile_pil, x, y in self.placed_tiles():
+            if tile_pil is not None:
+                output_image.paste(tile_pil, (int(x), int(y)), tile_pil)  
 
 
         # save
@@ -274,104 +538,53 @@ class TileMapEditor:
             print(f"Map saved to: {save_path}")
 
     def export_map(self):
-        if not self.tile_data or not hasattr(self, 'placed_tiles'):
+        if not self.tiles:
             print("No map to export.")
             return
 
-        file_path = "testTile.json"
+        file_path = filedialog.asksaveasfilename(
+            title="Export enemies into scene",
+            initialdir=os.path.dirname(os.path.abspath(self.scene_path)),
+            initialfile=os.path.basename(self.scene_path),
+            defaultextension=".json",
+            filetypes=[("Scene Files", "*.json")],
+            confirmoverwrite=False
+        )
         if not file_path:
             return
 
-        with open(file_path, "r") as f:
-            scene_data = json.load(f)
-
-        objects = scene_data.get("sceneTree", {}).get("objects", [])
-        tree_nodes = scene_data.get("sceneTree", {}).get("treeNodes", [])
-
-        objects_to_remove = []
-        tree_nodes_to_remove = []
-
-        for obj in objects:
-            if "name" in obj and obj["name"].startswith("Enemy"):
-                objects_to_remove.append(obj)
-
-        for node in tree_nodes:
-            if "objName" in node and node["objName"].startswith("Enemy"):
-                tree_nodes_to_remove.append(node)
-
-        # Remove the enemies from the lists
-        for obj in objects_to_remove:
-            objects.remove(obj)
-        
-        for node in tree_nodes_to_remove:
-            tree_nodes.remove(node)
-
-        enemy_count = 0
-
-        for tile_imgtk, x, y in self.placed_tiles:
-            enemy_name = f"Enemy{enemy_count}"
-
-            enemy_object = {
-                "components": {
-                    "ANIMATEDTEXTURE": {
-                        "currAnimation": "run",
-                        "currFrame": 0,
-                        "filename": "assets/images/enemy.json",
-                        "lastFrame": 5
-                    },
-                    "COLLISION": {
-                        "rect": [int(x), int(y)+10, 30, 30],
-                        "xOffset": 0,
-                        "yOffset": 10
-                    },
-                    "TEXTURE": {
-                        "angle": 0.0,
-                        "destScale": [0.0, 0.0],
-                        "filename": "assets/images/enemy_spritesheet.png",
-                        "rect": [0, 0, 30, 40],
-                        "srcRect": [0, 0, 0, 0]
-                    },
-                    "TRANSFORM": {
-                        "local": [
-                            [1.0, 0.0, float(x)],
-                            [0.0, 1.0, float(y)],
-                            [0.0, 0.0, 1.0]
-                        ],
-                        "world": [
-                            [1.0, 0.0, 0.0],
-                            [0.0, 1.0, 0.0],
-                            [0.0, 0.0, 1.0]
-                        ]
-                    }
-                },
-                "name": enemy_name,
-                "scripts": ["EnemyScript"]
-            }
-
-            
-            tree_node = {
-                "name": enemy_name.lower(),
-                "objName": enemy_name,
-                "parent": 0
-            }
-
-            objects.append(enemy_object)
-            tree_nodes.append(tree_node)
-
-            enemy_count += 1
-
-        
-        save_path = "testTile.json"
-        if save_path:
-            with open(save_path, "w") as f:
-                json.dump(scene_data, f, indent=2)
-            print(f"Modified scene exported to {save_path}")
-        self.root.destroy()
+        try:
+            with open(file_path, "r") as f:
+                scene_data = json.load(f)
+        except (OSError, ValueError) as e:
+            self.status_label.config(text=f"Could not read scene {file_path}: {e}")
+            return
 
+        enemy_count, collider_count = export_enemies(scene_data, [(x, y) for _, x, y in self.placed_tiles()],
+                                                     self.merge_colliders, self.GRID_SIZE,
+                                                     (self.grid_offset_x, self.grid_offset_y))
+        write_scene(file_path, scene_data, self.compact)
+        self.history.close()
+        print(f"Exported {enemy_count} enemies to {file_path}")
+        if self.merge_colliders:
+            print(f"Colliders: {enemy_count} before merging, {collider_count} after")
+        self.root.destroy()
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Place enemies on a level and export them to the scene.")
+    parser.add_argument("--level-width", type=int, default=2800, help="level width in pixels (default: 2800)")
+    parser.add_argument("--scene", default="testTile.json", help="scene file offered when exporting (default: testTile.json)")
+    parser.add_argument("--compact", action="store_true", help="export the scene without indentation")
+    parser.add_argument("--merge-colliders", action="store_true",
+                        help="merge adjacent enemy boxes into large collider-only objects; enemies lose "
+                             "EnemyScript and become static sprites that no longer move")
+    parser.add_argument("--autosave", metavar="PATH",
+                        help="log every edit to PATH and restore the map from it on the next start")
+    args = parser.parse_args()
+
     root = tk.Tk()
     root.geometry("1000x500")
-    app = TileMapEditor(root)
+    app = TileMapEditor(root, args.level_width, args.scene, args.compact, args.merge_colliders, args.autosave)
     root.mainloop()
+    app.history.close()
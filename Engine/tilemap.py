@@ -1,20 +1,98 @@
 import tkinter as tk
 
-import sys
+import argparse
+import hashlib
+import os
+import numpy as np
 from PIL import Image, ImageTk
 
+from edithistory import EditHistory
+from tilelayer import EMPTY, TileMap
+
 TILE_SIZE = 32
 MAP_WIDTH, MAP_HEIGHT = 10, 10
+MAX_VIEW_TILES = 20  # larger maps scroll
 TILESET_COLUMNS = 8  # adjust based on your tileset image
+PICKER_COLUMNS = 4
+
+# Layout of tiles inside the tileset image (source pixels)
+SOURCE_TILE_SIZE = 16
+TILE_SPACING = 1
+TILE_MARGIN = 0
+
+TILE_CACHE_DIR = ".tilecache"
+
+PAINT_FLUSH_MS = 16  # painted cells are pushed to the canvas at most once per frame
+
+
+def slice_tileset(pixels, tile_size=SOURCE_TILE_SIZE, spacing=TILE_SPACING, margin=TILE_MARGIN, scale_to=TILE_SIZE):
+    """Cut a tileset into a (count, scale_to, scale_to, channels) stack in row-major order.
+
+    Done as one reshape of the whole sheet plus one nearest-neighbour gather, instead of a crop and
+    resize per tile.
+    """
+    height, width, channels = pixels.shape
+    stride = tile_size + spacing
+    cols = (width - margin - tile_size) // stride + 1 if width - margin >= tile_size else 0
+    rows = (height - margin - tile_size) // stride + 1 if height - margin >= tile_size else 0
+    if not rows or not cols:
+        return np.zeros((0, scale_to, scale_to, channels), dtype=pixels.dtype)
+
+    # Pad so every tile (plus its trailing spacing) is a full stride, then split into a grid of tiles
+    region = np.zeros((rows * stride, cols * stride, channels), dtype=pixels.dtype)
+    available = pixels[margin:margin + rows * stride, margin:margin + cols * stride]
+    region[:available.shape[0], :available.shape[1]] = available
+    tiles = region.reshape(rows, stride, cols, stride, channels)[:, :tile_size, :, :tile_size]
+    tiles = tiles.transpose(0, 2, 1, 3, 4).reshape(rows * cols, tile_size, tile_size, channels)
+
+    # Nearest-neighbour scale of the whole stack at once. The source index for each output pixel is
+    # taken from PIL itself (by resizing a row of indices) so rounding matches a per-tile resize exactly.
+    indices = Image.fromarray(np.arange(tile_size, dtype=np.int32).reshape(1, tile_size))
+    source = np.asarray(indices.resize((scale_to, 1), Image.NEAREST))[0].astype(np.intp)
+    return tiles[:, source][:, :, source]
+
+
+def load_tiles(tileset_path, tile_size=SOURCE_TILE_SIZE, spacing=TILE_SPACING, margin=TILE_MARGIN, scale_to=TILE_SIZE):
+    """Sliced tiles for a tileset, from the disk cache when the same file was sliced before.
+
+    The cache key is a hash of the tileset's bytes plus the slicing parameters.
+    """
+    with open(tileset_path, "rb") as f:
+        digest = hashlib.blake2b(f.read(), digest_size=16)
+    digest.update(f"{tile_size},{spacing},{margin},{scale_to}".encode())
+    cache_path = os.path.join(TILE_CACHE_DIR, f"{digest.hexdigest()}.npy")
+
+    try:
+        return np.load(cache_path)
+    except (OSError, ValueError, EOFError):
+        pass
+
+    pixels = np.asarray(Image.open(tileset_path).convert("RGBA"))
+    tiles = slice_tileset(pixels, tile_size, spacing, margin, scale_to)
+    os.makedirs(TILE_CACHE_DIR, exist_ok=True)
+    np.save(cache_path, tiles)
+    return tiles
+
 
 class TileMapEditor:
-    def __init__(self, root, tileset_image):
+    def __init__(self, root, tileset_image, tile_size=SOURCE_TILE_SIZE, spacing=TILE_SPACING, margin=TILE_MARGIN,
+                 map_width=MAP_WIDTH, map_height=MAP_HEIGHT, autosave_path=None):
         self.root = root
-        self.tileset_image = Image.open(tileset_image)
-        self.tiles = []
-        self.divide_tile_image()
+        self.map_width = map_width
+        self.map_height = map_height
+        # Tile pixels are sliced up front (or loaded from cache); PhotoImages are only made on first use
+        self.tile_pixels = load_tiles(tileset_image, tile_size, spacing, margin)
+        self.tile_images = {}
+        self.picker_rows_drawn = set()
         self.selected_tile_index = 0
-        self.tile_map = [[-1 for _ in range(MAP_HEIGHT)] for _ in range(MAP_WIDTH)]
+        self.tile_map = TileMap(map_width, map_height)
+        self.tiles = self.tile_map["tiles"]
+        # Every edit goes through the history (undo/redo, and the autosave log when one is given)
+        self.history = EditHistory(self.tile_map, autosave_path)
+        # Retained map view: one canvas image item per painted cell, updated in place
+        self.cell_items = {}
+        self.dirty_cells = set()
+        self.flush_pending = None
 
         self.top_frame = tk.Frame(root)
         self.top_frame.pack(side="top", fill="x")
@@ -28,11 +106,23 @@ class TileMapEditor:
         self.main_frame = tk.Frame(root)
         self.main_frame.pack(side="top")
 
-        self.map_canvas = tk.Canvas(self.main_frame,
-                            width=MAP_WIDTH * TILE_SIZE,
-                            height=MAP_HEIGHT * TILE_SIZE,
+        self.map_frame = tk.Frame(self.main_frame)
+        self.map_frame.pack(side="left", padx=20, pady=10)
+
+        self.map_canvas = tk.Canvas(self.map_frame,
+                            width=min(map_width, MAX_VIEW_TILES) * TILE_SIZE,
+                            height=min(map_height, MAX_VIEW_TILES) * TILE_SIZE,
+                            scrollregion=(0, 0, map_width * TILE_SIZE, map_height * TILE_SIZE),
                             bg="white")
-        self.map_canvas.pack(side="left", padx=20, pady=10)
+        self.map_canvas.grid(row=0, column=0)
+        if map_width > MAX_VIEW_TILES:
+            self.map_xscroll = tk.Scrollbar(self.map_frame, orient="horizontal", command=self.map_canvas.xview)
+            self.map_xscroll.grid(row=1, column=0, sticky="ew")
+            self.map_canvas.config(xscrollcommand=self.map_xscroll.set)
+        if map_height > MAX_VIEW_TILES:
+            self.map_yscroll = tk.Scrollbar(self.map_frame, orient="vertical", command=self.map_canvas.yview)
+            self.map_yscroll.grid(row=0, column=1, sticky="ns")
+            self.map_canvas.config(yscrollcommand=self.map_yscroll.set)
 
         self.picker_frame = tk.Frame(self.main_frame)
         self.picker_frame.pack(side="right", fill="y", padx=20, pady=10)
@@ -41,88 +131,170 @@ class TileMapEditor:
         self.scrollbar.pack(side="right", fill="y")
 
         self.menu_canvas = tk.Canvas(self.picker_frame,
-                             width=4 * 32,
-                             height=MAP_HEIGHT * TILE_SIZE,
+                             width=PICKER_COLUMNS * TILE_SIZE,
+                             height=min(map_height, MAX_VIEW_TILES) * TILE_SIZE,
                              bg="lightgray",
-                             yscrollcommand=self.scrollbar.set)
+                             yscrollcommand=self.on_menu_scroll)
         self.menu_canvas.pack(side="left", fill="both", expand=True)
 
         self.scrollbar.config(command=self.menu_canvas.yview)
         self.menu_canvas.bind_all("<MouseWheel>", self.on_mousewheel)
 
         self.map_canvas.bind("<Button-1>", self.on_click)
+        self.map_canvas.bind("<B1-Motion>", self.on_click)
+        self.map_canvas.bind("<ButtonRelease-1>", lambda event: self.history.end_stroke())
+        self.map_canvas.bind("<Shift-Button-1>", self.on_fill_click)
+        self.root.bind("<Control-z>", lambda event: self.undo())
+        self.root.bind("<Control-y>", lambda event: self.redo())
+        self.root.bind("<Control-Z>", lambda event: self.redo())
 
         self.highlight_tile = None
 
         self.draw_tile_menu()
+        self.draw_grid()
         self.draw_map()
 
-    def divide_tile_image(self):
-        width, height = self.tileset_image.size
-        step = 17
-        i = 0
-        for y in range(0, height - 16 + 1, step):
-            for x in range(0, width - 16 + 1, step):
-                tile = self.tileset_image.crop((x, y, x + 16, y + 16))
-                tile = tile.resize((32, 32), Image.NEAREST)
-                self.tiles.append(ImageTk.PhotoImage(tile))
-                i += 1
+    def tile_image(self, idx):
+        """PhotoImage for tile idx, created the first time it is needed."""
+        image = self.tile_images.get(idx)
+        if image is None:
+            image = ImageTk.PhotoImage(Image.fromarray(self.tile_pixels[idx]))
+            self.tile_images[idx] = image
+        return image
 
     def draw_tile_menu(self):
         self.menu_canvas.delete("all")
+        self.picker_rows_drawn.clear()
+
+        total_rows = (len(self.tile_pixels) + PICKER_COLUMNS - 1) // PICKER_COLUMNS
+        content_height = total_rows * TILE_SIZE
+        self.menu_canvas.config(scrollregion=(0, 0, PICKER_COLUMNS * TILE_SIZE, content_height))
+        self.menu_canvas.tag_bind("picker_tile", "<Button-1>", self.on_picker_click)
+        self.draw_visible_tiles()
+
+    def draw_visible_tiles(self):
+        """Create canvas items (and PhotoImages) only for picker rows that are scrolled into view."""
+        total_rows = (len(self.tile_pixels) + PICKER_COLUMNS - 1) // PICKER_COLUMNS
+        if not total_rows:
+            return
+        first_row = int(self.menu_canvas.yview()[0] * total_rows)
+        # Before the canvas is mapped its real height is 1; fall back to the requested height
+        height = self.menu_canvas.winfo_height()
+        if height <= 1:
+            height = int(self.menu_canvas.cget("height"))
+        last_row = min(total_rows - 1, first_row + height // TILE_SIZE + 1)
 
-        for i, tile in enumerate(self.tiles):
-            x = (i % 4) * 32
-            y = (i // 4) * 32
-            self.menu_canvas.create_image(x, y, image=tile, anchor="nw", tags=f"tile_{i}")
-            self.menu_canvas.tag_bind(f"tile_{i}", "<Button-1>", lambda e, idx=i: self.select_tile(idx))
+        for row in range(first_row, last_row + 1):
+            if row in self.picker_rows_drawn:
+                continue
+            self.picker_rows_drawn.add(row)
+            for i in range(row * PICKER_COLUMNS, min((row + 1) * PICKER_COLUMNS, len(self.tile_pixels))):
+                x = (i % PICKER_COLUMNS) * TILE_SIZE
+                y = (i // PICKER_COLUMNS) * TILE_SIZE
+                self.menu_canvas.create_image(x, y, image=self.tile_image(i), anchor="nw", tags=("picker_tile", f"tile_{i}"))
+        if self.highlight_tile is not None:
+            self.menu_canvas.tag_raise(self.highlight_tile)
+
+    def on_menu_scroll(self, first, last):
+        self.scrollbar.set(first, last)
+        self.draw_visible_tiles()
 
-        total_rows = (len(self.tiles) + 3) // 4
-        content_height = total_rows * 32
-        self.menu_canvas.config(scrollregion=(0, 0, 4 * 32, content_height))
+    def on_picker_click(self, event):
+        x = self.menu_canvas.canvasx(event.x)
+        y = self.menu_canvas.canvasy(event.y)
+        idx = int(y // TILE_SIZE) * PICKER_COLUMNS + int(x // TILE_SIZE)
+        if idx < len(self.tile_pixels):
+            self.select_tile(idx)
 
     def draw_map(self):
-        self.draw_grid()
-        self.map_canvas.delete("tilemap")
-        for x in range(MAP_WIDTH):
-            for y in range(MAP_HEIGHT):
-                idx = self.tile_map[x][y]
-                if idx != -1:
-                    self.map_canvas.create_image(x * TILE_SIZE, y * TILE_SIZE,
-                                             image=self.tiles[idx], anchor="nw", tags="tilemap")
-                    
+        """Bring every cell's canvas item in line with the tile layer (used after the whole map changes)."""
+        for x, y in list(self.cell_items):
+            if self.tiles.get(x, y) == EMPTY:
+                self.update_cell(x, y)
+        for x, y, _ in self.tiles.cells():
+            self.update_cell(x, y)
+
+    def update_cell(self, x, y):
+        """Create, retarget or delete the single canvas item of one cell."""
+        idx = self.tiles.get(x, y)
+        item = self.cell_items.get((x, y))
+        if idx == EMPTY:
+            if item is not None:
+                self.map_canvas.delete(item)
+                del self.cell_items[(x, y)]
+        elif item is None:
+            self.cell_items[(x, y)] = self.map_canvas.create_image(x * TILE_SIZE, y * TILE_SIZE,
+                                                                   image=self.tile_image(idx), anchor="nw", tags="tilemap")
+        else:
+            self.map_canvas.itemconfigure(item, image=self.tile_image(idx), state="normal")
+
+    def paint_cell(self, x, y, idx):
+        """Set one cell; the canvas catches up on the next flush."""
+        if self.history.set(x, y, idx):
+            self.mark_dirty([(x, y)])
+
+    def undo(self):
+        change = self.history.undo()
+        if change is not None:
+            self.mark_dirty(change[1])
+
+    def redo(self):
+        change = self.history.redo()
+        if change is not None:
+            self.mark_dirty(change[1])
+
+    def mark_dirty(self, cells):
+        self.dirty_cells.update(cells)
+        if self.dirty_cells and self.flush_pending is None:
+            self.flush_pending = self.root.after(PAINT_FLUSH_MS, self.flush_dirty_cells)
+
+    def flush_dirty_cells(self):
+        self.flush_pending = None
+        for x, y in self.dirty_cells:
+            self.update_cell(x, y)
+        self.dirty_cells.clear()
+
     def draw_grid(self):
-        for x in range(0, MAP_WIDTH * TILE_SIZE, TILE_SIZE):
+        """Draw the grid lines; called once, the lines are never redrawn."""
+        self.map_canvas.delete("grid")
+        for x in range(0, self.map_width * TILE_SIZE, TILE_SIZE):
             self.map_canvas.create_line(
-                x, 0, x, MAP_HEIGHT * TILE_SIZE,
-                fill="gray", dash=(2, 4)
+                x, 0, x, self.map_height * TILE_SIZE,
+                fill="gray", dash=(2, 4), tags="grid"
             )
-        for y in range(0, MAP_HEIGHT * TILE_SIZE, TILE_SIZE):
+        for y in range(0, self.map_height * TILE_SIZE, TILE_SIZE):
             self.map_canvas.create_line(
-                0, y, MAP_WIDTH * TILE_SIZE, y,
-                fill="gray", dash=(2, 4)
+                0, y, self.map_width * TILE_SIZE, y,
+                fill="gray", dash=(2, 4), tags="grid"
             )
 
     def select_tile(self, idx):
         self.selected_tile_index = idx
-        x = (idx % 4) * 32 
-        y = (idx // 4) * 32
+        x = (idx % PICKER_COLUMNS) * TILE_SIZE
+        y = (idx // PICKER_COLUMNS) * TILE_SIZE
         # Remove old highlight if it exists
         if self.highlight_tile is not None:
             self.menu_canvas.delete(self.highlight_tile)
 
         # Draw a new rectangle around the selected tile
         self.highlight_tile = self.menu_canvas.create_rectangle(
-            x, y, x + 32, y + 32,
+            x, y, x + TILE_SIZE, y + TILE_SIZE,
             outline="red", width=3
     )
 
     def on_click(self, event):
-        grid_x = event.x // TILE_SIZE
-        grid_y = event.y // TILE_SIZE
-        if grid_x < MAP_WIDTH and grid_y < MAP_HEIGHT:
-            self.tile_map[grid_x][grid_y] = self.selected_tile_index
-            self.draw_map()
+        # Also bound to drag, so painting a stroke only marks cells dirty; the whole drag is one undo step
+        self.history.begin_stroke()
+        grid_x = int(self.map_canvas.canvasx(event.x) // TILE_SIZE)
+        grid_y = int(self.map_canvas.canvasy(event.y) // TILE_SIZE)
+        if 0 <= grid_x < self.map_width and 0 <= grid_y < self.map_height:
+            self.paint_cell(grid_x, grid_y, self.selected_tile_index)
+
+    def on_fill_click(self, event):
+        grid_x = int(self.map_canvas.canvasx(event.x) // TILE_SIZE)
+        grid_y = int(self.map_canvas.canvasy(event.y) // TILE_SIZE)
+        if self.tiles.in_bounds(grid_x, grid_y):
+            self.mark_dirty(self.history.flood_fill(grid_x, grid_y, self.selected_tile_index))
 
     def on_mousewheel(self, event):
         self.menu_canvas.yview_scroll(int(-1 * (event.delta / 120)), "units")
@@ -130,11 +302,19 @@ class TileMapEditor:
 
 
 if __name__ == "__main__":
-    if len(sys.argv) < 2:
-        print("Usage: python editor.py <tileset.png>")
-        sys.exit(1)
+    parser = argparse.ArgumentParser(description="Paint a tile map from a tileset image.")
+    parser.add_argument("tileset", help="tileset PNG")
+    parser.add_argument("--tile-size", type=int, default=SOURCE_TILE_SIZE, help="tile size in the tileset, in pixels (default: 16)")
+    parser.add_argument("--spacing", type=int, default=TILE_SPACING, help="pixels between tiles (default: 1)")
+    parser.add_argument("--margin", type=int, default=TILE_MARGIN, help="pixels before the first tile (default: 0)")
+    parser.add_argument("--map-size", type=int, nargs=2, default=(MAP_WIDTH, MAP_HEIGHT), metavar=("WIDTH", "HEIGHT"),
+                        help="map size in tiles (default: 10 10)")
+    parser.add_argument("--autosave", metavar="PATH",
+                        help="log every edit to PATH and restore the map from it on the next start")
+    args = parser.parse_args()
 
-    tileset_image = sys.argv[1]
     root = tk.Tk()
-    editor = TileMapEditor(root, tileset_image)
-    root.mainloop()
\ No newline at end of file
+    editor = TileMapEditor(root, args.tileset, args.tile_size, args.spacing, args.margin, *args.map_size,
+                           autosave_path=args.autosave)
+    root.mainloop()
+    editor.history.close()